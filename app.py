@@ -1,79 +1,559 @@
-from flask import Flask, request, redirect, render_template, url_for, flash
+from flask import Flask, Blueprint, current_app, request, redirect, render_template, url_for, flash, jsonify, session, make_response, g, Response, stream_with_context, has_request_context, has_app_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
+from flask_sqlalchemy.session import Session as SessaoFlask
+from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user, login_url
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.local import LocalProxy
 from flask_mail import Mail, Message
-from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from markupsafe import Markup
+from sqlalchemy.schema import CreateIndex, Table
+from sqlalchemy.sql.expression import Select, UpdateBase
+from datetime import datetime, date, timedelta, timezone
+from calendar import monthrange
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import logging
+import re
 import secrets
-import locale
+import smtplib
+import sqlite3
+import sys
+import threading
+import time
 import os
+import click
 
-app = Flask(__name__, template_folder='modelos')
-
-# Configuração básica (usa variável de ambiente para produção)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
-app.config['TESTING'] = False
-
-# Configuração do banco de dados (usa variável de ambiente ou padrão local)
-database_url = os.getenv('DATABASE_URL', None)
-if not database_url:
-    # Usar caminho absoluto para garantir persistência
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    database_path = os.path.join(basedir, 'tarefas.db')
-    database_url = f'sqlite:///{database_path}'
-else:
-    # Ajustar para PostgreSQL no Render (formato: postgresql://...)
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-
-app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# Garantir que o banco não seja recriado se já existir
-app.config['SQLALCHEMY_ECHO'] = False
-
-# Configuração do email (usando variáveis de ambiente para segurança)
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-try:
-    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-except (ValueError, TypeError):
-    app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', '')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', '')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_USERNAME', '')
-# CERTIFIQUE-SE DE QUE MAIL_SUPPRESS_SEND ESTÁ DEFINIDO COMO False EM PRODUÇÃO!
-app.config['MAIL_SUPPRESS_SEND'] = os.getenv('MAIL_SUPPRESS_SEND', 'False').lower() == 'true'
-
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-login_manager.login_message = 'Por favor, faça login para acessar esta página.'
+# ===============================================
+# CONFIGURAÇÃO
+# ===============================================
+def ler_inteiro(nome, padrao):
+    try:
+        return int(os.getenv(nome, padrao))
+    except (ValueError, TypeError):
+        return padrao
 
-# Inicializar Mail apenas se configurações estiverem disponíveis
-EMAIL_ENABLED = False
-try:
-    if app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD'):
-        mail = Mail(app)
-        EMAIL_ENABLED = True
+def cooperativo():
+    """True quando o processo roda com o monkey patching do gevent (gunicorn -k gevent)."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+# Perfis do engine: pool de conexões para PostgreSQL, WAL e busy_timeout para SQLite
+def opcoes_engine(url):
+    if url.startswith('sqlite'):
+        # Espera pelo lock de escrita em vez de falhar na hora ("database is locked")
+        opcoes = {'connect_args': {'timeout': ler_inteiro('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}}
+        if cooperativo():
+            # O sqlite3 não cede a vez ao gevent: uma espera pelo lock de escrita travaria o
+            # worker inteiro, inclusive a requisição que segura o lock. Uma conexão por worker
+            # serializa o acesso ao banco dentro do processo (as outras esperam no pool, cooperando)
+            opcoes.update(pool_size=1, max_overflow=0, pool_timeout=ler_inteiro('DB_POOL_TIMEOUT', 30))
+        return opcoes
+
+    opcoes = {
+        'pool_size': ler_inteiro('DB_POOL_SIZE', 5),
+        'max_overflow': ler_inteiro('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': ler_inteiro('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': ler_inteiro('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    }
+    if url.startswith('postgresql'):
+        # Consultas presas não seguram a conexão (e o worker) indefinidamente. As opções
+        # que já vêm na URL (ex.: search_path de um shard em outro schema) são mantidas
+        opcoes_url = make_url(url).query.get('options', '')
+        opcoes['connect_args'] = {
+            'options': f"{opcoes_url} -c statement_timeout={ler_inteiro('DB_STATEMENT_TIMEOUT_MS', 15000)}".strip(),
+            'connect_timeout': ler_inteiro('DB_CONNECT_TIMEOUT', 10)
+        }
+    return opcoes
+
+@event.listens_for(Engine, 'connect')
+def configurar_sqlite(conexao_dbapi, registro_conexao):
+    """Pragmas por conexão do SQLite: WAL permite leitores durante uma escrita de outro worker."""
+    if not isinstance(conexao_dbapi, sqlite3.Connection):
+        return
+    cursor = conexao_dbapi.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={ler_inteiro('SQLITE_BUSY_TIMEOUT_MS', 5000)}")
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+def preparar_postgres_cooperativo():
+    """
+    O psycopg2 é C e bloqueia o processo enquanto espera o PostgreSQL. Com o
+    wait_select as esperas passam pelo select(), que o gevent troca por uma
+    versão cooperativa: outras requisições rodam enquanto a consulta não volta.
+    """
+    from psycopg2 import extensions, extras
+    extensions.set_wait_callback(extras.wait_select)
+
+def carregar_configuracao(app):
+    # Configuração básica (usa variável de ambiente para produção)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
+    app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    app.config['TESTING'] = False
+
+    # Configuração do banco de dados (usa variável de ambiente ou padrão local)
+    database_url = os.getenv('DATABASE_URL', None)
+    if not database_url:
+        # Usar caminho absoluto para garantir persistência
+        basedir = os.path.abspath(os.path.dirname(__file__))
+        database_path = os.path.join(basedir, 'tarefas.db')
+        database_url = f'sqlite:///{database_path}'
     else:
-        mail = None
-        EMAIL_ENABLED = False
-        print("⚠️  Email não configurado. Funcionalidade de recuperação de senha desabilitada.")
-        print("   Configure as variáveis MAIL_USERNAME e MAIL_PASSWORD para habilitar.")
-except Exception as e:
-    mail = None
-    EMAIL_ENABLED = False
-    print(f"⚠️  Erro ao configurar email: {e}")
-
-# Configurar locale para português
-try:
-    locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
-except:
+        # Ajustar para PostgreSQL no Render (formato: postgresql://...)
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    # Shards: bancos extras para os dados dos usuários (URLs separadas por vírgula), que
+    # viram os binds shard1, shard2... O banco principal continua sendo um dos shards
+    shards = [url.strip() for url in os.getenv('DATABASE_SHARDS', '').split(',') if url.strip()]
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'shard{indice}': url.replace('postgres://', 'postgresql://', 1) if url.startswith('postgres://') else url
+        for indice, url in enumerate(shards, start=1)
+    }
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Garantir que o banco não seja recriado se já existir
+    app.config['SQLALCHEMY_ECHO'] = False
+
+    # Quantidade de tarefas exibidas por página no dashboard
+    app.config['TAREFAS_POR_PAGINA'] = ler_inteiro('TAREFAS_POR_PAGINA', 50)
+
+    # Limites das operações em lote (ids por requisição e linhas por importação)
+    app.config['LOTE_MAX_IDS'] = ler_inteiro('LOTE_MAX_IDS', 1000)
+    app.config['IMPORTACAO_MAX_TAREFAS'] = ler_inteiro('IMPORTACAO_MAX_TAREFAS', 10000)
+    # Exportação: linhas lidas do banco por vez (a memória não cresce com o total de tarefas)
+    app.config['EXPORTACAO_LOTE'] = ler_inteiro('EXPORTACAO_LOTE', 1000)
+
+    # Sincronização incremental: alterações por resposta e, no stream de eventos, o intervalo
+    # entre verificações e quanto tempo a conexão fica aberta (s) antes do cliente reconectar
+    app.config['SYNC_LIMITE'] = ler_inteiro('SYNC_LIMITE', 500)
+    app.config['SYNC_EVENTOS_INTERVALO'] = ler_inteiro('SYNC_EVENTOS_INTERVALO', 2)
+    app.config['SYNC_EVENTOS_DURACAO'] = ler_inteiro('SYNC_EVENTOS_DURACAO', 55)
+
+    # Configuração do email (usando variáveis de ambiente para segurança)
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     try:
-        locale.setlocale(locale.LC_TIME, 'pt_BR')
-    except:
-        pass
+        app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    except (ValueError, TypeError):
+        app.config['MAIL_PORT'] = 587
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', '')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', '')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_USERNAME', '')
+    # CERTIFIQUE-SE DE QUE MAIL_SUPPRESS_SEND ESTÁ DEFINIDO COMO False EM PRODUÇÃO!
+    app.config['MAIL_SUPPRESS_SEND'] = os.getenv('MAIL_SUPPRESS_SEND', 'False').lower() == 'true'
+
+    # Fila de envio de emails (os emails são gravados no banco e enviados em segundo plano)
+    app.config['EMAIL_FILA_THREAD'] = os.getenv('EMAIL_FILA_THREAD', 'True').lower() == 'true'
+    app.config['EMAIL_FILA_LOTE'] = ler_inteiro('EMAIL_FILA_LOTE', 20)
+    app.config['EMAIL_FILA_INTERVALO'] = ler_inteiro('EMAIL_FILA_INTERVALO', 30)
+    app.config['EMAIL_MAX_TENTATIVAS'] = ler_inteiro('EMAIL_MAX_TENTATIVAS', 5)
+
+    # Manutenção periódica: intervalo entre execuções (s, 0 desliga o agendador dentro dos workers),
+    # idade das tarefas concluídas que vão para o arquivo (dias, 0 não arquiva), linhas por lote,
+    # retenção dos emails enviados/falhos e das lápides da sincronização (dias) e a porcentagem
+    # de páginas livres do SQLite a partir da qual roda o VACUUM
+    app.config['MANUTENCAO_INTERVALO'] = ler_inteiro('MANUTENCAO_INTERVALO', 86400)
+    app.config['MANUTENCAO_ARQUIVAR_DIAS'] = ler_inteiro('MANUTENCAO_ARQUIVAR_DIAS', 90)
+    app.config['MANUTENCAO_LOTE'] = ler_inteiro('MANUTENCAO_LOTE', 500)
+    app.config['MANUTENCAO_VACUUM_LIVRE'] = ler_inteiro('MANUTENCAO_VACUUM_LIVRE', 20)
+    app.config['EMAIL_RETENCAO_DIAS'] = ler_inteiro('EMAIL_RETENCAO_DIAS', 30)
+    app.config['SYNC_LAPIDES_DIAS'] = ler_inteiro('SYNC_LAPIDES_DIAS', 30)
+
+    # Tarefas repetidas e lembretes: intervalo do agendador (s, 0 desliga a thread dentro dos
+    # workers), emails de lembrete por minuto (um por usuário a cada rodada), linhas lidas da
+    # fila por vez e o fuso das horas de lembrete (ex.: America/Sao_Paulo; vazio usa o do servidor)
+    app.config['LEMBRETES_INTERVALO'] = ler_inteiro('LEMBRETES_INTERVALO', 60)
+    app.config['LEMBRETES_POR_MINUTO'] = ler_inteiro('LEMBRETES_POR_MINUTO', 60)
+    app.config['LEMBRETES_LOTE'] = ler_inteiro('LEMBRETES_LOTE', 200)
+    app.config['LEMBRETES_FUSO'] = os.getenv('LEMBRETES_FUSO', '')
+
+    # Cache dos fragmentos renderizados da lista de tarefas (chave inclui a versão das tarefas)
+    app.config['FRAGMENTO_CACHE_TTL'] = ler_inteiro('FRAGMENTO_CACHE_TTL', 600)
+    app.config['FRAGMENTO_CACHE_TAMANHO'] = ler_inteiro('FRAGMENTO_CACHE_TAMANHO', 512)
+
+    # Cache dos usuários carregados pelo Flask-Login (TTL em segundos; 0 desativa)
+    app.config['USUARIO_CACHE_TTL'] = ler_inteiro('USUARIO_CACHE_TTL', 60)
+    # Sem Redis cada worker tem o próprio cache e só invalida o dele: TTL menor para os outros não ficarem para trás
+    app.config['USUARIO_CACHE_TTL_MEMORIA'] = ler_inteiro('USUARIO_CACHE_TTL_MEMORIA', 5)
+    app.config['USUARIO_CACHE_TAMANHO'] = ler_inteiro('USUARIO_CACHE_TAMANHO', 1024)
+    # Opcional: Redis compartilhado entre os workers (ex.: redis://localhost:6379/0)
+    app.config['USUARIO_CACHE_REDIS_URL'] = os.getenv('USUARIO_CACHE_REDIS_URL', '')
+
+    # Limite de tentativas de login (janela deslizante; 0 desativa o limite)
+    app.config['LOGIN_JANELA'] = ler_inteiro('LOGIN_JANELA', 300)
+    app.config['LOGIN_LIMITE_IP'] = ler_inteiro('LOGIN_LIMITE_IP', 20)
+    app.config['LOGIN_LIMITE_CONTA'] = ler_inteiro('LOGIN_LIMITE_CONTA', 5)
+    # Erros numa conta, somando todos os IPs, a partir dos quais ela vai para o caminho suspeito
+    app.config['LOGIN_SUSPEITA_CONTA'] = ler_inteiro('LOGIN_SUSPEITA_CONTA', 10)
+    app.config['LOGIN_LIMITE_TAMANHO'] = ler_inteiro('LOGIN_LIMITE_TAMANHO', 10000)
+    # Opcional: Redis para os contadores valerem para todos os workers
+    app.config['LOGIN_LIMITE_REDIS_URL'] = os.getenv('LOGIN_LIMITE_REDIS_URL', app.config['USUARIO_CACHE_REDIS_URL'])
+    # Verificação de senha em pool limitado: threads, pedidos em espera e tempo máximo (s)
+    app.config['SENHA_WORKERS'] = ler_inteiro('SENHA_WORKERS', 2)
+    app.config['SENHA_FILA_MAX'] = ler_inteiro('SENHA_FILA_MAX', 8)
+    app.config['SENHA_TIMEOUT'] = ler_inteiro('SENHA_TIMEOUT', 10)
+    # Quantidade de proxies na frente da aplicação (Render: 1) para ler o IP real do X-Forwarded-For
+    app.config['PROXY_CONFIAVEL'] = ler_inteiro('PROXY_CONFIAVEL', 0)
+
+    # Logs estruturados ("json" por padrão em produção, "texto" em desenvolvimento)
+    app.config['LOG_NIVEL'] = os.getenv('LOG_NIVEL', 'INFO').upper()
+    app.config['LOG_FORMATO'] = os.getenv('LOG_FORMATO', 'texto' if app.config['DEBUG'] else 'json')
+    # Consultas SQL acima deste tempo (ms) são registradas no log com a rota
+    app.config['SQL_LENTA_MS'] = ler_inteiro('SQL_LENTA_MS', 200)
+    # Exige "Authorization: Bearer <token>" no /metrics; vazio desliga a rota (fora do modo debug e dos testes)
+    app.config['METRICAS_TOKEN'] = os.getenv('METRICAS_TOKEN', '')
+    # Exportação completa (todos os usuários) em /api/admin/exportar; vazio desliga a rota
+    app.config['EXPORTACAO_TOKEN'] = os.getenv('EXPORTACAO_TOKEN', '')
+
+def extensao_atual(nome):
+    """
+    Objeto da aplicação atual em app.extensions. Cada create_app() cria os seus
+    (caches, limitador, pool de senhas, threads de fundo), então duas aplicações
+    no mesmo processo (ex.: testes) não compartilham nem trocam o estado uma da outra.
+    """
+    return LocalProxy(lambda: current_app.extensions[nome])
+
+# ===============================================
+# SHARDS (dados de cada usuário em um de vários bancos)
+# ===============================================
+# Tabelas com os dados de um usuário: ficam todas no shard dele, então cada
+# transação de uma requisição (tarefa + versão do usuário) acontece em um banco só
+TABELAS_POR_USUARIO = ('usuario', 'tarefa', 'tarefa_removida', 'tarefa_arquivada')
+
+class ShardIndefinido(RuntimeError):
+    """Consulta a uma tabela de usuário sem saber em qual shard ele está."""
+
+class RoteadorShards:
+    """
+    Decide em qual banco ficam os dados de cada usuário. O shard novo é escolhido
+    pelo hash do id (rendezvous: ao acrescentar um shard só os usuários que passam
+    a pertencer a ele mudam) e fica anotado no diretório do banco principal, que
+    também é um shard; "flask mover-usuario" e "flask rebalancear" mudam a anotação.
+    Sem DATABASE_SHARDS tudo fica no principal e o diretório não é consultado.
+    """
+    PRINCIPAL = 'principal'
+
+    def __init__(self):
+        self.shards = (self.PRINCIPAL,)
+
+    def init_app(self, app):
+        self.shards = (self.PRINCIPAL,) + tuple(app.config['SQLALCHEMY_BINDS'])
+
+    @property
+    def ativo(self):
+        return len(self.shards) > 1
+
+    def motor(self, nome):
+        return db.engines[None if nome == self.PRINCIPAL else nome]
+
+    def shard_para(self, usuario_id):
+        return max(self.shards, key=lambda nome: hashlib.sha256(f'{nome}:{usuario_id}'.encode()).digest())
+
+    def shard_do_usuario(self, usuario_id):
+        """Shard anotado no diretório (None se o usuário não existe)."""
+        if not self.ativo:
+            return self.PRINCIPAL
+        entrada = db.session.get(DiretorioUsuario, usuario_id)
+        return entrada.shard if entrada else None
+
+    def entrar(self, nome):
+        """Direciona as consultas às tabelas de usuário para o shard, até o fim do contexto."""
+        g.shard = nome
+
+    @contextmanager
+    def usar(self, nome):
+        anterior = g.get('shard')
+        g.shard = nome
+        try:
+            yield nome
+        finally:
+            g.shard = anterior
+
+    def motor_atual(self):
+        nome = g.get('shard') if has_app_context() else None
+        if nome is None:
+            raise ShardIndefinido('Consulta a dados de usuário sem shard definido.')
+        return self.motor(nome)
+
+roteador_shards = extensao_atual('roteador_shards')
+
+def tabela_da_consulta(mapper, clause):
+    if mapper is not None:
+        return db.inspect(mapper).local_table
+    if isinstance(clause, Table):
+        return clause
+    if isinstance(clause, UpdateBase):
+        return clause.table
+    if isinstance(clause, Select):
+        tabelas = [tabela for tabela in clause.get_final_froms() if isinstance(tabela, Table)]
+        return tabelas[0] if tabelas else None
+    return None
+
+class SessaoPorUsuario(SessaoFlask):
+    """Sessão que manda as tabelas de usuário para o shard atual (roteador_shards.entrar/usar)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and roteador_shards.ativo:
+            tabela = tabela_da_consulta(mapper, clause)
+            if tabela is not None and tabela.name in TABELAS_POR_USUARIO:
+                return roteador_shards.motor_atual()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+# Extensões criadas sem aplicação e ligadas a ela em create_app(): importar este
+# módulo não abre conexão com o banco nem com o servidor de email
+db = SQLAlchemy(session_options={'class_': SessaoPorUsuario})
+login_manager = LoginManager()
+login_manager.login_view = 'principal.login'
+login_manager.login_message = 'Por favor, faça login para acessar esta página.'
+mail = Mail()
+
+# Rotas e comandos da aplicação (registrados em create_app)
+principal = Blueprint('principal', __name__, cli_group=None)
+
+def email_habilitado():
+    return 'mail' in current_app.extensions
+
+# ===============================================
+# INSTRUMENTAÇÃO (logs estruturados, métricas e consultas lentas)
+# ===============================================
+logger = logging.getLogger('mylife')
+
+# Atributos que todo LogRecord tem; o resto veio de extra={...}
+ATRIBUTOS_LOG = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+class FiltroRequisicao(logging.Filter):
+    """Anexa método, rota e usuário da requisição atual a cada registro de log."""
+
+    def filter(self, registro):
+        if has_request_context():
+            registro.metodo = request.method
+            registro.rota = rota_atual()
+            # Só lê o usuário já carregado (acessar current_user aqui poderia chamar o load_user)
+            usuario = g.get('_login_user')
+            if usuario is not None and usuario.is_authenticated:
+                registro.usuario_id = usuario.get_id()
+        return True
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por evento, com os campos extras no mesmo nível da mensagem."""
+
+    def format(self, registro):
+        dados = {
+            'momento': datetime.fromtimestamp(registro.created).isoformat(timespec='milliseconds'),
+            'nivel': registro.levelname,
+            'mensagem': registro.getMessage()
+        }
+        dados.update({chave: valor for chave, valor in vars(registro).items() if chave not in ATRIBUTOS_LOG})
+        if registro.exc_info:
+            dados['excecao'] = self.formatException(registro.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+class FormatadorTexto(logging.Formatter):
+    """Formato legível para o terminal: mensagem seguida dos campos extras."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(message)s', '%H:%M:%S')
+
+    def format(self, registro):
+        linha = super().format(registro)
+        extras = ' '.join(f'{chave}={valor}' for chave, valor in vars(registro).items() if chave not in ATRIBUTOS_LOG)
+        return f'{linha}  {extras}' if extras else linha
+
+def configurar_logs(app):
+    manipulador = logging.StreamHandler()
+    manipulador.setFormatter(FormatadorJson() if app.config['LOG_FORMATO'] == 'json' else FormatadorTexto())
+    manipulador.addFilter(FiltroRequisicao())
+    logger.handlers = [manipulador]
+    logger.setLevel(app.config['LOG_NIVEL'])
+    logger.propagate = False
+
+# Limites dos baldes dos histogramas (segundos e quantidade de consultas)
+BALDES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# nome -> (tipo, ajuda, baldes) no formato de exposição do Prometheus
+DESCRICAO_METRICAS = {
+    'mylife_requisicao_segundos': ('histogram', 'Latência das requisições por rota.', BALDES_SEGUNDOS),
+    'mylife_sql_consultas_por_requisicao': ('histogram', 'Consultas SQL executadas por requisição.', BALDES_CONSULTAS),
+    'mylife_sql_segundos_por_requisicao': ('histogram', 'Tempo total em SQL por requisição.', BALDES_SEGUNDOS),
+    'mylife_template_segundos': ('histogram', 'Tempo de renderização por template.', BALDES_SEGUNDOS),
+    'mylife_senha_segundos': ('histogram', 'Tempo do hash de senha (gerar e verificar).', BALDES_SEGUNDOS),
+    'mylife_sql_lentas_total': ('counter', 'Consultas SQL acima de SQL_LENTA_MS.', None)
+}
+
+class Metricas:
+    """
+    Histogramas e contadores em memória do processo (cada worker do gunicorn
+    expõe os seus; o Prometheus soma as séries de todas as instâncias).
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._series = {}
+
+    def init_app(self, app):
+        if not app.config['METRICAS_TOKEN'] and not (app.debug or app.testing):
+            logger.warning('METRICAS_TOKEN não definido: /metrics desativado. '
+                           'Defina o token e configure o Prometheus com "Authorization: Bearer <token>".')
+
+    def observar(self, nome, rotulos, valor):
+        baldes = DESCRICAO_METRICAS[nome][2]
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {'baldes': [0] * len(baldes), 'soma': 0.0, 'total': 0}
+            for posicao, limite in enumerate(baldes):
+                if valor <= limite:
+                    serie['baldes'][posicao] += 1
+                    break
+            serie['soma'] += valor
+            serie['total'] += 1
+
+    def incrementar(self, nome, rotulos, valor=1):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+    @staticmethod
+    def _rotulos(pares):
+        def escapar(valor):
+            return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return ','.join(f'{chave}="{escapar(valor)}"' for chave, valor in pares)
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (version 0.0.4)."""
+        with self._trava:
+            series = sorted(self._series.items(), key=lambda item: item[0])
+            series = [(chave, dict(valor, baldes=list(valor['baldes'])) if isinstance(valor, dict) else valor)
+                      for chave, valor in series]
+
+        linhas = []
+        nome_anterior = None
+        for (nome, pares), valor in series:
+            tipo, ajuda, baldes = DESCRICAO_METRICAS[nome]
+            if nome != nome_anterior:
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                nome_anterior = nome
+            if tipo == 'counter':
+                linhas.append(f'{nome}{{{self._rotulos(pares)}}} {valor}')
+                continue
+            acumulado = 0
+            for limite, quantidade in zip(baldes, valor['baldes']):
+                acumulado += quantidade
+                linhas.append(f'{nome}_bucket{{{self._rotulos(pares + (("le", limite),))}}} {acumulado}')
+            linhas.append(f'{nome}_bucket{{{self._rotulos(pares + (("le", "+Inf"),))}}} {valor["total"]}')
+            linhas.append(f'{nome}_sum{{{self._rotulos(pares)}}} {valor["soma"]:.6f}')
+            linhas.append(f'{nome}_count{{{self._rotulos(pares)}}} {valor["total"]}')
+        return '\n'.join(linhas) + '\n'
+
+metricas = extensao_atual('metricas')
+
+def rota_atual():
+    # Usa o padrão da rota (ex.: /deletar/<int:id>) para não criar uma série por id
+    return request.url_rule.rule if request.url_rule else 'desconhecida'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def iniciar_consulta(conexao, cursor, sql, parametros, contexto, executemany):
+    conexao.info.setdefault('inicio_consultas', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def registrar_consulta(conexao, cursor, sql, parametros, contexto, executemany):
+    duracao = time.perf_counter() - conexao.info['inicio_consultas'].pop()
+    rota = '-'
+    if has_request_context() and 'sql_consultas' in g:
+        g.sql_consultas += 1
+        g.sql_tempo += duracao
+        rota = rota_atual()
+
+    limite = current_app.config['SQL_LENTA_MS'] if has_app_context() else 200
+    if duracao * 1000 >= limite:
+        if has_app_context():
+            metricas.incrementar('mylife_sql_lentas_total', {'rota': rota})
+        logger.warning('Consulta lenta', extra={
+            'duracao_ms': round(duracao * 1000, 1),
+            'rota': rota,
+            'sql': ' '.join(sql.split())[:2000]
+        })
+
+def iniciar_template(remetente, template, context, **extra):
+    if has_request_context():
+        g.setdefault('inicio_templates', []).append(time.perf_counter())
+
+def registrar_template(remetente, template, context, **extra):
+    if has_request_context() and g.get('inicio_templates'):
+        duracao = time.perf_counter() - g.inicio_templates.pop()
+        g.template_tempo = g.get('template_tempo', 0.0) + duracao
+        metricas.observar('mylife_template_segundos', {'template': template.name or '-'}, duracao)
+
+def medir_senha(operacao, funcao, *argumentos):
+    inicio = time.perf_counter()
+    resultado = funcao(*argumentos)
+    duracao = time.perf_counter() - inicio
+    metricas.observar('mylife_senha_segundos', {'operacao': operacao}, duracao)
+    if has_request_context():
+        g.senha_tempo = g.get('senha_tempo', 0.0) + duracao
+    return resultado
+
+@principal.before_app_request
+def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    g.sql_consultas = 0
+    g.sql_tempo = 0.0
+
+@principal.after_app_request
+def registrar_medicao(resposta):
+    if 'inicio_requisicao' not in g:
+        return resposta
+    duracao = time.perf_counter() - g.inicio_requisicao
+    rota = rota_atual()
+    metricas.observar('mylife_requisicao_segundos',
+                      {'metodo': request.method, 'rota': rota, 'status': resposta.status_code}, duracao)
+    metricas.observar('mylife_sql_consultas_por_requisicao', {'rota': rota}, g.sql_consultas)
+    metricas.observar('mylife_sql_segundos_por_requisicao', {'rota': rota}, g.sql_tempo)
+
+    # Server-Timing: o DevTools do navegador mostra a divisão do tempo da requisição
+    partes = [f'sql;dur={g.sql_tempo * 1000:.1f};desc="{g.sql_consultas} consultas"']
+    if g.get('template_tempo'):
+        partes.append(f'tpl;dur={g.template_tempo * 1000:.1f}')
+    if g.get('senha_tempo'):
+        partes.append(f'senha;dur={g.senha_tempo * 1000:.1f}')
+    partes.append(f'total;dur={duracao * 1000:.1f}')
+    resposta.headers['Server-Timing'] = ', '.join(partes)
+    return resposta
+
+@principal.route('/metrics')
+def metricas_prometheus():
+    token = current_app.config['METRICAS_TOKEN']
+    # Sem token, só em desenvolvimento e nos testes: os rótulos mostram rotas e volume de uso
+    if not token:
+        if not (current_app.debug or current_app.testing):
+            return 'Métricas desativadas: defina METRICAS_TOKEN.', 404
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return 'Não autorizado.', 401
+    resposta = make_response(metricas.exportar())
+    resposta.mimetype = 'text/plain'
+    resposta.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    resposta.cache_control.no_store = True
+    return resposta
 
 # Modelo de Usuário
 class Usuario(UserMixin, db.Model):
@@ -86,18 +566,24 @@ class Usuario(UserMixin, db.Model):
     token_expiracao = db.Column(db.DateTime)
     tarefas = db.relationship('Tarefa', backref='usuario', lazy=True, cascade='all, delete-orphan')
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    # Incrementada a cada alteração nas tarefas (ETag do dashboard e cache de fragmentos)
+    versao_tarefas = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    tarefas_atualizadas_em = db.Column(db.DateTime)
+    # Lápides até esta versão já foram apagadas: quem sincroniza de antes dela recebe tudo
+    versao_minima_sync = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     def set_senha(self, senha):
-        self.senha_hash = generate_password_hash(senha)
+        self.senha_hash = medir_senha('gerar', generate_password_hash, senha)
 
     def check_senha(self, senha):
-        return check_password_hash(self.senha_hash, senha)
+        return medir_senha('verificar', check_password_hash, self.senha_hash, senha)
 
     def gerar_token_recuperacao(self):
         try:
             self.token_recuperacao = secrets.token_urlsafe(32)
             self.token_expiracao = datetime.utcnow() + timedelta(hours=1)
             db.session.commit()
+            cache_usuarios.invalidar(self.id)
             return self.token_recuperacao
         except Exception as e:
             db.session.rollback()
@@ -111,80 +597,1215 @@ class Tarefa(db.Model):
     data = db.Column(db.String(20))
     link = db.Column(db.String(500))
     feito = db.Column(db.Boolean, default=False)
+    prazo = db.Column(db.Date)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    # Quando foi concluída (vazio nas pendentes e nas concluídas antes da coluna existir)
+    concluida_em = db.Column(db.DateTime)
+    # Versão do usuário na última alteração (sincronização). Toda alteração zera a coluna e
+    # registrar_alteracao_tarefas() a preenche com a nova versão na mesma transação
+    versao = db.Column(db.Integer, onupdate=db.null())
+    # Prazo para ordenação: tarefas sem prazo vão para o fim (e o cursor nunca compara NULL)
+    prazo_ordem = db.column_property(db.func.coalesce(prazo, db.literal_column("'9999-12-31'", db.Date)))
+    # Repetição ("diaria", "semanal:0,2,4" ou "mensal:15"): só a ocorrência mais recente guarda a
+    # regra. proxima_ocorrencia é calculada ao salvar e é a fila do agendador (ver Lembretes)
+    recorrencia = db.Column(db.String(30))
+    proxima_ocorrencia = db.Column(db.Date)
+    # Lembrete por email no dia do prazo ("HH:MM") e o instante dele em UTC, vazio depois do envio
+    lembrete = db.Column(db.String(5))
+    lembrete_em = db.Column(db.DateTime)
+
+    def para_dict(self):
+        return {
+            'id': self.id,
+            'texto': self.texto,
+            'descricao': self.descricao or '',
+            'data': self.data or '',
+            'prazo': self.prazo.isoformat() if self.prazo else None,
+            'link': self.link or '',
+            'feito': bool(self.feito),
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'recorrencia': self.recorrencia,
+            'proxima_ocorrencia': self.proxima_ocorrencia.isoformat() if self.proxima_ocorrencia else None,
+            'lembrete': self.lembrete,
+            'versao': self.versao
+        }
+
+    __table_args__ = (
+        # Listagem do dashboard: pendentes primeiro, depois por criação
+        db.Index('ix_tarefa_usuario_feito_criacao', 'usuario_id', 'feito', 'data_criacao'),
+        # Consultas por intervalo de prazo (semana, calendário)
+        db.Index('ix_tarefa_usuario_prazo', 'usuario_id', 'prazo'),
+        # Ordenações da lista (por criação e por título)
+        db.Index('ix_tarefa_usuario_criacao', 'usuario_id', 'data_criacao'),
+        db.Index('ix_tarefa_usuario_texto', 'usuario_id', 'texto'),
+        # Sincronização: alterações depois de uma versão
+        db.Index('ix_tarefa_usuario_versao', 'usuario_id', 'versao'),
+        # Manutenção: concluídas há mais tempo que o limite do arquivo
+        db.Index('ix_tarefa_feito_concluida', 'feito', 'concluida_em'),
+        # Exportação: tarefas do usuário em ordem de id, um lote depois do outro
+        db.Index('ix_tarefa_usuario_id', 'usuario_id', 'id'),
+        # Filas do agendador (parciais: só as poucas tarefas com data marcada entram no índice)
+        db.Index('ix_tarefa_proxima_ocorrencia', 'proxima_ocorrencia',
+                 sqlite_where=db.text('proxima_ocorrencia IS NOT NULL'),
+                 postgresql_where=db.text('proxima_ocorrencia IS NOT NULL')),
+        db.Index('ix_tarefa_lembrete_em', 'lembrete_em',
+                 sqlite_where=db.text('lembrete_em IS NOT NULL'),
+                 postgresql_where=db.text('lembrete_em IS NOT NULL')),
+    )
+
+# Tarefas excluídas (lápides da sincronização): uma linha por exclusão, gravada por
+# gatilho no banco e carimbada com a versão por registrar_alteracao_tarefas()
+class TarefaRemovida(db.Model):
+    __tablename__ = 'tarefa_removida'
+    id = db.Column(db.Integer, primary_key=True)
+    tarefa_id = db.Column(db.Integer, nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'), nullable=False)
+    versao = db.Column(db.Integer)
+    removida_em = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('ix_tarefa_removida_usuario_versao', 'usuario_id', 'versao'),
+        db.Index('ix_tarefa_removida_removida_em', 'removida_em'),
+    )
+
+# Arquivo: tarefas concluídas há muito tempo, fora da tabela que o dashboard percorre
+class TarefaArquivada(db.Model):
+    __tablename__ = 'tarefa_arquivada'
+    id = db.Column(db.Integer, primary_key=True)
+    texto = db.Column(db.String(200), nullable=False)
+    descricao = db.Column(db.Text)
+    data = db.Column(db.String(20))
+    link = db.Column(db.String(500))
+    prazo = db.Column(db.Date)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id', ondelete='CASCADE'), nullable=False)
+    data_criacao = db.Column(db.DateTime)
+    concluida_em = db.Column(db.DateTime, nullable=False)
+    arquivada_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def para_dict(self):
+        return {
+            'id': self.id,
+            'texto': self.texto,
+            'descricao': self.descricao or '',
+            'data': self.data or '',
+            'prazo': self.prazo.isoformat() if self.prazo else None,
+            'link': self.link or '',
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'concluida_em': self.concluida_em.isoformat(),
+            'arquivada_em': self.arquivada_em.isoformat()
+        }
+
+    __table_args__ = (
+        # Página do arquivo: concluídas mais recentes primeiro
+        db.Index('ix_tarefa_arquivada_usuario_concluida', 'usuario_id', 'concluida_em', 'id'),
+        # Exportação em ordem de id
+        db.Index('ix_tarefa_arquivada_usuario_id', 'usuario_id', 'id'),
+    )
+
+# Diretório dos usuários (banco principal): o email leva ao id e ao shard com os dados.
+# Também distribui os ids, únicos entre os shards. Só é consultado com DATABASE_SHARDS
+class DiretorioUsuario(db.Model):
+    __tablename__ = 'diretorio_usuario'
+    id = db.Column(db.Integer, primary_key=True)
+    # Em minúsculas: o login não diferencia maiúsculas
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    shard = db.Column(db.String(50), nullable=False)
+
+# Controle das tarefas periódicas entre workers: quem atualiza proxima_execucao executa
+class Agendamento(db.Model):
+    __tablename__ = 'agendamento'
+    nome = db.Column(db.String(50), primary_key=True)
+    proxima_execucao = db.Column(db.DateTime)
+    ultima_execucao = db.Column(db.DateTime)
+    ultimo_resultado = db.Column(db.Text)
+
+# Ordenação por prazo: mesma expressão da coluna prazo_ordem (índice de expressão)
+db.Index('ix_tarefa_usuario_prazo_ordem', Tarefa.usuario_id, Tarefa.prazo_ordem.expression)
+
+# Índice funcional para as buscas de email case-insensitive (lower(email) = ...)
+db.Index('ix_usuario_email_lower', db.func.lower(Usuario.email))
+
+# Modelo da fila de emails (outbox): cada linha é um email aguardando envio
+class EmailPendente(db.Model):
+    __tablename__ = 'email_pendente'
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    assunto = db.Column(db.String(200), nullable=False)
+    corpo = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pendente', nullable=False)
+    tentativas = db.Column(db.Integer, default=0, nullable=False)
+    proxima_tentativa = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    reservado_por = db.Column(db.String(32))
+    ultimo_erro = db.Column(db.String(500))
+    enviado_em = db.Column(db.DateTime)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_email_pendente_status_proxima', 'status', 'proxima_tentativa'),
+    )
+
+# Conversão de valores de colunas para JSON e de volta (cursores e cache)
+def serializar_valor(valor):
+    return valor.isoformat() if isinstance(valor, (datetime, date)) else valor
+
+def converter_valor(coluna, valor):
+    if valor is None:
+        return None
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    return tipo(valor)
+
+# ===============================================
+# CACHE DE USUÁRIOS (evita a consulta do load_user a cada requisição)
+# ===============================================
+class BackendMemoria:
+    """LRU em memória com expiração. Também serve de substituto local do Redis."""
+
+    def __init__(self, capacidade=1024):
+        self.capacidade = capacidade
+        self._dados = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor, ttl):
+        with self._trava:
+            self._dados[chave] = (valor, time.monotonic() + ttl)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+
+    def remover(self, chave):
+        with self._trava:
+            self._dados.pop(chave, None)
+
+    def incrementar(self, chave, ttl):
+        with self._trava:
+            agora = time.monotonic()
+            valor, expira_em = self._dados.get(chave, (0, 0))
+            if expira_em < agora:
+                valor, expira_em = 0, agora + ttl
+            self._dados[chave] = (valor + 1, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+            return valor + 1
+
+class BackendRedis:
+    """Cache compartilhado entre os workers do gunicorn (requer o pacote redis)."""
+
+    def __init__(self, url):
+        import redis
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def obter(self, chave):
+        bruto = self._cliente.get(chave)
+        return json.loads(bruto) if bruto else None
+
+    def guardar(self, chave, valor, ttl):
+        self._cliente.set(chave, json.dumps(valor), ex=ttl)
+
+    def remover(self, chave):
+        self._cliente.delete(chave)
+
+    def incrementar(self, chave, ttl):
+        pipeline = self._cliente.pipeline()
+        pipeline.incr(chave)
+        pipeline.expire(chave, ttl)
+        return pipeline.execute()[0]
+
+class CacheUsuarios:
+    """
+    Guarda por alguns segundos as colunas que as páginas leem de current_user
+    (nunca o hash da senha nem o token de recuperação) e o shard do usuário.
+    Deve ser invalidado sempre que a linha do usuário mudar; se o backend
+    falhar, a consulta vai direto ao banco. O BackendMemoria é de cada worker:
+    invalidar nele não avisa os outros, que podem ficar até o TTL com a versão
+    antiga. Por isso, sem Redis, vale o USUARIO_CACHE_TTL_MEMORIA (menor).
+    """
+    CAMPOS = ('id', 'nome', 'email', 'nome_lista', 'data_criacao')
+
+    def __init__(self):
+        self.backend = BackendMemoria()
+        self.ttl = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def init_app(self, app):
+        self.ttl = app.config['USUARIO_CACHE_TTL']
+        self.backend = BackendMemoria(app.config['USUARIO_CACHE_TAMANHO'])
+        url_redis = app.config['USUARIO_CACHE_REDIS_URL']
+        if url_redis:
+            try:
+                self.backend = BackendRedis(url_redis)
+            except ImportError:
+                logger.warning('Pacote redis não instalado. Usando cache de usuários em memória.')
+        if isinstance(self.backend, BackendMemoria):
+            self.ttl = min(self.ttl, app.config['USUARIO_CACHE_TTL_MEMORIA'])
+
+    @staticmethod
+    def chave(usuario_id):
+        return f'usuario:{usuario_id}'
+
+    def obter(self, usuario_id):
+        dados = None
+        if self.ttl > 0:
+            try:
+                dados = self.backend.obter(self.chave(usuario_id))
+            except Exception as e:
+                logger.warning('Erro ao ler o cache de usuários', extra={'erro': str(e)})
+        if dados is None:
+            self.falhas += 1
+        else:
+            self.acertos += 1
+        return dados
+
+    def guardar(self, usuario, shard):
+        if self.ttl <= 0:
+            return
+        dados = {campo: serializar_valor(getattr(usuario, campo)) for campo in self.CAMPOS}
+        dados['shard'] = shard
+        try:
+            self.backend.guardar(self.chave(usuario.id), dados, self.ttl)
+        except Exception as e:
+            logger.warning('Erro ao gravar o cache de usuários', extra={'erro': str(e)})
+
+    def invalidar(self, usuario_id):
+        self.invalidacoes += 1
+        try:
+            self.backend.remover(self.chave(usuario_id))
+        except Exception as e:
+            logger.warning('Erro ao invalidar o cache de usuários', extra={'erro': str(e)})
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'invalidacoes': self.invalidacoes,
+            'taxa_acerto': round(self.acertos / consultas, 4) if consultas else 0.0
+        }
+
+cache_usuarios = extensao_atual('cache_usuarios')
+
+# ===============================================
+# LIMITE DE TENTATIVAS DE LOGIN E VERIFICAÇÃO DE SENHA
+# ===============================================
+class LimitadorTentativas:
+    """
+    Contador de janela deslizante por chave (ex.: "ip:1.2.3.4", "conta:email"):
+    soma a janela atual com a fração ainda válida da anterior. Usa o backend
+    em memória ou o Redis compartilhado; se o backend falhar, não bloqueia ninguém.
+    """
+
+    def __init__(self):
+        self.backend = BackendMemoria()
+        self.janela = 300
+
+    def init_app(self, app):
+        self.janela = max(app.config['LOGIN_JANELA'], 1)
+        self.backend = BackendMemoria(app.config['LOGIN_LIMITE_TAMANHO'])
+        url_redis = app.config['LOGIN_LIMITE_REDIS_URL']
+        if url_redis:
+            try:
+                self.backend = BackendRedis(url_redis)
+            except ImportError:
+                logger.warning('Pacote redis não instalado. Usando limite de login em memória.')
+
+    def _janelas(self, chave):
+        agora = time.time()
+        indice = int(agora // self.janela)
+        decorrido = (agora % self.janela) / self.janela
+        return f'tentativas:{chave}:{indice}', f'tentativas:{chave}:{indice - 1}', decorrido
+
+    def contar(self, chave):
+        atual, anterior, decorrido = self._janelas(chave)
+        try:
+            return (self.backend.obter(atual) or 0) + (self.backend.obter(anterior) or 0) * (1 - decorrido)
+        except Exception as e:
+            logger.warning('Erro ao ler o limite de login', extra={'erro': str(e)})
+            return 0
+
+    def excedido(self, limites):
+        """limites: {chave: máximo na janela}; máximo 0 desativa a chave."""
+        return any(maximo > 0 and self.contar(chave) >= maximo for chave, maximo in limites.items())
+
+    def registrar(self, chaves):
+        for chave in chaves:
+            try:
+                self.backend.incrementar(self._janelas(chave)[0], self.janela * 2)
+            except Exception as e:
+                logger.warning('Erro ao gravar o limite de login', extra={'erro': str(e)})
+
+    def limpar(self, chave):
+        atual, anterior, _ = self._janelas(chave)
+        try:
+            self.backend.remover(atual)
+            self.backend.remover(anterior)
+        except Exception as e:
+            logger.warning('Erro ao limpar o limite de login', extra={'erro': str(e)})
+
+    def segundos_restantes(self):
+        return int(self.janela - time.time() % self.janela) + 1
+
+limitador_login = extensao_atual('limitador_login')
+
+class SobrecargaSenhas(Exception):
+    """Todas as vagas do verificador de senhas estão ocupadas."""
+
+class VerificadorSenhas:
+    """
+    Executa o check_password_hash (KDF, caro de propósito) em um pool de threads
+    limitado: no máximo SENHA_WORKERS hashes em paralelo e SENHA_FILA_MAX
+    esperando, por processo. Além disso a requisição é recusada na hora em vez
+    de disputar a CPU com as outras. O hashlib libera o GIL durante o KDF.
+    Pedidos suspeitos (IP com tentativas erradas recentes ou conta sob ataque)
+    ocupam no máximo metade dos workers: o resto do pool fica para os outros.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._vagas = None
+        self._vagas_suspeitas = None
+        self.timeout = 10
+
+    def init_app(self, app):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if cooperativo():
+            # Com o monkey patching as threads viram greenlets e o KDF travaria o worker
+            # inteiro; o pool do gevent usa threads reais do sistema
+            from gevent.threadpool import ThreadPoolExecutor as ThreadPoolGevent
+            self._executor = ThreadPoolGevent(max_workers=max(app.config['SENHA_WORKERS'], 1))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max(app.config['SENHA_WORKERS'], 1),
+                                                thread_name_prefix='verificador-senha')
+        self._vagas = threading.BoundedSemaphore(max(app.config['SENHA_WORKERS'], 1) + app.config['SENHA_FILA_MAX'])
+        self._vagas_suspeitas = threading.BoundedSemaphore(max(app.config['SENHA_WORKERS'] // 2, 1))
+        self.timeout = app.config['SENHA_TIMEOUT']
+
+    def _executar(self, senha_hash, senha, suspeito):
+        reservadas = []
+        for vagas in ((self._vagas, self._vagas_suspeitas) if suspeito else (self._vagas,)):
+            if not vagas.acquire(blocking=False):
+                for vaga in reservadas:
+                    vaga.release()
+                raise SobrecargaSenhas()
+            reservadas.append(vagas)
+
+        def liberar(_):
+            for vaga in reservadas:
+                vaga.release()
+
+        try:
+            futuro = self._executor.submit(check_password_hash, senha_hash, senha)
+        except Exception:
+            liberar(None)
+            raise
+        futuro.add_done_callback(liberar)
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TempoEsgotado:
+            raise SobrecargaSenhas()
+
+    def verificar(self, senha_hash, senha, suspeito=False):
+        return medir_senha('verificar', self._executar, senha_hash, senha, suspeito)
+
+verificador_senhas = extensao_atual('verificador_senhas')
 
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        return Usuario.query.get(int(user_id))
+        usuario_id = int(user_id)
     except (ValueError, TypeError):
         return None
 
-# Função auxiliar para calcular semana
-def obter_semana():
-    hoje = datetime.now()
-    inicio_semana = hoje - timedelta(days=hoje.weekday())
-    dias_semana = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-    meses = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
-             'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
-    
-    hoje_str = hoje.strftime('%d/%m')
-    semana = []
-    for i in range(7):
-        dia = inicio_semana + timedelta(days=i)
-        dia_str = dia.strftime('%d/%m')
-        semana.append({
-            'dia': dia_str,
-            'dia_semana': dias_semana[i],
-            'dia_numero': dia.day,
-            'mes': meses[dia.month - 1],
-            'ano': dia.year,
-            'e_hoje': dia_str == hoje_str
+    # O shard fica guardado junto com o usuário: com o cache válido nem o diretório é consultado
+    dados = cache_usuarios.obter(usuario_id)
+    if dados is not None and 'shard' in dados and roteador_shards.ativo:
+        # O cache de outro worker pode ser de antes de um mover-usuario, que apaga a linha do
+        # shard antigo: confere pela chave primária no shard (o banco que a requisição vai usar)
+        # e, se o usuário não estiver lá, volta ao diretório
+        roteador_shards.entrar(dados['shard'])
+        if db.session.execute(db.select(Usuario.id).where(Usuario.id == usuario_id)).first() is None:
+            cache_usuarios.invalidar(usuario_id)
+            dados = None
+    if dados is None or 'shard' not in dados:
+        shard = roteador_shards.shard_do_usuario(usuario_id)
+        if shard is None:
+            return None
+        roteador_shards.entrar(shard)
+        usuario = db.session.get(Usuario, usuario_id)
+        if usuario:
+            cache_usuarios.guardar(usuario, shard)
+        return usuario
+
+    roteador_shards.entrar(dados['shard'])
+    # Reconstrói o usuário a partir do cache e o anexa à sessão sem consultar o banco,
+    # para que alterações em current_user continuem sendo salvas normalmente. As
+    # colunas fora do cache (senha, token) são lidas do banco se alguém as acessar
+    colunas = Usuario.__table__.columns
+    usuario = Usuario(**{campo: converter_valor(colunas[campo], dados.get(campo)) for campo in CacheUsuarios.CAMPOS})
+    make_transient_to_detached(usuario)
+    return db.session.merge(usuario, load=False)
+
+def buscar_usuario_por_email(email):
+    """Usuário com o email (sem diferenciar maiúsculas); o shard dele passa a ser o da requisição."""
+    email = email.strip().lower()
+    if not roteador_shards.ativo:
+        roteador_shards.entrar(RoteadorShards.PRINCIPAL)
+        return Usuario.query.filter(db.func.lower(Usuario.email) == email).first()
+    entrada = DiretorioUsuario.query.filter_by(email=email).first()
+    if entrada is None:
+        return None
+    roteador_shards.entrar(entrada.shard)
+    return db.session.get(Usuario, entrada.id)
+
+def buscar_usuario_por_token(token):
+    """Usuário com o token de recuperação de senha, procurado em cada shard (é raro)."""
+    for shard in roteador_shards.shards:
+        roteador_shards.entrar(shard)
+        usuario = Usuario.query.filter_by(token_recuperacao=token).first()
+        if usuario:
+            return usuario
+    return None
+
+def criar_usuario(nome, email, senha):
+    """
+    Cadastra o usuário. Com shards o id vem do diretório (banco principal) e o
+    usuário vai para o shard escolhido pelo id. O shard é confirmado antes do
+    diretório: se ele falhar nada foi gravado e o email continua livre; se o
+    diretório falhar depois, o usuário é apagado do shard. Email repetido: IntegrityError.
+    """
+    usuario = Usuario(nome=nome, email=email)
+    usuario.set_senha(senha)
+    if not roteador_shards.ativo:
+        roteador_shards.entrar(RoteadorShards.PRINCIPAL)
+        db.session.add(usuario)
+        db.session.commit()
+        return usuario
+
+    entrada = DiretorioUsuario(email=email.strip().lower(), shard=RoteadorShards.PRINCIPAL)
+    gravado_no_shard = False
+    try:
+        # A entrada (ainda não confirmada) reserva o id e o email
+        db.session.add(entrada)
+        db.session.flush()
+        entrada.shard = roteador_shards.shard_para(entrada.id)
+        usuario.id = entrada.id
+        roteador_shards.entrar(entrada.shard)
+        if entrada.shard == RoteadorShards.PRINCIPAL:
+            # Mesmo banco do diretório: uma transação só
+            db.session.add(usuario)
+        else:
+            with roteador_shards.motor(entrada.shard).begin() as conexao:
+                conexao.execute(db.insert(Usuario).values({
+                    coluna.key: getattr(usuario, coluna.key) for coluna in Usuario.__table__.columns
+                    if getattr(usuario, coluna.key) is not None
+                }))
+            gravado_no_shard = True
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if gravado_no_shard:
+            try:
+                with roteador_shards.motor(entrada.shard).begin() as conexao:
+                    apagar_dados_usuario(conexao, usuario.id)
+            except Exception:
+                logger.exception('Usuário sem entrada no diretório ficou no shard', extra={'shard': entrada.shard})
+        raise
+    return usuario
+
+@login_manager.unauthorized_handler
+def nao_autorizado():
+    # A API responde 401 em JSON; as páginas continuam redirecionando para o login
+    if request.path.startswith('/api/'):
+        return jsonify({'erro': 'Autenticação necessária.'}), 401
+    flash(login_manager.login_message, 'info')
+    return redirect(login_url(login_manager.login_view, next_url=request.url))
+
+# ===============================================
+# FILA DE EMAILS (envio em segundo plano)
+# ===============================================
+class DespachanteEmail:
+    """
+    Envia em uma thread os emails gravados na tabela email_pendente.
+    Cada lote é reservado com um único UPDATE (seguro com vários workers do
+    gunicorn), enviado pela mesma conexão SMTP enquanto houver emails vencidos
+    e, em caso de falha, reagendado com espera exponencial.
+    """
+    # Tempo que um lote fica reservado antes de outro worker poder assumi-lo
+    RESERVA = timedelta(minutes=5)
+
+    def __init__(self):
+        self.app = None
+        self._evento = threading.Event()
+        self._trava = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def iniciar(self):
+        with self._trava:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='despachante-email', daemon=True)
+                self._thread.start()
+
+    def acordar(self):
+        if self.app.config['EMAIL_FILA_THREAD']:
+            self.iniciar()
+            self._evento.set()
+
+    def _executar(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.processar_fila()
+            except Exception as e:
+                logger.exception('Erro no envio da fila de emails')
+            self._evento.wait(self.app.config['EMAIL_FILA_INTERVALO'])
+            self._evento.clear()
+
+    def reservar_lote(self):
+        agora = datetime.utcnow()
+        token = secrets.token_hex(8)
+        vencidos = db.session.query(EmailPendente.id).filter(
+            EmailPendente.status == 'pendente',
+            EmailPendente.proxima_tentativa <= agora
+        ).order_by(EmailPendente.proxima_tentativa).limit(self.app.config['EMAIL_FILA_LOTE'])
+
+        EmailPendente.query.filter(
+            EmailPendente.id.in_(vencidos.scalar_subquery()),
+            EmailPendente.status == 'pendente',
+            EmailPendente.proxima_tentativa <= agora
+        ).update({
+            EmailPendente.reservado_por: token,
+            EmailPendente.proxima_tentativa: agora + self.RESERVA
+        }, synchronize_session=False)
+        db.session.commit()
+        return EmailPendente.query.filter_by(reservado_por=token, status='pendente').all()
+
+    def registrar_falha(self, email, erro):
+        email.tentativas += 1
+        email.ultimo_erro = str(erro)[:500]
+        email.reservado_por = None
+        if email.tentativas >= self.app.config['EMAIL_MAX_TENTATIVAS']:
+            email.status = 'falhou'
+        else:
+            # Espera exponencial: 1, 2, 4, 8... minutos (máximo de 1 hora)
+            espera = min(60 * 2 ** (email.tentativas - 1), 3600)
+            email.proxima_tentativa = datetime.utcnow() + timedelta(seconds=espera)
+
+    def processar_fila(self):
+        """Envia lotes enquanto houver emails vencidos. Retorna quantos foram enviados."""
+        if 'mail' not in self.app.extensions:
+            return 0
+
+        lote = self.reservar_lote()
+        if not lote:
+            return 0
+
+        enviados = 0
+        remetente = self.app.config.get('MAIL_DEFAULT_SENDER') or self.app.config['MAIL_USERNAME']
+        try:
+            with mail.connect() as conexao:
+                while lote:
+                    for indice, email in enumerate(lote):
+                        try:
+                            conexao.send(Message(subject=email.assunto, sender=remetente,
+                                                 recipients=[email.destinatario], body=email.corpo))
+                            email.status = 'enviado'
+                            email.enviado_em = datetime.utcnow()
+                            email.reservado_por = None
+                            enviados += 1
+                        except smtplib.SMTPServerDisconnected as e:
+                            # Conexão perdida: devolve o restante do lote para a fila
+                            for restante in lote[indice:]:
+                                self.registrar_falha(restante, e)
+                            raise
+                        except Exception as e:
+                            self.registrar_falha(email, e)
+                    db.session.commit()
+                    lote = self.reservar_lote()
+        except Exception as e:
+            # Falha ao conectar (ou conexão perdida): os emails reservados voltam para a fila
+            for email in lote:
+                if email.status == 'pendente' and email.reservado_por:
+                    self.registrar_falha(email, e)
+            db.session.commit()
+            logger.error('Erro de conexão SMTP', extra={'erro': str(e)})
+        return enviados
+
+despachante_email = extensao_atual('despachante_email')
+
+def enfileirar_email(destinatario, assunto, corpo):
+    """Grava o email na fila e avisa o despachante; não faz nenhuma conexão SMTP."""
+    db.session.add(EmailPendente(destinatario=destinatario, assunto=assunto, corpo=corpo))
+    db.session.commit()
+    despachante_email.acordar()
+
+@principal.before_app_request
+def iniciar_despachante_email():
+    # Na primeira requisição do worker, retoma os emails que ficaram na fila
+    if despachante_email._thread is None and email_habilitado():
+        despachante_email.acordar()
+
+@principal.cli.command('enviar-emails')
+@click.option('--continuo', is_flag=True, help='Continua aguardando novos emails em vez de sair.')
+def enviar_emails_comando(continuo):
+    """Envia os emails pendentes da fila (útil para rodar em um processo separado)."""
+    enviados = despachante_email.processar_fila()
+    click.echo(f"📧 Emails enviados: {enviados}")
+    while continuo:
+        despachante_email._evento.wait(current_app.config['EMAIL_FILA_INTERVALO'])
+        enviados = despachante_email.processar_fila()
+        if enviados:
+            click.echo(f"📧 Emails enviados: {enviados}")
+
+# ===============================================
+# CACHE HTTP DO DASHBOARD (versão das tarefas, ETag e arquivos estáticos)
+# ===============================================
+impressoes_digitais = {}
+
+def impressao_digital(caminho):
+    """Hash curto do conteúdo de um arquivo (recalculado a cada chamada em modo debug)."""
+    if current_app.debug or caminho not in impressoes_digitais:
+        with open(caminho, 'rb') as arquivo:
+            impressoes_digitais[caminho] = hashlib.md5(arquivo.read()).hexdigest()[:12]
+    return impressoes_digitais[caminho]
+
+def url_estatico(arquivo):
+    """URL de um arquivo estático com a impressão digital do conteúdo (pode ter cache longo)."""
+    versao = impressao_digital(os.path.join(current_app.static_folder, arquivo))
+    return url_for('static', filename=arquivo, v=versao)
+
+@principal.after_app_request
+def cache_estaticos(resposta):
+    # Arquivos com impressão digital na URL nunca mudam: cache de 1 ano
+    if request.endpoint == 'static' and 'v' in request.args and resposta.status_code == 200:
+        resposta.cache_control.no_cache = None
+        resposta.cache_control.public = True
+        resposta.cache_control.max_age = 31536000
+        resposta.cache_control.immutable = True
+    return resposta
+
+def registrar_alteracao_tarefas(usuario_id):
+    """
+    Incrementa a versão das tarefas do usuário (na mesma transação da alteração) e
+    carimba com ela as tarefas alteradas e as exclusões, que estão sem versão.
+    """
+    Usuario.query.filter_by(id=usuario_id).update({
+        Usuario.versao_tarefas: Usuario.versao_tarefas + 1,
+        Usuario.tarefas_atualizadas_em: datetime.utcnow()
+    }, synchronize_session=False)
+    versao = db.select(Usuario.versao_tarefas).where(Usuario.id == usuario_id).scalar_subquery()
+    for modelo in (Tarefa, TarefaRemovida):
+        db.session.execute(
+            db.update(modelo).where(modelo.usuario_id == usuario_id, modelo.versao.is_(None)).values(versao=versao),
+            execution_options={'synchronize_session': False}
+        )
+
+cache_fragmentos = extensao_atual('cache_fragmentos')
+
+# Converte o texto do campo "data" em uma data real (aceita AAAA-MM-DD e DD/MM/AAAA)
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y')
+
+def converter_prazo(texto):
+    texto = (texto or '').strip()
+    if not texto:
+        return None
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+# Migração do esquema para bancos criados antes das colunas/índices atuais
+def migrar_banco():
+    """
+    Aplica as alterações de esquema que o db.create_all() não faz em tabelas já
+    existentes: adiciona as colunas novas dos modelos, preenche tarefa.prazo a
+    partir do texto de tarefa.data e cria os índices que estiverem faltando.
+    Com DATABASE_SHARDS também cria as tabelas de usuário em cada shard e anota
+    no diretório os usuários do banco principal.
+    Pode ser executada várias vezes sem efeito colateral (SQLite e PostgreSQL).
+    """
+    for shard in roteador_shards.shards:
+        motor = roteador_shards.motor(shard)
+        if shard != RoteadorShards.PRINCIPAL:
+            db.metadata.create_all(motor, tables=[db.metadata.tables[nome] for nome in TABELAS_POR_USUARIO])
+        migrar_motor(motor)
+    if roteador_shards.ativo:
+        preencher_diretorio()
+
+def migrar_motor(motor):
+    """Migrações de um banco (o principal ou um shard)."""
+    inspetor = db.inspect(motor)
+    for tabela in (Usuario.__table__, Tarefa.__table__):
+        existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in existentes:
+                continue
+            tipo = coluna.type.compile(dialect=motor.dialect)
+            padrao = f' DEFAULT {coluna.server_default.arg}' if coluna.server_default is not None else ''
+            nulo = ' NOT NULL' if not coluna.nullable and padrao else ''
+            with motor.begin() as conexao:
+                conexao.execute(db.text(f'ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}{padrao}{nulo}'))
+            logger.info('Coluna criada', extra={'tabela': tabela.name, 'coluna': coluna.name})
+            if tabela is Tarefa.__table__ and coluna.name == 'prazo':
+                preencher_prazos(motor)
+            if tabela is Tarefa.__table__ and coluna.name == 'versao':
+                preencher_versoes(motor)
+
+    # Criar os índices declarados nos modelos que ainda não existem
+    # (IF NOT EXISTS também cobre índices funcionais, que o inspetor não enxerga)
+    with motor.begin() as conexao:
+        for tabela in (Usuario.__table__, Tarefa.__table__, TarefaArquivada.__table__):
+            for indice in tabela.indexes:
+                conexao.execute(CreateIndex(indice, if_not_exists=True))
+
+    criar_busca_textual(motor)
+    criar_registro_exclusoes(motor)
+
+def preencher_prazos(motor):
+    """Converte o texto de tarefa.data na coluna tarefa.prazo (tarefas antigas)."""
+    with motor.begin() as conexao:
+        linhas = conexao.execute(db.text(
+            "SELECT id, data FROM tarefa WHERE data IS NOT NULL AND data <> ''"
+        )).all()
+        atualizacoes = [
+            {'id': id_tarefa, 'prazo': prazo}
+            for id_tarefa, prazo in ((linha.id, converter_prazo(linha.data)) for linha in linhas)
+            if prazo is not None
+        ]
+        if atualizacoes:
+            conexao.execute(db.text('UPDATE tarefa SET prazo = :prazo WHERE id = :id'), atualizacoes)
+    logger.info('Prazos convertidos', extra={'quantidade': len(atualizacoes)})
+
+def preencher_versoes(motor):
+    """Dá uma versão às tarefas antigas (a versão do dono + 1), para aparecerem na sincronização."""
+    with motor.begin() as conexao:
+        conexao.execute(db.text(
+            'UPDATE usuario SET versao_tarefas = versao_tarefas + 1 '
+            'WHERE id IN (SELECT usuario_id FROM tarefa WHERE versao IS NULL)'
+        ))
+        atualizadas = conexao.execute(db.text(
+            'UPDATE tarefa SET versao = (SELECT versao_tarefas FROM usuario WHERE usuario.id = tarefa.usuario_id) '
+            'WHERE versao IS NULL'
+        )).rowcount
+    logger.info('Versões das tarefas preenchidas', extra={'quantidade': atualizadas})
+
+def preencher_diretorio():
+    """Anota no diretório (shard principal) os usuários do banco principal que ainda não estão nele."""
+    with db.engine.begin() as conexao:
+        adicionados = conexao.execute(db.insert(DiretorioUsuario).from_select(
+            ['id', 'email', 'shard'],
+            db.select(Usuario.id, db.func.lower(Usuario.email), db.literal(RoteadorShards.PRINCIPAL))
+            .where(~db.exists().where(DiretorioUsuario.id == Usuario.id))
+        )).rowcount
+        if conexao.dialect.name == 'postgresql':
+            # Ids gravados explicitamente não avançam a sequência: o próximo cadastro continua depois deles
+            conexao.execute(db.text(
+                "SELECT setval(pg_get_serial_sequence('diretorio_usuario', 'id'), "
+                "(SELECT coalesce(max(id), 1) FROM diretorio_usuario))"
+            ))
+    if adicionados:
+        logger.info('Diretório de usuários preenchido', extra={'quantidade': adicionados})
+
+# ===============================================
+# BUSCA TEXTUAL (FTS5 no SQLite, tsvector + GIN no PostgreSQL)
+# ===============================================
+# SQLite: tabela FTS5 de conteúdo externo (não duplica o texto) mantida pelos
+# gatilhos. usuario_id também é indexado para a busca filtrar pelo dono dentro
+# do próprio índice; prefix='2 3' acelera as buscas por prefixo curtas.
+SQL_BUSCA_SQLITE = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tarefa_busca USING fts5(
+        usuario_id, texto, descricao,
+        content='tarefa', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tarefa_busca_insercao AFTER INSERT ON tarefa BEGIN
+        INSERT INTO tarefa_busca(rowid, usuario_id, texto, descricao)
+        VALUES (new.id, new.usuario_id, new.texto, new.descricao);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tarefa_busca_exclusao AFTER DELETE ON tarefa BEGIN
+        INSERT INTO tarefa_busca(tarefa_busca, rowid, usuario_id, texto, descricao)
+        VALUES ('delete', old.id, old.usuario_id, old.texto, old.descricao);
+    END""",
+    # Só reindexa quando o texto muda (concluir/reverter não tocam no índice)
+    """CREATE TRIGGER IF NOT EXISTS tarefa_busca_alteracao AFTER UPDATE OF usuario_id, texto, descricao ON tarefa BEGIN
+        INSERT INTO tarefa_busca(tarefa_busca, rowid, usuario_id, texto, descricao)
+        VALUES ('delete', old.id, old.usuario_id, old.texto, old.descricao);
+        INSERT INTO tarefa_busca(rowid, usuario_id, texto, descricao)
+        VALUES (new.id, new.usuario_id, new.texto, new.descricao);
+    END"""
+)
+
+# PostgreSQL: coluna gerada (preenchida pelo próprio banco, inclusive nas linhas
+# antigas) com o título valendo mais que a descrição no ranking
+SQL_BUSCA_POSTGRES = (
+    """ALTER TABLE tarefa ADD COLUMN IF NOT EXISTS busca tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(texto, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(descricao, '')), 'B')
+    ) STORED""",
+    'CREATE INDEX IF NOT EXISTS ix_tarefa_busca ON tarefa USING GIN (busca)'
+)
+
+def criar_busca_textual(motor):
+    """Cria o índice de busca no banco; no SQLite indexa as tarefas já existentes."""
+    dialeto = motor.dialect.name
+    with motor.begin() as conexao:
+        if dialeto == 'sqlite':
+            existia = conexao.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tarefa_busca'"
+            )).first() is not None
+            for comando in SQL_BUSCA_SQLITE:
+                conexao.execute(db.text(comando))
+            if not existia:
+                conexao.execute(db.text("INSERT INTO tarefa_busca(tarefa_busca) VALUES ('rebuild')"))
+                logger.info('Índice de busca (FTS5) criado')
+        elif dialeto == 'postgresql':
+            for comando in SQL_BUSCA_POSTGRES:
+                conexao.execute(db.text(comando))
+
+def termos_busca(texto):
+    """Separa o texto digitado em palavras (sem operadores da sintaxe de busca)."""
+    return re.findall(r'\w+', texto or '')[:10]
+
+def consulta_tsquery(termos):
+    return db.func.to_tsquery('simple', ' & '.join(f'{termo}:*' for termo in termos))
+
+def expressao_fts(usuario_id, termos):
+    return f'usuario_id : "{int(usuario_id)}" AND ' + ' '.join(f'"{termo}"*' for termo in termos)
+
+def consulta_busca(usuario_id, termos):
+    """
+    Subconsulta (id, pontuacao) com as tarefas do usuário que contêm todas as
+    palavras como prefixo. Menor pontuação = mais relevante.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        consulta_ts = consulta_tsquery(termos)
+        busca = db.literal_column('tarefa.busca')
+        pontuacao = -db.func.ts_rank(busca, consulta_ts)
+        consulta = db.select(Tarefa.id.label('id'), db.type_coerce(pontuacao, db.Float).label('pontuacao')).where(
+            Tarefa.usuario_id == usuario_id,
+            busca.op('@@')(consulta_ts)
+        )
+    else:
+        # bm25: pesos por coluna (usuario_id não conta, título vale mais que a descrição)
+        tabela = db.literal_column('tarefa_busca')
+        pontuacao = db.func.bm25(tabela, 0.0, 10.0, 1.0)
+        consulta = db.select(
+            db.literal_column('rowid', db.Integer).label('id'),
+            db.type_coerce(pontuacao, db.Float).label('pontuacao')
+        ).select_from(db.table('tarefa_busca')).where(tabela.op('MATCH')(expressao_fts(usuario_id, termos)))
+    return consulta.subquery('resultado_busca')
+
+def condicao_busca(usuario_id, termos):
+    """Mesma busca como filtro de Tarefa (sem calcular a relevância), para combinar com outras ordens."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.literal_column('tarefa.busca').op('@@')(consulta_tsquery(termos))
+    tabela = db.literal_column('tarefa_busca')
+    return Tarefa.id.in_(
+        db.select(db.literal_column('rowid')).select_from(db.table('tarefa_busca'))
+        .where(tabela.op('MATCH')(expressao_fts(usuario_id, termos)))
+    )
+
+@principal.cli.command('migrar')
+def migrar_comando():
+    """Cria tabelas ausentes e aplica as migrações de esquema."""
+    db.create_all()
+    migrar_banco()
+    click.echo("✅ Migração concluída.")
+
+# Tabelas de nomes usadas pelo calendário (montadas uma única vez)
+DIAS_SEMANA = ('Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo')
+MESES = ('janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+         'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro')
+
+def descrever_dia(dia, hoje):
+    return {
+        'data': dia.isoformat(),
+        'dia': dia.strftime('%d/%m'),
+        'dia_semana': DIAS_SEMANA[dia.weekday()],
+        'dia_numero': dia.day,
+        'mes': MESES[dia.month - 1],
+        'ano': dia.year,
+        'e_hoje': dia == hoje,
+        'tarefas': []
+    }
+
+# Função auxiliar para calcular a semana (ou o mês) exibida no calendário
+def obter_intervalo_agenda(referencia, modo):
+    """Retorna (inicio, fim, anterior, proximo) da semana ou do mês que contém a data."""
+    if modo == 'mes':
+        inicio = referencia.replace(day=1)
+        proximo = (inicio + timedelta(days=32)).replace(day=1)
+        fim = proximo - timedelta(days=1)
+        anterior = (inicio - timedelta(days=1)).replace(day=1)
+    else:
+        inicio = referencia - timedelta(days=referencia.weekday())
+        fim = inicio + timedelta(days=6)
+        anterior = inicio - timedelta(days=7)
+        proximo = inicio + timedelta(days=7)
+    return inicio, fim, anterior, proximo
+
+def montar_agenda(usuario_id, inicio, fim):
+    """Busca as tarefas do período em uma única consulta por intervalo e agrupa por dia."""
+    hoje = date.today()
+    dias = {}
+    dia = inicio
+    while dia <= fim:
+        dias[dia] = descrever_dia(dia, hoje)
+        dia += timedelta(days=1)
+
+    tarefas = Tarefa.query.filter(
+        Tarefa.usuario_id == usuario_id,
+        Tarefa.prazo >= inicio,
+        Tarefa.prazo <= fim
+    ).order_by(Tarefa.prazo, Tarefa.feito, Tarefa.id).all()
+    for tarefa in tarefas:
+        dias[tarefa.prazo]['tarefas'].append({
+            'id': tarefa.id,
+            'texto': tarefa.texto,
+            'feito': bool(tarefa.feito)
         })
-    return semana, hoje
+    return list(dias.values())
+
+# Funções auxiliares para paginação por cursor (keyset)
+def codificar_cursor(valores):
+    """Transforma os valores da última linha de uma página em um cursor opaco para a URL."""
+    bruto = json.dumps([serializar_valor(v) for v in valores], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+def decodificar_cursor(cursor, colunas):
+    """Converte um cursor de volta nos valores das colunas de ordenação (None se inválido)."""
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            return None
+        return [converter_valor(coluna, valor) for coluna, valor in zip(colunas, valores)]
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+def paginar_por_cursor(consulta, colunas, por_pagina, depois=None, antes=None, decrescente=False):
+    """
+    Pagina uma consulta ordenada pelas colunas informadas (todas no mesmo sentido
+    e terminando em uma coluna única), usando comparação de tuplas em vez de OFFSET.
+    Retorna (itens, cursor_anterior, cursor_proximo).
+    """
+    chave = db.tuple_(*colunas)
+    valores_depois = decodificar_cursor(depois, colunas) if depois else None
+    valores_antes = decodificar_cursor(antes, colunas) if antes else None
+
+    def seguintes(valores):
+        return chave < db.tuple_(*valores) if decrescente else chave > db.tuple_(*valores)
+
+    def anteriores(valores):
+        return chave > db.tuple_(*valores) if decrescente else chave < db.tuple_(*valores)
+
+    ordem = [c.desc() for c in colunas] if decrescente else list(colunas)
+    ordem_inversa = list(colunas) if decrescente else [c.desc() for c in colunas]
+
+    if valores_antes is not None:
+        # Página anterior: percorre o índice de trás para frente e inverte o resultado
+        consulta = consulta.filter(anteriores(valores_antes))
+        itens = consulta.order_by(*ordem_inversa).limit(por_pagina + 1).all()
+        ha_mais_antes = len(itens) > por_pagina
+        itens = list(reversed(itens[:por_pagina]))
+        ha_mais_depois = True
+    else:
+        if valores_depois is not None:
+            consulta = consulta.filter(seguintes(valores_depois))
+        itens = consulta.order_by(*ordem).limit(por_pagina + 1).all()
+        ha_mais_depois = len(itens) > por_pagina
+        itens = itens[:por_pagina]
+        ha_mais_antes = valores_depois is not None
+
+    def cursor_de(item):
+        return codificar_cursor([getattr(item, c.key) for c in colunas])
+
+    cursor_anterior = cursor_de(itens[0]) if itens and ha_mais_antes else None
+    cursor_proximo = cursor_de(itens[-1]) if itens and ha_mais_depois else None
+    return itens, cursor_anterior, cursor_proximo
+
+def obter_estatisticas(usuario_id):
+    """Calcula total e concluídas em uma única consulta agregada no banco."""
+    total, completas = db.session.query(
+        db.func.count(Tarefa.id),
+        db.func.coalesce(db.func.sum(db.case((Tarefa.feito == True, 1), else_=0)), 0)
+    ).filter(Tarefa.usuario_id == usuario_id).one()
+    porcentagem = int((completas / total * 100) if total > 0 else 0)
+    return total, completas, porcentagem
 
 
+# ===============================================
+# FILTROS E ORDENAÇÃO DA LISTA (parâmetros da URL -> uma consulta SQL)
+# ===============================================
+# Chaves de ordenação: colunas do cursor (a última é única); "-chave" inverte o sentido
+ORDENACOES = {
+    'padrao': lambda: [Tarefa.feito, Tarefa.data_criacao, Tarefa.id],
+    'prazo': lambda: [Tarefa.prazo_ordem, Tarefa.id],
+    'criacao': lambda: [Tarefa.data_criacao, Tarefa.id],
+    'titulo': lambda: [Tarefa.texto, Tarefa.id]
+}
+STATUS_TAREFA = {'pendentes': False, 'concluidas': True}
+FILTROS_DATA = ('prazo_de', 'prazo_ate', 'criada_depois')
+FILTROS_PRESENCA = {'com_descricao': 'descricao', 'com_link': 'link'}
+
+def ler_filtros(argumentos):
+    """
+    Lê e normaliza os filtros da query string. Retorna (filtros, erro): filtros
+    só contém valores válidos (servem para montar links e chaves de cache) e
+    erro descreve o primeiro valor inválido ignorado.
+    """
+    filtros = {}
+    erro = None
+
+    status = argumentos.get('status', '')
+    if status in STATUS_TAREFA:
+        filtros['status'] = status
+    elif status:
+        erro = 'Status inválido. Use "pendentes" ou "concluidas".'
+
+    for nome in FILTROS_DATA:
+        valor = argumentos.get(nome, '')
+        if not valor:
+            continue
+        try:
+            filtros[nome] = date.fromisoformat(valor).isoformat()
+        except ValueError:
+            erro = erro or f'Data inválida em "{nome}". Use o formato AAAA-MM-DD.'
+
+    for nome in FILTROS_PRESENCA:
+        valor = argumentos.get(nome, '').lower()
+        if valor in ('1', 'true', 'sim'):
+            filtros[nome] = '1'
+        elif valor in ('0', 'false', 'nao', 'não'):
+            filtros[nome] = '0'
+        elif valor:
+            erro = erro or f'Use 1 ou 0 em "{nome}".'
+
+    termos = termos_busca(argumentos.get('q'))
+    if termos:
+        filtros['q'] = ' '.join(termos)
+
+    ordem = argumentos.get('ordem', '')
+    if ordem.removeprefix('-') in ORDENACOES and ordem != 'padrao':
+        filtros['ordem'] = ordem
+    elif ordem and ordem != 'padrao':
+        erro = erro or f'Ordenação inválida. Use {", ".join(ORDENACOES)} (com "-" para inverter).'
+
+    return filtros, erro
+
+def consulta_filtrada(usuario_id, filtros):
+    """Aplica os filtros como condições SQL. Retorna (consulta, colunas de ordenação, decrescente)."""
+    consulta = Tarefa.query.filter(Tarefa.usuario_id == usuario_id)
+
+    if 'status' in filtros:
+        consulta = consulta.filter(Tarefa.feito == STATUS_TAREFA[filtros['status']])
+    if 'prazo_de' in filtros:
+        consulta = consulta.filter(Tarefa.prazo >= date.fromisoformat(filtros['prazo_de']))
+    if 'prazo_ate' in filtros:
+        consulta = consulta.filter(Tarefa.prazo <= date.fromisoformat(filtros['prazo_ate']))
+    if 'criada_depois' in filtros:
+        consulta = consulta.filter(Tarefa.data_criacao >= datetime.fromisoformat(filtros['criada_depois']))
+    for nome, atributo in FILTROS_PRESENCA.items():
+        if nome in filtros:
+            coluna = getattr(Tarefa, atributo)
+            preenchida = db.and_(coluna.isnot(None), coluna != '')
+            consulta = consulta.filter(preenchida if filtros[nome] == '1' else db.not_(preenchida))
+    if 'q' in filtros:
+        consulta = consulta.filter(condicao_busca(usuario_id, filtros['q'].split()))
+
+    ordem = filtros.get('ordem', 'padrao')
+    return consulta, ORDENACOES[ordem.removeprefix('-')](), ordem.startswith('-')
+
 
 # Rota de login
-@app.route('/login', methods=['GET', 'POST'])
+@principal.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('principal.index'))
     
     if request.method == 'POST':
         email = request.form.get('email', '').strip()
         senha = request.form.get('senha', '').strip()
-        
+
+        # Limite de tentativas: conferido antes da consulta e do hash da senha (o trabalho caro).
+        # Primeiro o IP: quem já errou demais é recusado sem chegar ao verificador de senhas.
+        # O bloqueio da conta vale por IP, senão um atacante bloquearia o login do dono da conta;
+        # os erros da conta somando todos os IPs (ataque de vários IPs) só a mandam para o caminho suspeito
+        chave_ip = f'ip:{request.remote_addr}'
+        chave_conta = f'conta:{email.lower()}:{request.remote_addr}'
+        chave_alvo = f'alvo:{email.lower()}'
+        if limitador_login.excedido({chave_ip: current_app.config['LOGIN_LIMITE_IP']}) or \
+                limitador_login.excedido({chave_conta: current_app.config['LOGIN_LIMITE_CONTA']}):
+            espera = limitador_login.segundos_restantes()
+            logger.warning('Login bloqueado por excesso de tentativas', extra={'email': email, 'ip': request.remote_addr})
+            flash(f'Muitas tentativas de login. Tente novamente em {max(espera // 60, 1)} minuto(s).', 'error')
+            resposta = make_response(render_template('login.html'), 429)
+            resposta.headers['Retry-After'] = str(espera)
+            return resposta
+
         # Buscar email de forma case-insensitive
-        usuario = Usuario.query.filter(db.func.lower(Usuario.email) == email.lower()).first()
+        usuario = buscar_usuario_por_email(email)
         
         if usuario:
-            if usuario.check_senha(senha):
+            try:
+                suspeito = limitador_login.contar(chave_ip) > 0 or \
+                    limitador_login.excedido({chave_alvo: current_app.config['LOGIN_SUSPEITA_CONTA']})
+                senha_correta = verificador_senhas.verificar(usuario.senha_hash, senha, suspeito=suspeito)
+            except SobrecargaSenhas:
+                logger.warning('Verificação de senha recusada: pool ocupado', extra={'email': email})
+                flash('Servidor ocupado. Tente novamente em alguns segundos.', 'error')
+                resposta = make_response(render_template('login.html'), 503)
+                resposta.headers['Retry-After'] = '5'
+                return resposta
+
+            if senha_correta:
+                limitador_login.limpar(chave_conta)
                 login_user(usuario)
-                print(f"✅ Login realizado: {email}")
+                logger.info('Login realizado', extra={'email': email})
                 flash('Login realizado com sucesso!', 'success')
                 next_page = request.args.get('next')
                 if next_page:
                     return redirect(next_page)
-                return redirect(url_for('index'))
+                return redirect(url_for('principal.index'))
             else:
-                print(f"❌ Senha incorreta para: {email}")
+                limitador_login.registrar((chave_ip, chave_conta, chave_alvo))
+                logger.info('Senha incorreta', extra={'email': email})
                 flash('Senha incorreta.', 'error')
         else:
-            print(f"❌ Email não encontrado: {email}")
-            # Debug: mostrar quantos usuários existem
-            total_usuarios = Usuario.query.count()
-            print(f"📊 Total de usuários no banco: {total_usuarios}")
+            limitador_login.registrar((chave_ip, chave_conta, chave_alvo))
+            logger.info('Email não encontrado', extra={'email': email})
             flash('Email não encontrado. Verifique se digitou corretamente ou cadastre-se.', 'error')
     
     return render_template('login.html')
 
 # Rota de cadastro
-@app.route('/cadastro', methods=['GET', 'POST'])
+@principal.route('/cadastro', methods=['GET', 'POST'])
 def cadastro():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('principal.index'))
     
     if request.method == 'POST':
         nome = request.form.get('nome', '').strip()
@@ -206,19 +1827,15 @@ def cadastro():
             return render_template('cadastro.html')
         
         # Verificar se email já existe (case-insensitive)
-        if Usuario.query.filter(db.func.lower(Usuario.email) == email.lower()).first():
+        if buscar_usuario_por_email(email):
             flash('Este email já está cadastrado. Faça login ou use a recuperação de senha.', 'error')
             return render_template('cadastro.html')
         
-        # Criar novo usuário
-        novo_usuario = Usuario(nome=nome, email=email)
-        novo_usuario.set_senha(senha)
-        
+        # Criar novo usuário (no shard escolhido pelo id)
         try:
-            db.session.add(novo_usuario)
-            db.session.commit()
+            criar_usuario(nome, email, senha)
             flash('Cadastro realizado com sucesso! Faça login para continuar.', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('principal.login'))
         except Exception as e:
             db.session.rollback()
             flash('Erro ao criar conta. Tente novamente.', 'error')
@@ -226,39 +1843,33 @@ def cadastro():
     return render_template('cadastro.html')
 
 # Rota de logout
-@app.route('/logout')
+@principal.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Você foi desconectado com sucesso.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('principal.login'))
 
 # Rota de recuperação de senha (formulário)
-@app.route('/recuperar_senha', methods=['GET', 'POST'])
+@principal.route('/recuperar_senha', methods=['GET', 'POST'])
 def recuperar_senha():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('principal.index'))
     
     if request.method == 'POST':
         email = request.form.get('email', '').strip()
         
         # Buscar email de forma case-insensitive
-        usuario = Usuario.query.filter(db.func.lower(Usuario.email) == email.lower()).first()
+        usuario = buscar_usuario_por_email(email)
         
         if usuario:
             token = usuario.gerar_token_recuperacao()
             
-            # Enviar email com link de recuperação
-            if EMAIL_ENABLED and mail:
+            # Colocar o email na fila; o envio acontece em segundo plano
+            if email_habilitado():
                 try:
-                    recovery_url = url_for('redefinir_senha', token=token, _external=True)
-                    
-                    msg = Message(
-                        subject='Recuperação de Senha - myLife',
-                        sender=app.config.get('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME']),
-                        recipients=[email]
-                    )
-                    msg.body = f'''Olá {usuario.nome},
+                    recovery_url = url_for('principal.redefinir_senha', token=token, _external=True)
+                    corpo = f'''Olá {usuario.nome},
 
 Você solicitou a recuperação de senha. Clique no link abaixo para redefinir sua senha:
 
@@ -271,18 +1882,19 @@ Se você não solicitou esta recuperação, ignore este email.
 Atenciosamente,
 myLife
                     '''
-                    mail.send(msg)
+                    enfileirar_email(email, 'Recuperação de Senha - myLife', corpo)
                     flash('Email de recuperação enviado! Verifique sua caixa de entrada.', 'success')
                 except Exception as e:
+                    db.session.rollback()
                     # Em desenvolvimento, mostra o erro. Em produção, apenas mensagem genérica
-                    error_msg = str(e) if app.config.get('DEBUG') else ''
-                    print(f"Erro ao enviar email: {error_msg}")
+                    error_msg = str(e) if current_app.config.get('DEBUG') else ''
+                    logger.error('Erro ao enviar email', extra={'erro': error_msg})
                     flash('Erro ao enviar email. Tente novamente mais tarde ou entre em contato com o suporte.', 'error')
             else:
                 # Email não configurado
-                if app.config.get('DEBUG'):
+                if current_app.config.get('DEBUG'):
                     # Apenas em desenvolvimento: mostrar link para debug
-                    recovery_url = url_for('redefinir_senha', token=token, _external=True)
+                    recovery_url = url_for('principal.redefinir_senha', token=token, _external=True)
                     flash(f'⚠️ Email não configurado. Use este link para recuperar (APENAS DESENVOLVIMENTO): {recovery_url}', 'warning')
                 else:
                     # Em produção: nunca mostrar o link
@@ -294,16 +1906,16 @@ myLife
     return render_template('recuperar_senha.html')
 
 # Rota para redefinir senha
-@app.route('/redefinir_senha/<token>', methods=['GET', 'POST'])
+@principal.route('/redefinir_senha/<token>', methods=['GET', 'POST'])
 def redefinir_senha(token):
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('principal.index'))
     
-    usuario = Usuario.query.filter_by(token_recuperacao=token).first()
+    usuario = buscar_usuario_por_token(token)
     
     if not usuario or not usuario.token_expiracao or usuario.token_expiracao < datetime.utcnow():
         flash('Link inválido ou expirado. Solicite uma nova recuperação.', 'error')
-        return redirect(url_for('recuperar_senha'))
+        return redirect(url_for('principal.recuperar_senha'))
     
     if request.method == 'POST':
         senha = request.form.get('senha', '').strip()
@@ -325,107 +1937,199 @@ def redefinir_senha(token):
         usuario.token_recuperacao = None
         usuario.token_expiracao = None
         db.session.commit()
+        cache_usuarios.invalidar(usuario.id)
         
         flash('Senha redefinida com sucesso! Faça login para continuar.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('principal.login'))
     
     return render_template('redefinir_senha.html', token=token)
 
 # Rota principal - exibe lista de tarefas (protegida)
-@app.route('/')
-@app.route('/dashboard')
+@principal.route('/')
+@principal.route('/dashboard')
 @login_required
 def index():
-    tarefas_usuario = Tarefa.query.filter_by(usuario_id=current_user.id).all()
-    tarefas_classificadas = sorted(tarefas_usuario, key=lambda t: t.feito)
-    
-    # Calcular estatísticas
-    total_tarefas = len(tarefas_usuario)
-    tarefas_completas = sum(1 for t in tarefas_usuario if t.feito)
-    porcentagem = int((tarefas_completas / total_tarefas * 100) if total_tarefas > 0 else 0)
+    # Versão atual lida direto do banco (o usuário em cache pode estar desatualizado)
+    estado = db.session.query(
+        Usuario.versao_tarefas, Usuario.tarefas_atualizadas_em, Usuario.nome_lista
+    ).filter(Usuario.id == current_user.id).one()
+    hoje = datetime.now()
+    depois = request.args.get('depois')
+    antes = request.args.get('antes')
+    filtros, erro_filtros = ler_filtros(request.args)
+    if erro_filtros:
+        flash(erro_filtros, 'error')
+    assinatura_filtros = '&'.join(f'{nome}={valor}' for nome, valor in sorted(filtros.items()))
+
+    # ETag: muda com as tarefas, o dia (calendário), a página, os filtros e os arquivos do layout
+    pasta_modelos = os.path.join(current_app.root_path, current_app.template_folder)
+    etag = hashlib.sha1(':'.join(str(parte) for parte in (
+        current_user.id, estado.versao_tarefas, estado.nome_lista, hoje.date(), antes, depois, assinatura_filtros,
+        impressao_digital(os.path.join(pasta_modelos, 'index.html')),
+        impressao_digital(os.path.join(pasta_modelos, '_lista_tarefas.html')),
+        url_estatico('css/index.css'), url_estatico('js/index.js')
+    )).encode('utf-8')).hexdigest()
+
+    # Mensagens flash pendentes fazem parte da página: nesse caso sempre renderiza
+    if not session.get('_flashes') and request.if_none_match.contains(etag):
+        resposta = make_response('', 304)
+        resposta.set_etag(etag)
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True
+        return resposta
+
+    # Lista de tarefas e estatísticas: reaproveita o fragmento se a versão não mudou
+    chave_fragmento = f'{current_user.id}:{estado.versao_tarefas}:{antes}:{depois}:{assinatura_filtros}'
+    fragmento = cache_fragmentos.obter(chave_fragmento)
+    if fragmento is None:
+        # Padrão: pendentes primeiro, depois por data de criação; o banco filtra, ordena e pagina
+        consulta, colunas_ordem, decrescente = consulta_filtrada(current_user.id, filtros)
+        tarefas_pagina, cursor_anterior, cursor_proximo = paginar_por_cursor(
+            consulta,
+            colunas_ordem,
+            current_app.config['TAREFAS_POR_PAGINA'],
+            depois=depois,
+            antes=antes,
+            decrescente=decrescente
+        )
+        lista_tarefas = Markup(render_template('_lista_tarefas.html',
+                                               tarefas=tarefas_pagina,
+                                               cursor_anterior=cursor_anterior,
+                                               cursor_proximo=cursor_proximo,
+                                               filtros=filtros))
+        fragmento = (lista_tarefas, obter_estatisticas(current_user.id))
+        cache_fragmentos.guardar(chave_fragmento, fragmento, current_app.config['FRAGMENTO_CACHE_TTL'])
+    lista_tarefas, (total_tarefas, tarefas_completas, porcentagem) = fragmento
     
-    # Obter semana
-    semana, hoje = obter_semana()
+    # Obter semana com as tarefas de cada dia
+    inicio_semana, fim_semana, semana_anterior, semana_seguinte = obter_intervalo_agenda(hoje.date(), 'semana')
+    semana = montar_agenda(current_user.id, inicio_semana, fim_semana)
     
-    return render_template('index.html', 
-                         tarefas=tarefas_classificadas,
-                         nome_lista=current_user.nome_lista,
+    resposta = make_response(render_template('index.html', 
+                         lista_tarefas=lista_tarefas,
+                         nome_lista=estado.nome_lista,
                          total_tarefas=total_tarefas,
                          tarefas_completas=tarefas_completas,
                          porcentagem=porcentagem,
+                         filtros=filtros,
                          semana=semana,
-                         hoje=hoje.strftime('%d/%m/%Y'))
+                         semana_anterior=semana_anterior.isoformat(),
+                         semana_seguinte=semana_seguinte.isoformat(),
+                         hoje=hoje.strftime('%d/%m/%Y')))
+    resposta.set_etag(etag)
+    if estado.tarefas_atualizadas_em:
+        resposta.last_modified = estado.tarefas_atualizadas_em
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta
+
+# Agenda (semana ou mês) em JSON, usada pelo calendário para navegar sem recarregar a página
+@principal.route('/agenda')
+@login_required
+def agenda():
+    modo = 'mes' if request.args.get('modo') == 'mes' else 'semana'
+    referencia = converter_prazo(request.args.get('data')) or date.today()
+    inicio, fim, anterior, proximo = obter_intervalo_agenda(referencia, modo)
+
+    return jsonify({
+        'modo': modo,
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'anterior': anterior.isoformat(),
+        'proximo': proximo.isoformat(),
+        'titulo': f"{MESES[inicio.month - 1]} de {inicio.year}" if modo == 'mes'
+                  else f"{inicio.strftime('%d/%m')} – {fim.strftime('%d/%m/%Y')}",
+        'dias': montar_agenda(current_user.id, inicio, fim)
+    })
 
 # Ação para adicionar nova tarefa
-@app.route('/adicionar', methods=['POST'])
+@principal.route('/adicionar', methods=['POST'])
 @login_required
 def adicionar():
     texto_tarefa = request.form.get('texto_tarefa', '').strip()
     descricao = request.form.get('descricao', '').strip()
     data = request.form.get('data', '').strip()
     link = request.form.get('link', '').strip()
+    prazo = converter_prazo(data)
+    recorrencia, erro = ler_recorrencia(recorrencia_do_formulario(request.form, prazo))
+    lembrete, erro_lembrete = ler_lembrete(request.form.get('lembrete'))
+    erro = erro or erro_lembrete
     
-    if texto_tarefa:
+    if erro:
+        flash(erro, 'error')
+    elif texto_tarefa:
         try:
             nova_tarefa = Tarefa(
                 texto=texto_tarefa,
                 descricao=descricao,
                 data=data,
+                prazo=prazo,
                 link=link,
+                recorrencia=recorrencia,
+                lembrete=lembrete,
+                feito=False,
                 usuario_id=current_user.id
             )
+            programar_tarefa(nova_tarefa)
             db.session.add(nova_tarefa)
+            registrar_alteracao_tarefas(current_user.id)
             db.session.commit()
             flash('Tarefa adicionada com sucesso!', 'success')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao adicionar tarefa. Tente novamente.', 'error')
-            print(f"Erro ao adicionar tarefa: {e}")
+            logger.exception('Erro ao adicionar tarefa')
     else:
         flash('O título da tarefa é obrigatório.', 'error')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('principal.index'))
 
 # Ação para atualizar nome da lista
-@app.route('/atualizar_nome', methods=['POST'])
+@principal.route('/atualizar_nome', methods=['POST'])
 @login_required
 def atualizar_nome():
     novo_nome = request.form.get('nome_lista', '').strip()
     if novo_nome:
         try:
             current_user.nome_lista = novo_nome
+            registrar_alteracao_tarefas(current_user.id)
             db.session.commit()
+            cache_usuarios.invalidar(current_user.id)
             flash('Nome da lista atualizado!', 'success')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao atualizar nome da lista.', 'error')
-            print(f"Erro ao atualizar nome: {e}")
+            logger.exception('Erro ao atualizar nome')
     else:
         flash('O nome da lista não pode estar vazio.', 'error')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('principal.index'))
 
 # Ação para completar tarefa
-@app.route('/completar/<int:id>')
+@principal.route('/completar/<int:id>')
 @login_required
 def completo(id):
     try:
         tarefa = Tarefa.query.filter_by(id=id, usuario_id=current_user.id).first_or_404()
+        if not tarefa.feito:
+            tarefa.concluida_em = datetime.utcnow()
         tarefa.feito = True
+        programar_tarefa(tarefa)
+        registrar_alteracao_tarefas(current_user.id)
         db.session.commit()
         flash('Tarefa marcada como concluída!', 'success')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao marcar tarefa como concluída.', 'error')
-        print(f"Erro ao completar tarefa: {e}")
+        logger.exception('Erro ao completar tarefa')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('principal.index'))
 # ===============================================
 # INÍCIO DO BLOCO DE NOVAS ROTAS
 # ===============================================
 
 # Rota de Perfil (acessada pelo template 'perfil.html')
-@app.route('/perfil', methods=['GET', 'POST'])
+@principal.route('/perfil', methods=['GET', 'POST'])
 @login_required
 def perfil():
     if request.method == 'POST':
@@ -434,72 +2138,1527 @@ def perfil():
             try:
                 current_user.nome = novo_nome
                 db.session.commit()
+                cache_usuarios.invalidar(current_user.id)
                 flash('Nome atualizado com sucesso!', 'success')
             except Exception as e:
                 db.session.rollback()
                 flash('Erro ao atualizar nome.', 'error')
         else:
             flash('O nome não pode ser vazio.', 'error')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('principal.perfil'))
         
     return render_template('perfil.html', user=current_user)
 
 
 # Ação para deletar tarefa
-@app.route('/deletar/<int:id>')
+@principal.route('/deletar/<int:id>')
 @login_required
 def deletar(id):
     try:
         # Garante que a tarefa pertença ao usuário logado
         tarefa = Tarefa.query.filter_by(id=id, usuario_id=current_user.id).first_or_404()
         db.session.delete(tarefa)
+        registrar_alteracao_tarefas(current_user.id)
         db.session.commit()
         flash('Tarefa deletada com sucesso!', 'success')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao deletar tarefa. Tente novamente.', 'error')
-        print(f"Erro ao deletar tarefa: {e}")
+        logger.exception('Erro ao deletar tarefa')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('principal.index'))
 
 
 # Ação para reverter status (desfazer conclusão)
-@app.route('/reverter/<int:id>')
+@principal.route('/reverter/<int:id>')
 @login_required
 def reverter(id):
     try:
         tarefa = Tarefa.query.filter_by(id=id, usuario_id=current_user.id).first_or_404()
         tarefa.feito = False
+        tarefa.concluida_em = None
+        programar_tarefa(tarefa)
+        registrar_alteracao_tarefas(current_user.id)
         db.session.commit()
         flash('Tarefa desmarcada como concluída.', 'info')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao reverter status da tarefa.', 'error')
-        print(f"Erro ao reverter tarefa: {e}")
+        logger.exception('Erro ao reverter tarefa')
     
-    return redirect(url_for('index'))
+    return redirect(url_for('principal.index'))
 
 # ===============================================
 # FIM DO BLOCO DE NOVAS ROTAS
 # ===============================================
-# Criar tabelas do banco de dados (não recria se já existirem)
-with app.app_context():
+# ===============================================
+# API JSON DE TAREFAS (atualizações parciais, sem recarregar a página)
+# ===============================================
+CAMPOS_TEXTO_TAREFA = {'texto': 200, 'descricao': None, 'data': 20, 'link': 500}
+
+def erro_api(mensagem, status=400):
+    return jsonify({'erro': mensagem}), status
+
+def validar_campos_tarefa(dados):
+    """Normaliza os campos enviados. Retorna (valores, erro) com os valores prontos para o modelo."""
+    valores = {}
+    for campo, limite in CAMPOS_TEXTO_TAREFA.items():
+        if campo not in dados:
+            continue
+        valor = dados[campo]
+        if valor is None:
+            valor = ''
+        if not isinstance(valor, str):
+            return None, f'O campo "{campo}" deve ser texto.'
+        valor = valor.strip()
+        if limite and len(valor) > limite:
+            return None, f'O campo "{campo}" aceita no máximo {limite} caracteres.'
+        valores[campo] = valor
+        if campo == 'data':
+            valores['prazo'] = converter_prazo(valor)
+
+    if 'feito' in dados:
+        if not isinstance(dados['feito'], bool):
+            return None, 'O campo "feito" deve ser verdadeiro ou falso.'
+        valores['feito'] = dados['feito']
+        valores['concluida_em'] = datetime.utcnow() if dados['feito'] else None
+
+    for campo, leitor in (('recorrencia', ler_recorrencia), ('lembrete', ler_lembrete)):
+        if campo not in dados:
+            continue
+        if dados[campo] is not None and not isinstance(dados[campo], str):
+            return None, f'O campo "{campo}" deve ser texto.'
+        valores[campo], erro = leitor(dados[campo])
+        if erro:
+            return None, erro
+    return valores, None
+
+def aplicar_campos_tarefa(tarefa, dados):
+    """Copia os campos enviados para a tarefa. Retorna uma mensagem de erro ou None."""
+    valores, erro = validar_campos_tarefa(dados)
+    if erro:
+        return erro
+    if 'feito' in valores and valores['feito'] == bool(tarefa.feito):
+        # Status igual: mantém a data de conclusão original
+        del valores['concluida_em']
+    for campo, valor in valores.items():
+        setattr(tarefa, campo, valor)
+    if valores.keys() & {'prazo', 'feito', 'recorrencia', 'lembrete'}:
+        programar_tarefa(tarefa)
+
+    if not tarefa.texto:
+        return 'O título da tarefa é obrigatório.'
+    return None
+
+def resposta_estatisticas(usuario_id):
+    total, completas, porcentagem = obter_estatisticas(usuario_id)
+    return {'total': total, 'completas': completas, 'porcentagem': porcentagem}
+
+@principal.route('/api/tarefas', methods=['GET'])
+@login_required
+def api_listar_tarefas():
     try:
-        # create_all só cria tabelas que não existem (não apaga dados existentes)
-        db.create_all()
-        print("✅ Banco de dados verificado. Tabelas criadas se necessário.")
-        
-        # Verificar se o banco está funcionando
-        try:
-            usuario_count = Usuario.query.count()
-            print(f"📊 Usuários cadastrados no banco: {usuario_count}")
-        except:
-            print("📊 Banco de dados vazio (primeira execução)")
+        por_pagina = min(int(request.args.get('limite', current_app.config['TAREFAS_POR_PAGINA'])), 200)
+    except (ValueError, TypeError):
+        por_pagina = current_app.config['TAREFAS_POR_PAGINA']
+    filtros, erro = ler_filtros(request.args)
+    if erro:
+        return erro_api(erro)
+
+    consulta, colunas_ordem, decrescente = consulta_filtrada(current_user.id, filtros)
+    tarefas, cursor_anterior, cursor_proximo = paginar_por_cursor(
+        consulta,
+        colunas_ordem,
+        max(por_pagina, 1),
+        depois=request.args.get('depois'),
+        antes=request.args.get('antes'),
+        decrescente=decrescente
+    )
+    return jsonify({
+        'filtros': filtros,
+        'tarefas': [tarefa.para_dict() for tarefa in tarefas],
+        'anterior': cursor_anterior,
+        'proximo': cursor_proximo,
+        'estatisticas': resposta_estatisticas(current_user.id)
+    })
+
+@principal.route('/api/tarefas/busca')
+@login_required
+def api_buscar_tarefas():
+    termos = termos_busca(request.args.get('q'))
+    if not termos:
+        return erro_api('Informe o texto da busca no parâmetro "q".')
+    try:
+        por_pagina = min(int(request.args.get('limite', 20)), 200)
+    except (ValueError, TypeError):
+        por_pagina = 20
+
+    resultado = consulta_busca(current_user.id, termos)
+    linhas, cursor_anterior, cursor_proximo = paginar_por_cursor(
+        db.session.query(Tarefa, resultado.c.pontuacao, resultado.c.id).join(resultado, resultado.c.id == Tarefa.id),
+        [resultado.c.pontuacao, resultado.c.id],
+        max(por_pagina, 1),
+        depois=request.args.get('depois'),
+        antes=request.args.get('antes')
+    )
+    return jsonify({
+        'termos': termos,
+        'tarefas': [linha.Tarefa.para_dict() for linha in linhas],
+        'anterior': cursor_anterior,
+        'proximo': cursor_proximo
+    })
+
+@principal.route('/api/tarefas', methods=['POST'])
+@login_required
+def api_criar_tarefa():
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return erro_api('Envie os dados da tarefa em JSON.')
+
+    tarefa = Tarefa(texto='', usuario_id=current_user.id, feito=False)
+    erro = aplicar_campos_tarefa(tarefa, dados)
+    if erro:
+        return erro_api(erro)
+
+    try:
+        db.session.add(tarefa)
+        registrar_alteracao_tarefas(current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Erro ao adicionar tarefa (API)')
+        return erro_api('Erro ao adicionar tarefa. Tente novamente.', 500)
+
+    return jsonify({'tarefa': tarefa.para_dict(), 'estatisticas': resposta_estatisticas(current_user.id)}), 201
+
+@principal.route('/api/tarefas/<int:id>', methods=['PATCH'])
+@login_required
+def api_atualizar_tarefa(id):
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return erro_api('Envie os campos a alterar em JSON.')
+
+    tarefa = Tarefa.query.filter_by(id=id, usuario_id=current_user.id).first()
+    if not tarefa:
+        return erro_api('Tarefa não encontrada.', 404)
+
+    erro = aplicar_campos_tarefa(tarefa, dados)
+    if erro:
+        db.session.rollback()
+        return erro_api(erro)
+
+    try:
+        registrar_alteracao_tarefas(current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Erro ao atualizar tarefa (API)')
+        return erro_api('Erro ao atualizar tarefa. Tente novamente.', 500)
+
+    return jsonify({'tarefa': tarefa.para_dict(), 'estatisticas': resposta_estatisticas(current_user.id)})
+
+@principal.route('/api/tarefas/<int:id>', methods=['DELETE'])
+@login_required
+def api_deletar_tarefa(id):
+    try:
+        apagadas = Tarefa.query.filter_by(id=id, usuario_id=current_user.id).delete(synchronize_session=False)
+        if not apagadas:
+            # Nada mudou: a versão do usuário fica como está (clientes não ressincronizam à toa)
+            db.session.rollback()
+            return erro_api('Tarefa não encontrada.', 404)
+        registrar_alteracao_tarefas(current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Erro ao deletar tarefa (API)')
+        return erro_api('Erro ao deletar tarefa. Tente novamente.', 500)
+
+    return jsonify({'id': id, 'estatisticas': resposta_estatisticas(current_user.id)})
+
+# ===============================================
+# OPERAÇÕES EM LOTE (uma única instrução SQL por ação)
+# ===============================================
+VALORES_VERDADEIROS = {'1', 'true', 'sim', 's', 'x', 'yes', 'feito', 'concluida', 'concluída'}
+
+@principal.route('/api/tarefas/lote', methods=['POST'])
+@login_required
+def api_lote_tarefas():
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return erro_api('Envie a ação e os ids em JSON.')
+
+    acao = dados.get('acao')
+    ids = dados.get('ids')
+    if acao not in ('concluir', 'reverter', 'deletar'):
+        return erro_api('Ação inválida. Use "concluir", "reverter" ou "deletar".')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return erro_api('Informe uma lista de ids de tarefas.')
+    if len(ids) > current_app.config['LOTE_MAX_IDS']:
+        return erro_api(f"Máximo de {current_app.config['LOTE_MAX_IDS']} tarefas por operação.")
+
+    # Sempre restrito às tarefas do usuário logado
+    consulta = Tarefa.query.filter(Tarefa.usuario_id == current_user.id, Tarefa.id.in_(set(ids)))
+    try:
+        if acao == 'deletar':
+            afetadas = consulta.delete(synchronize_session=False)
+        else:
+            # Quem já estava concluída mantém a data de conclusão (o SET lê os valores antigos)
+            concluida_em = db.case((Tarefa.feito == db.true(), Tarefa.concluida_em), else_=datetime.utcnow()) \
+                if acao == 'concluir' else None
+            afetadas = consulta.update({Tarefa.feito: acao == 'concluir', Tarefa.concluida_em: concluida_em},
+                                       synchronize_session=False)
+            # Concluídas não lembram; as reabertas voltam a lembrar (se a hora ainda não passou)
+            if acao == 'concluir':
+                consulta.filter(Tarefa.lembrete_em.isnot(None)).update({Tarefa.lembrete_em: None},
+                                                                      synchronize_session=False)
+            else:
+                # A hora do lembrete depende do fuso (horário de verão), então é calculada aqui,
+                # uma vez por par (prazo, hora) distinto, e gravada num único UPDATE. Lembrete que
+                # já passou não volta; as que já estavam pendentes mantêm o seu
+                agora = datetime.utcnow()
+                instantes = {}
+                for prazo, hora in consulta.filter(Tarefa.lembrete.isnot(None), Tarefa.prazo.isnot(None)) \
+                        .with_entities(Tarefa.prazo, Tarefa.lembrete).distinct():
+                    instante = lembretes.instante(prazo, hora)
+                    if instante > agora:
+                        instantes[(prazo, hora)] = instante
+                if instantes:
+                    consulta.filter(Tarefa.lembrete.isnot(None)).update({Tarefa.lembrete_em: db.case(
+                        *[(db.and_(Tarefa.prazo == prazo, Tarefa.lembrete == hora), instante)
+                          for (prazo, hora), instante in instantes.items()],
+                        else_=Tarefa.lembrete_em
+                    )}, synchronize_session=False)
+        if not afetadas:
+            db.session.rollback()
+            return erro_api('Nenhuma das tarefas foi encontrada.', 404)
+        registrar_alteracao_tarefas(current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Erro na operação em lote', extra={'acao': acao})
+        return erro_api('Erro ao processar as tarefas. Tente novamente.', 500)
+
+    resposta = {'acao': acao, 'afetadas': afetadas, 'estatisticas': resposta_estatisticas(current_user.id)}
+    if acao != 'deletar':
+        resposta['tarefas'] = [tarefa.para_dict() for tarefa in consulta.order_by(Tarefa.id).all()]
+    return jsonify(resposta)
+
+@principal.route('/api/tarefas/limpar_concluidas', methods=['POST'])
+@login_required
+def api_limpar_concluidas():
+    # Sem dados para enviar, mas exige JSON como as outras rotas da API: um formulário de
+    # outro site não consegue mandar application/json sem passar pelo CORS
+    if not isinstance(request.get_json(silent=True), dict):
+        return erro_api('Envie a requisição em JSON ({}).')
+    try:
+        apagadas = Tarefa.query.filter_by(usuario_id=current_user.id, feito=True).delete(synchronize_session=False)
+        if apagadas:
+            registrar_alteracao_tarefas(current_user.id)
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Erro ao limpar tarefas concluídas')
+        return erro_api('Erro ao limpar as tarefas concluídas. Tente novamente.', 500)
+
+    return jsonify({'afetadas': apagadas, 'estatisticas': resposta_estatisticas(current_user.id)})
+
+def ler_csv_importacao(conteudo):
+    # Tira o "'" que a exportação põe na frente de células que pareceriam fórmulas
+    return [{campo: celula_importada(valor) for campo, valor in linha.items()}
+            for linha in csv.DictReader(io.StringIO(conteudo))]
+
+def ler_importacao():
+    """Lê as linhas enviadas para importação: JSON (lista ou {"tarefas": [...]}) ou CSV com cabeçalho."""
+    arquivo = request.files.get('arquivo')
+    if arquivo:
+        conteudo = arquivo.read().decode('utf-8-sig')
+        if arquivo.filename.lower().endswith('.json'):
+            dados = json.loads(conteudo)
+        else:
+            return ler_csv_importacao(conteudo)
+    elif request.mimetype == 'text/csv':
+        return ler_csv_importacao(request.get_data(as_text=True))
+    else:
+        dados = request.get_json(silent=True)
+
+    if isinstance(dados, dict):
+        dados = dados.get('tarefas')
+    return dados
+
+@principal.route('/api/tarefas/importar', methods=['POST'])
+@login_required
+def api_importar_tarefas():
+    # CSV e arquivo (multipart) podem vir de um formulário de outro site, que não passa pelo
+    # CORS: sem JSON, só com o cabeçalho X-Requested-With, que exige o preflight
+    if not request.is_json and not request.headers.get('X-Requested-With'):
+        return erro_api('Envie a importação em JSON ou com o cabeçalho X-Requested-With.')
+    try:
+        linhas = ler_importacao()
+    except (ValueError, UnicodeDecodeError, csv.Error):
+        return erro_api('Arquivo de importação inválido.')
+    if not isinstance(linhas, list) or not linhas:
+        return erro_api('Nenhuma tarefa para importar. Envie um CSV ou uma lista JSON.')
+    if len(linhas) > current_app.config['IMPORTACAO_MAX_TAREFAS']:
+        return erro_api(f"Máximo de {current_app.config['IMPORTACAO_MAX_TAREFAS']} tarefas por importação.")
+
+    agora = datetime.utcnow()
+    registros = []
+    for numero, linha in enumerate(linhas, start=1):
+        if not isinstance(linha, dict):
+            return erro_api(f'Linha {numero}: formato inválido.')
+        linha = {campo: valor for campo, valor in linha.items() if campo}
+        if isinstance(linha.get('feito'), str):
+            linha['feito'] = linha['feito'].strip().lower() in VALORES_VERDADEIROS
+
+        valores, erro = validar_campos_tarefa(linha)
+        if not erro and not valores.get('texto'):
+            erro = 'O título da tarefa é obrigatório.'
+        if erro:
+            return erro_api(f'Linha {numero}: {erro}')
+
+        registro = {
+            'texto': valores['texto'],
+            'descricao': valores.get('descricao', ''),
+            'data': valores.get('data', ''),
+            'prazo': valores.get('prazo'),
+            'link': valores.get('link', ''),
+            'feito': valores.get('feito', False),
+            'concluida_em': valores.get('concluida_em'),
+            'recorrencia': valores.get('recorrencia'),
+            'lembrete': valores.get('lembrete'),
+            'usuario_id': current_user.id,
+            'data_criacao': agora
+        }
+        registro.update(calcular_agenda(registro['prazo'], registro['recorrencia'], registro['lembrete'],
+                                        registro['feito']))
+        registros.append(registro)
+
+    # Inserção em massa (executemany) em uma única transação
+    try:
+        db.session.execute(db.insert(Tarefa), registros)
+        registrar_alteracao_tarefas(current_user.id)
+        db.session.commit()
     except Exception as e:
-        print(f"⚠️  Erro ao inicializar banco de dados: {e}")
-        print(f"   Caminho do banco: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        db.session.rollback()
+        logger.exception('Erro ao importar tarefas')
+        return erro_api('Erro ao importar tarefas. Nenhuma tarefa foi salva.', 500)
+
+    return jsonify({'importadas': len(registros), 'estatisticas': resposta_estatisticas(current_user.id)}), 201
+
+# ===============================================
+# EXPORTAÇÃO (CSV, NDJSON e iCalendar enviados enquanto são lidos do banco)
+# ===============================================
+def colunas_exportacao(modelo, com_usuario):
+    arquivada = modelo is TarefaArquivada
+    colunas = [
+        modelo.id, modelo.texto, modelo.descricao, modelo.data, modelo.prazo, modelo.link,
+        db.null().label('recorrencia') if arquivada else modelo.recorrencia,
+        db.null().label('lembrete') if arquivada else modelo.lembrete,
+        db.true().label('feito') if arquivada else modelo.feito,
+        modelo.data_criacao, modelo.concluida_em,
+        (db.true() if arquivada else db.false()).label('arquivada')
+    ]
+    if com_usuario:
+        colunas.insert(1, modelo.usuario_id)
+    return colunas
+
+def ler_em_lotes(modelo, usuario_id, lote, apenas_com_prazo=False):
+    """
+    Linhas do modelo (tarefas ou arquivadas) em ordem de id, lidas "lote" por vez
+    pelo índice (usuario_id, id); sem usuário, as de todos. Só um lote fica em
+    memória, e entre um lote e outro a conexão volta ao pool: um download lento
+    não prende o banco (com gevent o SQLite tem uma conexão só por worker).
+    """
+    consulta = db.select(*colunas_exportacao(modelo, usuario_id is None)).order_by(modelo.id).limit(lote)
+    if usuario_id is not None:
+        consulta = consulta.where(modelo.usuario_id == usuario_id)
+    if apenas_com_prazo:
+        consulta = consulta.where(modelo.prazo.isnot(None))
+    ultimo = 0
+    while True:
+        linhas = db.session.execute(consulta.where(modelo.id > ultimo)).all()
+        db.session.close()
+        yield from linhas
+        if len(linhas) < lote:
+            return
+        ultimo = linhas[-1].id
+
+def valor_exportacao(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat(timespec='seconds')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+# Células que o Excel/LibreOffice executariam como fórmula (injeção de CSV): o "'" na frente as mantém
+# como texto. A importação tira o "'" de volta, então exportar e importar de novo não muda as tarefas
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+def celula_csv(valor):
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+def celula_importada(valor):
+    if isinstance(valor, str) and valor.startswith("'") and valor[1:].startswith(INICIO_FORMULA):
+        return valor[1:]
+    return valor
+
+def exportar_csv(linhas, campos):
+    # Mesmas colunas que a importação lê (as demais são ignoradas por ela); o BOM faz o Excel ler UTF-8
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(campos)
+    for linha in linhas:
+        valores = linha._asdict()
+        valores['feito'] = 'sim' if valores['feito'] else 'não'
+        valores['arquivada'] = 'sim' if valores['arquivada'] else 'não'
+        escritor.writerow(['' if valores[campo] is None else celula_csv(valor_exportacao(valores[campo]))
+                           for campo in campos])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def exportar_ndjson(linhas, campos):
+    for linha in linhas:
+        valores = linha._asdict()
+        valores['feito'] = bool(valores['feito'])
+        valores['arquivada'] = bool(valores['arquivada'])
+        yield json.dumps({campo: valor_exportacao(valores[campo]) for campo in campos}, ensure_ascii=False) + '\n'
+
+def texto_ical(valor):
+    return (valor or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '')
+
+def uri_ical(valor):
+    """URI em uma propriedade iCalendar (não leva escape): caracteres de controle, como CR/LF, viram %XX."""
+    return re.sub(r'[\x00-\x1f\x7f]', lambda caractere: f'%{ord(caractere.group()):02X}', valor)
+
+def linha_ical(linha):
+    """Linha de conteúdo iCalendar dobrada em 75 octetos (RFC 5545), sem partir caracteres UTF-8."""
+    if len(linha.encode()) <= 75:
+        return linha + '\r\n'
+    partes, atual, tamanho = [], '', 0
+    for caractere in linha:
+        octetos = len(caractere.encode())
+        if tamanho + octetos > 75:
+            partes.append(atual)
+            atual, tamanho = ' ', 1
+        atual += caractere
+        tamanho += octetos
+    partes.append(atual)
+    return '\r\n'.join(partes) + '\r\n'
+
+DIAS_ICAL = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+def regra_ical(regra):
+    """Regra de repetição da tarefa como RRULE (a série começa no prazo da ocorrência que a guarda)."""
+    tipo, _, parametro = regra.partition(':')
+    if tipo == 'diaria':
+        return 'FREQ=DAILY'
+    if tipo == 'semanal':
+        return 'FREQ=WEEKLY;BYDAY=' + ','.join(DIAS_ICAL[int(dia)] for dia in parametro.split(','))
+    # Dia 31 (ou 29, 30) nos meses mais curtos: o último dia, como no agendador
+    dia = int(parametro)
+    if dia <= 28:
+        return f'FREQ=MONTHLY;BYMONTHDAY={dia}'
+    return f"FREQ=MONTHLY;BYMONTHDAY={','.join(map(str, range(28, dia + 1)))};BYSETPOS=-1"
+
+def exportar_ical(linhas, campos):
+    # Um evento de dia inteiro por tarefa com prazo (as repetidas com RRULE); as concluídas levam ✓ no título
+    carimbo = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    dominio = request.host.split(':')[0] if has_request_context() else 'mylife'
+    yield ''.join(linha_ical(linha) for linha in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//myLife//Tarefas//PT-BR', 'CALSCALE:GREGORIAN', 'X-WR-CALNAME:myLife'
+    ))
+    for linha in linhas:
+        evento = [
+            'BEGIN:VEVENT',
+            f'UID:tarefa-{linha.id}@{dominio}',
+            f'DTSTAMP:{carimbo}',
+            f"DTSTART;VALUE=DATE:{linha.prazo.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(linha.prazo + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{'✓ ' if linha.feito else ''}{texto_ical(linha.texto)}",
+        ]
+        if linha.recorrencia:
+            evento.append(f'RRULE:{regra_ical(linha.recorrencia)}')
+        if linha.descricao:
+            evento.append(f'DESCRIPTION:{texto_ical(linha.descricao)}')
+        if linha.link:
+            evento.append(f'URL:{uri_ical(linha.link)}')
+        if linha.data_criacao:
+            evento.append(f"CREATED:{linha.data_criacao.strftime('%Y%m%dT%H%M%SZ')}")
+        evento.append('END:VEVENT')
+        yield ''.join(linha_ical(parte) for parte in evento)
+    yield linha_ical('END:VCALENDAR')
+
+# formato: (tipo do conteúdo, gerador, só tarefas com prazo)
+FORMATOS_EXPORTACAO = {
+    'csv': ('text/csv; charset=utf-8', exportar_csv, False),
+    'ndjson': ('application/x-ndjson; charset=utf-8', exportar_ndjson, False),
+    'ics': ('text/calendar; charset=utf-8', exportar_ical, True),
+}
+CAMPOS_EXPORTACAO = ('id', 'texto', 'descricao', 'data', 'prazo', 'link', 'recorrencia', 'lembrete', 'feito',
+                     'data_criacao', 'concluida_em', 'arquivada')
+
+def gerar_exportacao(formato, usuario_id=None, arquivadas=False, tamanho_bloco=65536):
+    """
+    Exportação no formato pedido, em blocos de texto de ~tamanho_bloco (um write por
+    bloco, não por linha). Sem usuário, exporta todos com a coluna usuario_id.
+    """
+    _, gerador, apenas_com_prazo = FORMATOS_EXPORTACAO[formato]
+    lote = max(current_app.config['EXPORTACAO_LOTE'], 1)
+    campos = CAMPOS_EXPORTACAO if usuario_id is not None else ('id', 'usuario_id') + CAMPOS_EXPORTACAO[1:]
+
+    def linhas_do_shard():
+        yield from ler_em_lotes(Tarefa, usuario_id, lote, apenas_com_prazo)
+        if arquivadas:
+            yield from ler_em_lotes(TarefaArquivada, usuario_id, lote, apenas_com_prazo)
+
+    def linhas():
+        if usuario_id is not None:
+            # Shard do usuário, já escolhido pelo login (ou pelo comando)
+            yield from linhas_do_shard()
+            return
+        for shard in roteador_shards.shards:
+            with roteador_shards.usar(shard):
+                yield from linhas_do_shard()
+
+    bloco, tamanho = [], 0
+    for parte in gerador(linhas(), campos):
+        bloco.append(parte)
+        tamanho += len(parte)
+        if tamanho >= tamanho_bloco:
+            yield ''.join(bloco)
+            bloco, tamanho = [], 0
+    if bloco:
+        yield ''.join(bloco)
+
+def resposta_exportacao(formato, usuario_id, arquivadas, prefixo):
+    resposta = Response(stream_with_context(gerar_exportacao(formato, usuario_id, arquivadas)),
+                        content_type=FORMATOS_EXPORTACAO[formato][0])
+    nome = f"{prefixo}-{date.today().isoformat()}.{formato}"
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome}"'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    resposta.cache_control.no_store = True
+    return resposta
+
+def ler_formato_exportacao():
+    formato = request.args.get('formato', 'csv').lower()
+    return formato if formato in FORMATOS_EXPORTACAO else None
+
+@principal.route('/api/tarefas/exportar')
+@login_required
+def api_exportar_tarefas():
+    formato = ler_formato_exportacao()
+    if formato is None:
+        return erro_api('Formato inválido. Use "csv", "ndjson" ou "ics".')
+    arquivadas = request.args.get('arquivadas', '').lower() in VALORES_VERDADEIROS
+    return resposta_exportacao(formato, current_user.id, arquivadas, 'mylife-tarefas')
+
+@principal.route('/api/admin/exportar')
+def api_admin_exportar():
+    token = current_app.config['EXPORTACAO_TOKEN']
+    if not token:
+        return erro_api('Exportação completa desativada.', 404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return erro_api('Não autorizado.', 401)
+    formato = ler_formato_exportacao()
+    if formato is None:
+        return erro_api('Formato inválido. Use "csv", "ndjson" ou "ics".')
+    return resposta_exportacao(formato, None, True, 'mylife-completo')
+
+@principal.cli.command('exportar')
+@click.option('--formato', type=click.Choice(sorted(FORMATOS_EXPORTACAO)), default='ndjson', show_default=True)
+@click.option('--usuario', 'email', help='Exporta só as tarefas deste email (padrão: todos os usuários).')
+@click.option('--sem-arquivadas', is_flag=True, help='Não inclui as tarefas do arquivo.')
+@click.option('--saida', type=click.File('w', encoding='utf-8'), default='-', help='Arquivo de saída (padrão: stdout).')
+def exportar_comando(formato, email, sem_arquivadas, saida):
+    """Exporta as tarefas (de um usuário ou de todos) sem carregar tudo na memória."""
+    usuario_id = None
+    if email:
+        usuario = buscar_usuario_por_email(email)
+        if usuario is None:
+            raise click.ClickException(f'Usuário {email} não encontrado.')
+        usuario_id = usuario.id
+    for bloco in gerar_exportacao(formato, usuario_id, not sem_arquivadas):
+        saida.write(bloco)
+
+# ===============================================
+# SINCRONIZAÇÃO INCREMENTAL (alterações desde uma versão, com exclusões)
+# ===============================================
+# Gatilho que grava a lápide de cada tarefa excluída, seja qual for o caminho
+# (rota, API, lote, limpeza); a versão é preenchida por registrar_alteracao_tarefas()
+SQL_EXCLUSOES_SQLITE = (
+    """CREATE TRIGGER IF NOT EXISTS tarefa_removida_exclusao AFTER DELETE ON tarefa BEGIN
+        INSERT INTO tarefa_removida(tarefa_id, usuario_id) VALUES (old.id, old.usuario_id);
+    END""",
+)
+
+SQL_EXCLUSOES_POSTGRES = (
+    """CREATE OR REPLACE FUNCTION registrar_tarefa_removida() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO tarefa_removida(tarefa_id, usuario_id) VALUES (OLD.id, OLD.usuario_id);
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS tarefa_removida_exclusao ON tarefa',
+    """CREATE TRIGGER tarefa_removida_exclusao AFTER DELETE ON tarefa
+        FOR EACH ROW EXECUTE FUNCTION registrar_tarefa_removida()"""
+)
+
+def criar_registro_exclusoes(motor):
+    """Cria o gatilho das lápides no banco."""
+    comandos = {'sqlite': SQL_EXCLUSOES_SQLITE, 'postgresql': SQL_EXCLUSOES_POSTGRES}.get(motor.dialect.name, ())
+    with motor.begin() as conexao:
+        for comando in comandos:
+            conexao.execute(db.text(comando))
+
+def ler_versao(valor):
+    try:
+        return max(int(valor), 0)
+    except (ValueError, TypeError):
+        return 0
+
+def alteracoes_desde(usuario_id, desde, limite):
+    """
+    Tarefas alteradas e ids excluídos depois da versão "desde". O cliente aplica as
+    exclusões antes das tarefas e guarda "versao" para o próximo pedido; com "mais"
+    ainda há alterações e ele pede de novo a partir dela. "completo" (desde = 0, uma
+    versão que o servidor não conhece ou anterior às lápides já apagadas) traz todas
+    as tarefas: o cliente descarta o que tinha. A página termina sempre numa versão inteira, então um lote maior
+    que o limite vem de uma vez.
+    """
+    versao_atual, versao_minima = db.session.query(
+        Usuario.versao_tarefas, Usuario.versao_minima_sync
+    ).filter(Usuario.id == usuario_id).one()
+    completo = desde <= 0 or desde > versao_atual or desde < versao_minima
+    if completo:
+        desde = 0
+    elif desde == versao_atual:
+        return {'versao': versao_atual, 'completo': False, 'mais': False, 'tarefas': [], 'removidas': []}
+
+    modelos = (Tarefa,) if completo else (Tarefa, TarefaRemovida)
+    versoes = sorted(
+        versao
+        for modelo in modelos
+        for (versao,) in db.session.query(modelo.versao)
+            .filter(modelo.usuario_id == usuario_id, modelo.versao > desde)
+            .order_by(modelo.versao).limit(limite + 1)
+    )
+    ate = versao_atual
+    if len(versoes) > limite:
+        ate = versoes[limite] - 1 if versoes[limite] > versoes[0] else versoes[0]
+
+    tarefas = Tarefa.query.filter(
+        Tarefa.usuario_id == usuario_id, Tarefa.versao > desde, Tarefa.versao <= ate
+    ).order_by(Tarefa.versao, Tarefa.id).all()
+    removidas = [] if completo else [id_tarefa for (id_tarefa,) in db.session.query(TarefaRemovida.tarefa_id).filter(
+        TarefaRemovida.usuario_id == usuario_id, TarefaRemovida.versao > desde, TarefaRemovida.versao <= ate
+    ).distinct()]
+    return {
+        'versao': ate,
+        'completo': completo,
+        'mais': ate < versao_atual,
+        'tarefas': [tarefa.para_dict() for tarefa in tarefas],
+        'removidas': removidas
+    }
+
+@principal.route('/api/sync')
+@login_required
+def api_sync():
+    try:
+        limite = min(int(request.args.get('limite', current_app.config['SYNC_LIMITE'])), current_app.config['SYNC_LIMITE'])
+    except (ValueError, TypeError):
+        limite = current_app.config['SYNC_LIMITE']
+    resposta = jsonify(alteracoes_desde(current_user.id, ler_versao(request.args.get('since')), max(limite, 1)))
+    resposta.cache_control.no_store = True
+    return resposta
+
+@principal.route('/api/sync/eventos')
+@login_required
+def api_sync_eventos():
+    """
+    Server-sent events com as mesmas alterações do /api/sync (id do evento = versão,
+    então o EventSource retoma de onde parou pelo Last-Event-ID). Só com workers
+    gevent a conexão fica aberta; com workers sync responde uma vez e o navegador
+    reconecta depois do "retry", virando uma consulta periódica.
+    """
+    usuario_id = current_user.id
+    desde = ler_versao(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    intervalo = max(current_app.config['SYNC_EVENTOS_INTERVALO'], 1)
+    duracao = current_app.config['SYNC_EVENTOS_DURACAO'] if cooperativo() else 0
+    limite = current_app.config['SYNC_LIMITE']
+
+    def eventos():
+        nonlocal desde
+        fim = time.monotonic() + duracao
+        primeiro = True
+        yield f'retry: {intervalo * 1000}\n\n'
+        while True:
+            pacote = alteracoes_desde(usuario_id, desde, limite)
+            # Devolve a conexão ao pool enquanto espera a próxima verificação
+            db.session.close()
+            if pacote['tarefas'] or pacote['removidas'] or (pacote['completo'] and primeiro):
+                primeiro = False
+                desde = pacote['versao']
+                yield f"id: {desde}\nevent: alteracoes\ndata: {json.dumps(pacote)}\n\n"
+                if pacote['mais']:
+                    continue
+            if time.monotonic() >= fim:
+                return
+            # Comentário SSE: mantém a conexão viva em proxies que fecham conexões ociosas
+            yield ': ping\n\n'
+            time.sleep(intervalo)
+
+    resposta = Response(stream_with_context(eventos()), mimetype='text/event-stream')
+    resposta.cache_control.no_cache = True
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
+# ===============================================
+# MANUTENÇÃO (limpeza, arquivo de tarefas e otimização do banco)
+# ===============================================
+class TarefaPeriodica:
+    """
+    Rotina que roda por um comando ou numa thread em cada worker; a linha NOME
+    da tabela agendamento garante uma execução por intervalo entre todos os workers.
+    """
+    NOME = None
+    # Chave da configuração com o intervalo entre execuções (s)
+    INTERVALO = None
+
+    def __init__(self):
+        self.app = None
+        self._trava = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+
+    def iniciar(self):
+        with self._trava:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name=self.NOME, daemon=True)
+                self._thread.start()
+
+    def _executar(self):
+        intervalo = self.app.config[self.INTERVALO]
+        while True:
+            try:
+                with self.app.app_context():
+                    if self.reservar():
+                        self.executar()
+            except Exception as e:
+                logger.exception('Erro na rotina periódica', extra={'rotina': self.NOME})
+            # Confere a vez com folga: se o worker que reservou cair, outro assume no próximo intervalo
+            time.sleep(min(intervalo, 3600))
+
+    def reservar(self):
+        """Marca a próxima execução se esta já venceu. True se este processo deve executar."""
+        agora = datetime.utcnow()
+        if db.session.get(Agendamento, self.NOME) is None:
+            try:
+                db.session.add(Agendamento(nome=self.NOME))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+        reservado = Agendamento.query.filter(
+            Agendamento.nome == self.NOME,
+            db.or_(Agendamento.proxima_execucao.is_(None), Agendamento.proxima_execucao <= agora)
+        ).update({
+            Agendamento.proxima_execucao: agora + timedelta(seconds=self.app.config[self.INTERVALO])
+        }, synchronize_session=False)
+        db.session.commit()
+        return reservado == 1
+
+    def registrar_execucao(self, resultado):
+        agendamento = db.session.get(Agendamento, self.NOME)
+        if agendamento is not None:
+            agendamento.ultima_execucao = datetime.utcnow()
+            agendamento.ultimo_resultado = json.dumps(resultado)
+            db.session.commit()
+
+    def executar(self):
+        raise NotImplementedError
+
+class Manutencao(TarefaPeriodica):
+    """
+    Tarefas periódicas que mantêm as tabelas quentes pequenas: limpa tokens de
+    recuperação vencidos, emails antigos da fila e lápides da sincronização, move
+    as tarefas concluídas há mais de MANUTENCAO_ARQUIVAR_DIAS para o arquivo e
+    roda ANALYZE (e VACUUM no SQLite, se houver muito espaço livre).
+    Roda pelo comando "flask manutencao" ou numa thread em cada worker.
+    """
+    NOME = 'manutencao'
+    INTERVALO = 'MANUTENCAO_INTERVALO'
+
+    def executar(self, vacuum=None):
+        """Roda todas as etapas. vacuum: True força, False pula, None decide pelo espaço livre."""
+        inicio = time.perf_counter()
+        resultado = {'tokens': 0, 'emails': self.limpar_emails(), 'lapides': 0, 'arquivadas': 0}
+        for shard in roteador_shards.shards:
+            with roteador_shards.usar(shard):
+                resultado['tokens'] += self.limpar_tokens()
+                resultado['lapides'] += self.limpar_lapides()
+                resultado['arquivadas'] += self.arquivar_tarefas()
+        resultado.update(self.otimizar_banco(vacuum))
+        resultado['segundos'] = round(time.perf_counter() - inicio, 2)
+        self.registrar_execucao(resultado)
+        logger.info('Manutenção concluída', extra=resultado)
+        return resultado
+
+    def limpar_tokens(self):
+        """Apaga os tokens de recuperação de senha vencidos."""
+        agora = datetime.utcnow()
+        ids = [id_usuario for (id_usuario,) in db.session.query(Usuario.id).filter(Usuario.token_expiracao < agora)]
+        if ids:
+            Usuario.query.filter(Usuario.id.in_(ids), Usuario.token_expiracao < agora).update({
+                Usuario.token_recuperacao: None,
+                Usuario.token_expiracao: None
+            }, synchronize_session=False)
+            db.session.commit()
+            for id_usuario in ids:
+                cache_usuarios.invalidar(id_usuario)
+        return len(ids)
+
+    def limpar_emails(self):
+        """Apaga da fila os emails já enviados (ou que desistiram) há mais de EMAIL_RETENCAO_DIAS."""
+        dias = self.app.config['EMAIL_RETENCAO_DIAS']
+        if dias <= 0:
+            return 0
+        apagados = EmailPendente.query.filter(
+            EmailPendente.status.in_(('enviado', 'falhou')),
+            EmailPendente.data_criacao < datetime.utcnow() - timedelta(days=dias)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return apagados
+
+    def limpar_lapides(self):
+        """
+        Apaga as lápides com mais de SYNC_LAPIDES_DIAS e guarda, por usuário, a
+        maior versão apagada: um cliente parado desde antes dela recebe a lista inteira.
+        """
+        dias = self.app.config['SYNC_LAPIDES_DIAS']
+        if dias <= 0:
+            return 0
+        corte = datetime.utcnow() - timedelta(days=dias)
+        antigas = db.session.query(
+            TarefaRemovida.usuario_id, db.func.max(TarefaRemovida.versao)
+        ).filter(TarefaRemovida.removida_em < corte, TarefaRemovida.versao.isnot(None)).group_by(TarefaRemovida.usuario_id).all()
+        for id_usuario, versao in antigas:
+            Usuario.query.filter(Usuario.id == id_usuario, Usuario.versao_minima_sync < versao).update(
+                {Usuario.versao_minima_sync: versao}, synchronize_session=False)
+        apagadas = TarefaRemovida.query.filter(
+            TarefaRemovida.removida_em < corte, TarefaRemovida.versao.isnot(None)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return apagadas
+
+    def arquivar_tarefas(self):
+        """Move as tarefas concluídas há mais de MANUTENCAO_ARQUIVAR_DIAS para tarefa_arquivada, em lotes."""
+        dias = self.app.config['MANUTENCAO_ARQUIVAR_DIAS']
+        if dias <= 0:
+            return 0
+        corte = datetime.utcnow() - timedelta(days=dias)
+        # Concluídas antes de existir concluida_em contam pela data de criação
+        # A ocorrência que ainda guarda a regra de repetição fica (a regra passa para a próxima)
+        antigas = db.and_(Tarefa.feito == db.true(), Tarefa.recorrencia.is_(None), db.or_(
+            Tarefa.concluida_em < corte,
+            db.and_(Tarefa.concluida_em.is_(None), Tarefa.data_criacao < corte)
+        ))
+        # O arquivo tem id próprio: o SQLite reaproveita o id da última tarefa apagada
+        colunas = ('texto', 'descricao', 'data', 'link', 'prazo', 'usuario_id', 'data_criacao')
+        total = 0
+        while True:
+            # FOR UPDATE (PostgreSQL): o usuário não altera a tarefa entre a cópia e a exclusão
+            lote = db.session.query(Tarefa.id, Tarefa.usuario_id).filter(antigas).order_by(Tarefa.id) \
+                .limit(self.app.config['MANUTENCAO_LOTE']).with_for_update(skip_locked=True).all()
+            if not lote:
+                return total
+            ids = [linha.id for linha in lote]
+            try:
+                db.session.execute(db.insert(TarefaArquivada).from_select(
+                    [*colunas, 'concluida_em', 'arquivada_em'],
+                    db.select(*(getattr(Tarefa, coluna) for coluna in colunas),
+                              db.func.coalesce(Tarefa.concluida_em, Tarefa.data_criacao),
+                              db.literal(datetime.utcnow(), db.DateTime))
+                    .where(Tarefa.id.in_(ids), antigas).order_by(Tarefa.id)
+                ))
+                Tarefa.query.filter(Tarefa.id.in_(ids), antigas).delete(synchronize_session=False)
+                # Para o dashboard (ETag) e a sincronização, arquivar é uma exclusão
+                for id_usuario in {linha.usuario_id for linha in lote}:
+                    registrar_alteracao_tarefas(id_usuario)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            total += len(ids)
+
+    def otimizar_banco(self, vacuum=None):
+        """ANALYZE para o planejador; no SQLite, VACUUM quando há muitas páginas livres e checkpoint do WAL."""
+        resultado = {'vacuum': False}
+        for shard in roteador_shards.shards:
+            motor = roteador_shards.motor(shard)
+            with motor.connect().execution_options(isolation_level='AUTOCOMMIT') as conexao:
+                if motor.dialect.name == 'sqlite':
+                    conexao.execute(db.text('ANALYZE'))
+                    vacuum_shard = vacuum
+                    if vacuum_shard is None:
+                        paginas = conexao.execute(db.text('PRAGMA page_count')).scalar() or 0
+                        livres = conexao.execute(db.text('PRAGMA freelist_count')).scalar() or 0
+                        vacuum_shard = paginas > 0 and livres * 100 / paginas >= self.app.config['MANUTENCAO_VACUUM_LIVRE']
+                    if vacuum_shard:
+                        conexao.execute(db.text('VACUUM'))
+                        resultado['vacuum'] = True
+                    conexao.execute(db.text('PRAGMA wal_checkpoint(TRUNCATE)'))
+                elif motor.dialect.name == 'postgresql':
+                    # O autovacuum cuida do VACUUM; aqui só quando pedido explicitamente
+                    tabelas = TABELAS_POR_USUARIO
+                    if shard == RoteadorShards.PRINCIPAL:
+                        tabelas += ('email_pendente', 'diretorio_usuario')
+                    tabelas = ', '.join(tabelas)
+                    conexao.execute(db.text(f'VACUUM (ANALYZE) {tabelas}' if vacuum else f'ANALYZE {tabelas}'))
+                    resultado['vacuum'] = resultado['vacuum'] or bool(vacuum)
+        return resultado
+
+manutencao = extensao_atual('manutencao')
+
+@principal.before_app_request
+def iniciar_manutencao():
+    # Na primeira requisição do worker, sobe o agendador (a vez é disputada pelo banco)
+    if manutencao._thread is None and current_app.config['MANUTENCAO_INTERVALO'] > 0:
+        manutencao.iniciar()
+
+@principal.cli.command('manutencao')
+@click.option('--vacuum/--sem-vacuum', default=None, help='Força (ou pula) o VACUUM; por padrão decide pelo espaço livre.')
+@click.option('--continuo', is_flag=True, help='Repete a cada MANUTENCAO_INTERVALO segundos em vez de sair.')
+def manutencao_comando(vacuum, continuo):
+    """Limpa tokens, emails e lápides antigos, arquiva tarefas concluídas e otimiza o banco."""
+    while True:
+        resultado = manutencao.executar(vacuum)
+        click.echo(f"🧹 Tokens: {resultado['tokens']}  emails: {resultado['emails']}  lápides: {resultado['lapides']}  "
+                   f"arquivadas: {resultado['arquivadas']}  vacuum: {'sim' if resultado['vacuum'] else 'não'}  "
+                   f"({resultado['segundos']} s)")
+        if not continuo:
+            return
+        time.sleep(max(current_app.config['MANUTENCAO_INTERVALO'], 60))
+
+# Arquivo de tarefas concluídas (página e JSON), paginado pelo índice (usuario_id, concluida_em, id)
+def pagina_arquivo(usuario_id, por_pagina):
+    return paginar_por_cursor(
+        TarefaArquivada.query.filter(TarefaArquivada.usuario_id == usuario_id),
+        [TarefaArquivada.concluida_em, TarefaArquivada.id],
+        por_pagina,
+        depois=request.args.get('depois'),
+        antes=request.args.get('antes'),
+        decrescente=True
+    )
+
+@principal.route('/arquivo')
+@login_required
+def arquivo():
+    tarefas, cursor_anterior, cursor_proximo = pagina_arquivo(current_user.id, current_app.config['TAREFAS_POR_PAGINA'])
+    return render_template('arquivo.html',
+                           tarefas=tarefas,
+                           cursor_anterior=cursor_anterior,
+                           cursor_proximo=cursor_proximo,
+                           dias=current_app.config['MANUTENCAO_ARQUIVAR_DIAS'])
+
+@principal.route('/api/tarefas/arquivadas')
+@login_required
+def api_tarefas_arquivadas():
+    try:
+        por_pagina = min(int(request.args.get('limite', current_app.config['TAREFAS_POR_PAGINA'])), 200)
+    except (ValueError, TypeError):
+        por_pagina = current_app.config['TAREFAS_POR_PAGINA']
+    tarefas, cursor_anterior, cursor_proximo = pagina_arquivo(current_user.id, max(por_pagina, 1))
+    return jsonify({
+        'tarefas': [tarefa.para_dict() for tarefa in tarefas],
+        'anterior': cursor_anterior,
+        'proximo': cursor_proximo
+    })
+
+# ===============================================
+# TAREFAS REPETIDAS E LEMBRETES
+# ===============================================
+# Regras de repetição guardadas em tarefa.recorrencia: "diaria", "semanal:0,2,4"
+# (dias da semana, 0 = segunda como em DIAS_SEMANA) e "mensal:15" (dia do mês; nos
+# meses mais curtos, o último dia)
+TIPOS_RECORRENCIA = ('diaria', 'semanal', 'mensal')
+PADRAO_LEMBRETE = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+def ler_recorrencia(texto):
+    """Normaliza a regra de repetição. Retorna (regra ou None, erro)."""
+    texto = (texto or '').strip().lower()
+    if not texto:
+        return None, None
+    tipo, _, parametro = texto.partition(':')
+    try:
+        if tipo == 'diaria' and not parametro:
+            return 'diaria', None
+        if tipo == 'semanal':
+            dias = sorted({int(dia) for dia in parametro.split(',')})
+            if dias and all(0 <= dia <= 6 for dia in dias):
+                return f"semanal:{','.join(map(str, dias))}", None
+        if tipo == 'mensal' and 1 <= int(parametro) <= 31:
+            return f'mensal:{int(parametro)}', None
+    except ValueError:
+        pass
+    return None, 'Repetição inválida. Use "diaria", "semanal:0,2,4" (0 = segunda) ou "mensal:15".'
+
+def ler_lembrete(texto):
+    """Normaliza a hora do lembrete ("HH:MM"). Retorna (hora ou None, erro)."""
+    texto = (texto or '').strip()
+    if not texto:
+        return None, None
+    if len(texto) == 4 and texto[1] == ':':
+        texto = '0' + texto
+    if not PADRAO_LEMBRETE.match(texto):
+        return None, 'Lembrete inválido. Use a hora no formato HH:MM.'
+    return texto, None
+
+def proxima_data(regra, depois_de):
+    """Primeira data da regra estritamente depois de depois_de."""
+    tipo, _, parametro = regra.partition(':')
+    if tipo == 'diaria':
+        return depois_de + timedelta(days=1)
+    if tipo == 'semanal':
+        dias = {int(dia) for dia in parametro.split(',')}
+        return next(depois_de + timedelta(days=salto) for salto in range(1, 8)
+                    if (depois_de + timedelta(days=salto)).weekday() in dias)
+    dia_mes = int(parametro)
+    ano, mes = depois_de.year, depois_de.month
+    for _ in range(2):
+        candidata = date(ano, mes, min(dia_mes, monthrange(ano, mes)[1]))
+        if candidata > depois_de:
+            return candidata
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+def descrever_recorrencia(regra):
+    """Texto da regra para a lista de tarefas (ex.: "toda segunda e quarta")."""
+    if not regra:
+        return ''
+    tipo, _, parametro = regra.partition(':')
+    if tipo == 'diaria':
+        return 'todo dia'
+    if tipo == 'semanal':
+        nomes = [DIAS_SEMANA[int(dia)].lower() for dia in parametro.split(',')]
+        return 'toda ' + (' e '.join([', '.join(nomes[:-1]), nomes[-1]]) if len(nomes) > 1 else nomes[0])
+    return f'todo dia {parametro} do mês'
+
+def recorrencia_do_formulario(formulario, prazo):
+    """Regra a partir dos campos do formulário: repetir e dias_semana (sem dia, o do prazo ou de hoje)."""
+    repetir = formulario.get('repetir', '')
+    referencia = prazo or lembretes.hoje()
+    if repetir == 'semanal':
+        dias = formulario.getlist('dias_semana') or [str(referencia.weekday())]
+        return f"semanal:{','.join(dias)}"
+    if repetir == 'mensal':
+        return f'mensal:{referencia.day}'
+    return repetir
+
+def calcular_agenda(prazo, recorrencia, lembrete, feito):
+    """
+    Colunas calculadas a partir do prazo, da regra e do lembrete: a próxima
+    ocorrência e o instante do lembrete (só se ainda não passou e a tarefa está
+    pendente). Tarefa repetida sem prazo começa na primeira ocorrência a partir de hoje.
+    """
+    valores = {'proxima_ocorrencia': None, 'lembrete_em': None}
+    if recorrencia:
+        if prazo is None:
+            prazo = proxima_data(recorrencia, lembretes.hoje() - timedelta(days=1))
+            valores.update(prazo=prazo, data=prazo.isoformat())
+        valores['proxima_ocorrencia'] = proxima_data(recorrencia, prazo)
+    if lembrete and prazo and not feito:
+        instante = lembretes.instante(prazo, lembrete)
+        if instante > datetime.utcnow():
+            valores['lembrete_em'] = instante
+    return valores
+
+def programar_tarefa(tarefa):
+    """Atualiza as colunas calculadas depois de mudar prazo, regra, lembrete ou status da tarefa."""
+    for campo, valor in calcular_agenda(tarefa.prazo, tarefa.recorrencia, tarefa.lembrete, tarefa.feito).items():
+        setattr(tarefa, campo, valor)
+
+class Lembretes(TarefaPeriodica):
+    """
+    Agendador das tarefas repetidas e dos lembretes. Cada rodada lê só o que já
+    venceu, pelos índices parciais de proxima_ocorrencia e lembrete_em, em lotes
+    de LEMBRETES_LOTE; nem ele nem o dashboard percorrem as outras tarefas:
+      - chegou a próxima ocorrência de uma tarefa repetida: se ela está pendente,
+        muda para a nova data; se foi concluída, uma cópia pendente assume a regra;
+      - lembretes vencidos viram um email por usuário, com todas as tarefas dele,
+        até LEMBRETES_POR_MINUTO emails por minuto (o resto fica para a rodada seguinte).
+    Os emails entram na fila (email_pendente) e saem em lotes pela conexão SMTP
+    do despachante, com a mesma configuração do Flask-Mail.
+    """
+    NOME = 'lembretes'
+    INTERVALO = 'LEMBRETES_INTERVALO'
+    # Lembretes vencidos há mais tempo (agendador parado) são descartados sem email
+    ATRASO_MAXIMO = timedelta(hours=12)
+
+    def __init__(self):
+        super().__init__()
+        self.fuso = None
+
+    def init_app(self, app):
+        super().init_app(app)
+        self.fuso = None
+        if app.config['LEMBRETES_FUSO']:
+            try:
+                self.fuso = ZoneInfo(app.config['LEMBRETES_FUSO'])
+            except (ZoneInfoNotFoundError, ValueError):
+                logger.warning('Fuso dos lembretes desconhecido; usando o do servidor',
+                               extra={'fuso': app.config['LEMBRETES_FUSO']})
+
+    def hoje(self):
+        return datetime.now(self.fuso).date()
+
+    def instante(self, prazo, hora):
+        """Instante (UTC sem fuso, como as outras datas do banco) da hora do lembrete no dia do prazo."""
+        local = datetime.combine(prazo, datetime.strptime(hora, '%H:%M').time())
+        local = local.replace(tzinfo=self.fuso) if self.fuso else local.astimezone()
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def executar(self):
+        inicio = time.perf_counter()
+        # Emails desta rodada: só um processo executa por intervalo, então o limite vale para todos
+        cota = max(self.app.config['LEMBRETES_POR_MINUTO'] * max(self.app.config['LEMBRETES_INTERVALO'], 60) // 60, 1)
+        resultado = {'ocorrencias': 0, 'lembretes': 0, 'emails': 0, 'descartados': 0}
+        for shard in roteador_shards.shards:
+            with roteador_shards.usar(shard):
+                resultado['ocorrencias'] += self.avancar_recorrencias()
+                for chave, valor in self.enviar_lembretes(cota - resultado['emails']).items():
+                    resultado[chave] += valor
+        if resultado['emails']:
+            despachante_email.acordar()
+        resultado['segundos'] = round(time.perf_counter() - inicio, 2)
+        self.registrar_execucao(resultado)
+        if resultado['ocorrencias'] or resultado['lembretes'] or resultado['descartados']:
+            logger.info('Lembretes processados', extra=resultado)
+        return resultado
+
+    def avancar_recorrencias(self):
+        """Leva as tarefas repetidas vencidas à ocorrência de hoje. Retorna quantas foram criadas ou movidas."""
+        hoje = self.hoje()
+        total = 0
+        while True:
+            lote = Tarefa.query.filter(Tarefa.proxima_ocorrencia <= hoje).order_by(Tarefa.proxima_ocorrencia) \
+                .limit(self.app.config['LEMBRETES_LOTE']).with_for_update(skip_locked=True).all()
+            if not lote:
+                return total
+            try:
+                for tarefa in lote:
+                    # Agendador parado por alguns dias: vai direto para a ocorrência mais recente
+                    prazo = tarefa.proxima_ocorrencia
+                    while (seguinte := proxima_data(tarefa.recorrencia, prazo)) <= hoje:
+                        prazo = seguinte
+                    ocorrencia = tarefa
+                    if tarefa.feito:
+                        ocorrencia = Tarefa(texto=tarefa.texto, descricao=tarefa.descricao, link=tarefa.link,
+                                            recorrencia=tarefa.recorrencia, lembrete=tarefa.lembrete,
+                                            usuario_id=tarefa.usuario_id, feito=False)
+                        db.session.add(ocorrencia)
+                        tarefa.recorrencia = None
+                        tarefa.proxima_ocorrencia = None
+                    ocorrencia.prazo = prazo
+                    ocorrencia.data = prazo.isoformat()
+                    programar_tarefa(ocorrencia)
+                for id_usuario in {tarefa.usuario_id for tarefa in lote}:
+                    registrar_alteracao_tarefas(id_usuario)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            total += len(lote)
+
+    def enviar_lembretes(self, cota):
+        """
+        Junta os lembretes vencidos em um email por usuário e os coloca na fila,
+        até "cota" emails. Retorna as contagens de lembretes, emails e descartados.
+        """
+        resultado = {'lembretes': 0, 'emails': 0, 'descartados': 0}
+        agora = datetime.utcnow()
+        while cota > 0:
+            lote = db.session.query(Tarefa.id, Tarefa.usuario_id, Tarefa.texto, Tarefa.prazo, Tarefa.lembrete,
+                                    Tarefa.lembrete_em) \
+                .filter(Tarefa.lembrete_em <= agora).order_by(Tarefa.lembrete_em) \
+                .limit(self.app.config['LEMBRETES_LOTE']).all()
+            if not lote:
+                break
+            por_usuario, processadas = {}, []
+            for linha in lote:
+                if not email_habilitado() or linha.lembrete_em < agora - self.ATRASO_MAXIMO:
+                    processadas.append(linha.id)
+                    resultado['descartados'] += 1
+                elif linha.usuario_id in por_usuario or len(por_usuario) < cota:
+                    por_usuario.setdefault(linha.usuario_id, []).append(linha)
+
+            usuarios = db.session.query(Usuario.id, Usuario.nome, Usuario.email) \
+                .filter(Usuario.id.in_(list(por_usuario))).all() if por_usuario else []
+            for usuario in usuarios:
+                tarefas = por_usuario[usuario.id]
+                db.session.add(EmailPendente(destinatario=usuario.email, **self.montar_email(usuario.nome, tarefas)))
+                processadas.extend(tarefa.id for tarefa in tarefas)
+                resultado['lembretes'] += len(tarefas)
+                resultado['emails'] += 1
+                cota -= 1
+            if not processadas:
+                break
+            try:
+                # A versão fica: o lembrete enviado não muda nada que os apps mostram
+                Tarefa.query.filter(Tarefa.id.in_(processadas), Tarefa.lembrete_em <= agora).update(
+                    {Tarefa.lembrete_em: None, Tarefa.versao: Tarefa.versao}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return resultado
+
+    @staticmethod
+    def montar_email(nome, tarefas):
+        linhas = '\n'.join(
+            f"• {tarefa.texto} ({tarefa.prazo.strftime('%d/%m/%Y')}, {tarefa.lembrete})" for tarefa in tarefas
+        )
+        assunto = f'🔔 Lembrete: {tarefas[0].texto}' if len(tarefas) == 1 else f'🔔 {len(tarefas)} tarefas para lembrar'
+        corpo = f'''Olá {nome},
+
+Lembrete das suas tarefas:
+
+{linhas}
+
+Atenciosamente,
+myLife
+'''
+        return {'assunto': f'{assunto} - myLife'[:200], 'corpo': corpo}
+
+lembretes = extensao_atual('lembretes')
+
+@principal.before_app_request
+def iniciar_lembretes():
+    # Na primeira requisição do worker, sobe o agendador (a vez é disputada pelo banco)
+    if lembretes._thread is None and current_app.config['LEMBRETES_INTERVALO'] > 0:
+        lembretes.iniciar()
+
+@principal.cli.command('lembretes')
+@click.option('--continuo', is_flag=True, help='Repete a cada LEMBRETES_INTERVALO segundos em vez de sair.')
+def lembretes_comando(continuo):
+    """Cria as ocorrências das tarefas repetidas e coloca os lembretes vencidos na fila de emails."""
+    while True:
+        resultado = lembretes.executar()
+        click.echo(f"🔁 Ocorrências: {resultado['ocorrencias']}  🔔 lembretes: {resultado['lembretes']} "
+                   f"em {resultado['emails']} email(s)  descartados: {resultado['descartados']}  "
+                   f"({resultado['segundos']} s)")
+        if not continuo:
+            return
+        time.sleep(max(current_app.config['LEMBRETES_INTERVALO'], 60))
+
+# ===============================================
+# MOVER USUÁRIOS ENTRE SHARDS (rebalanceamento)
+# ===============================================
+def apagar_dados_usuario(conexao, usuario_id):
+    """Apaga de um shard o usuário e tudo dele (as lápides que o gatilho cria vão junto)."""
+    for modelo in (Tarefa, TarefaArquivada, TarefaRemovida, Usuario):
+        tabela = modelo.__table__
+        conexao.execute(db.delete(tabela).where((tabela.c.id if modelo is Usuario else tabela.c.usuario_id) == usuario_id))
+
+def mover_usuario(usuario_id, destino, lote=1000):
+    """
+    Copia o usuário, as tarefas e o arquivo para o shard de destino, aponta o
+    diretório para ele e só então apaga a origem. Durante a cópia o usuário fica
+    travado na origem: as escritas dele esperam (no SQLite, as do banco todo).
+    Os ids das tarefas são de cada banco, então elas ganham ids novos e a versão
+    mínima de sincronização sobe: os clientes recebem a lista completa.
+    Retorna quantas tarefas (ativas e arquivadas) foram copiadas.
+    """
+    origem = roteador_shards.shard_do_usuario(usuario_id)
+    if origem is None:
+        raise ValueError(f'Usuário {usuario_id} não encontrado.')
+    if destino not in roteador_shards.shards:
+        raise ValueError(f"Shard desconhecido: {destino} (configurados: {', '.join(roteador_shards.shards)}).")
+    if origem == destino:
+        return 0
+    # Devolve as conexões da sessão antes de travar os bancos
+    db.session.close()
+
+    usuarios = Usuario.__table__
+    copiadas = 0
+    with roteador_shards.motor(origem).begin() as leitura:
+        # FOR UPDATE no PostgreSQL também segura quem insere tarefas (a chave estrangeira)
+        usuario = dict(leitura.execute(
+            db.select(usuarios).where(usuarios.c.id == usuario_id).with_for_update()
+        ).mappings().one())
+        versao = leitura.execute(
+            db.update(usuarios).where(usuarios.c.id == usuario_id)
+            .values(versao_tarefas=usuarios.c.versao_tarefas + 1).returning(usuarios.c.versao_tarefas)
+        ).scalar_one()
+        usuario.update(versao_tarefas=versao, versao_minima_sync=versao, tarefas_atualizadas_em=datetime.utcnow())
+
+        with roteador_shards.motor(destino).begin() as escrita:
+            # Restos de uma tentativa interrompida (o diretório ainda aponta para a origem)
+            apagar_dados_usuario(escrita, usuario_id)
+            escrita.execute(db.insert(usuarios), usuario)
+            for modelo in (Tarefa, TarefaArquivada):
+                tabela = modelo.__table__
+                colunas = [coluna for coluna in tabela.c if coluna.name != 'id']
+                resultado = leitura.execution_options(yield_per=lote).execute(
+                    db.select(*colunas).where(tabela.c.usuario_id == usuario_id).order_by(tabela.c.id)
+                )
+                for linhas in resultado.partitions():
+                    registros = [dict(linha._mapping) for linha in linhas]
+                    if modelo is Tarefa:
+                        for registro in registros:
+                            registro['versao'] = versao
+                    escrita.execute(db.insert(tabela), registros)
+                    copiadas += len(registros)
+
+        # Destino gravado: o diretório passa a apontar para ele. Se a origem é o
+        # principal, na mesma transação (o SQLite dela está travado por esta conexão)
+        mudar = db.update(DiretorioUsuario.__table__).where(DiretorioUsuario.__table__.c.id == usuario_id) \
+            .values(shard=destino)
+        if origem == RoteadorShards.PRINCIPAL:
+            leitura.execute(mudar)
+        else:
+            with db.engine.begin() as conexao_principal:
+                conexao_principal.execute(mudar)
+        apagar_dados_usuario(leitura, usuario_id)
+
+    cache_usuarios.invalidar(usuario_id)
+    logger.info('Usuário movido', extra={'usuario_id': usuario_id, 'origem': origem, 'destino': destino,
+                                         'tarefas': copiadas})
+    return copiadas
+
+@principal.cli.command('mover-usuario')
+@click.argument('email')
+@click.argument('destino')
+def mover_usuario_comando(email, destino):
+    """Move um usuário e as tarefas dele para outro shard (principal, shard1, shard2...)."""
+    if not roteador_shards.ativo:
+        raise click.ClickException('Nenhum shard configurado (DATABASE_SHARDS).')
+    entrada = DiretorioUsuario.query.filter_by(email=email.strip().lower()).first()
+    if entrada is None:
+        raise click.ClickException(f'Usuário {email} não encontrado.')
+    origem = entrada.shard
+    try:
+        copiadas = mover_usuario(entrada.id, destino)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"🔀 {email}: {origem} → {destino} ({copiadas} tarefas)")
+
+@principal.cli.command('rebalancear')
+@click.option('--executar', is_flag=True, help='Move os usuários; sem a opção só mostra o plano.')
+@click.option('--limite', type=int, default=0, help='Máximo de usuários movidos nesta execução (0 = todos).')
+def rebalancear_comando(executar, limite):
+    """Move para o shard indicado pelo hash os usuários que estão em outro (ex.: depois de acrescentar um shard)."""
+    if not roteador_shards.ativo:
+        raise click.ClickException('Nenhum shard configurado (DATABASE_SHARDS).')
+    por_shard = dict(db.session.query(DiretorioUsuario.shard, db.func.count()).group_by(DiretorioUsuario.shard).all())
+    pendentes = [
+        (id_usuario, shard)
+        for id_usuario, shard in db.session.query(DiretorioUsuario.id, DiretorioUsuario.shard)
+            .order_by(DiretorioUsuario.id).yield_per(1000)
+        if roteador_shards.shard_para(id_usuario) != shard
+    ]
+    for shard in roteador_shards.shards:
+        click.echo(f"  {shard:<12}{por_shard.get(shard, 0):>8} usuários")
+    click.echo(f"{len(pendentes)} usuário(s) fora do shard indicado pelo hash.")
+    if not executar:
+        if pendentes:
+            click.echo('Rode com --executar para movê-los.')
+        return
+
+    movidos = 0
+    for id_usuario, origem in pendentes[:limite or None]:
+        destino = roteador_shards.shard_para(id_usuario)
+        copiadas = mover_usuario(id_usuario, destino)
+        movidos += 1
+        click.echo(f"🔀 usuário {id_usuario}: {origem} → {destino} ({copiadas} tarefas)")
+    click.echo(f"✅ {movidos} usuário(s) movido(s).")
+
+# Contadores do cache de usuários (por worker)
+@principal.route('/api/status/cache')
+@login_required
+def api_status_cache():
+    return jsonify({'usuarios': cache_usuarios.estatisticas()})
+
+# ===============================================
+# FÁBRICA DA APLICAÇÃO
+# ===============================================
+EXTENSOES = {
+    'metricas': Metricas,
+    'roteador_shards': RoteadorShards,
+    'cache_usuarios': CacheUsuarios,
+    'limitador_login': LimitadorTentativas,
+    'verificador_senhas': VerificadorSenhas,
+    'despachante_email': DespachanteEmail,
+    'manutencao': Manutencao,
+    'lembretes': Lembretes,
+}
+
+def create_app(configuracao=None):
+    """
+    Cria e configura a aplicação. Não acessa o banco: as tabelas são criadas
+    pelo comando "flask migrar" (ou ao rodar "python app.py" localmente).
+    """
+    app = Flask(__name__, template_folder='modelos')
+    carregar_configuracao(app)
+    if configuracao:
+        app.config.update(configuracao)
+    configurar_logs(app)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opcoes_engine(app.config['SQLALCHEMY_DATABASE_URI']))
+    # Os binds não herdam SQLALCHEMY_ENGINE_OPTIONS: cada shard recebe o perfil do seu banco
+    for chave, url in list(app.config['SQLALCHEMY_BINDS'].items()):
+        if isinstance(url, str):
+            app.config['SQLALCHEMY_BINDS'][chave] = {'url': url, **opcoes_engine(url)}
+    urls = [app.config['SQLALCHEMY_DATABASE_URI']] + [
+        str(bind['url'] if isinstance(bind, dict) else bind) for bind in app.config['SQLALCHEMY_BINDS'].values()
+    ]
+    if cooperativo():
+        logger.info('Modo cooperativo (gevent)')
+        if any(url.startswith('postgresql') for url in urls):
+            preparar_postgres_cooperativo()
+
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    # Inicializar Mail apenas se configurações estiverem disponíveis
+    if app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD'):
+        mail.init_app(app)
+    else:
+        logger.warning('Email não configurado. Funcionalidade de recuperação de senha desabilitada. '
+                       'Configure as variáveis MAIL_USERNAME e MAIL_PASSWORD para habilitar.')
+
+    # Um objeto de cada por aplicação; os nomes do módulo (extensao_atual) apontam para o da aplicação atual
+    for nome, classe in EXTENSOES.items():
+        extensao = classe()
+        extensao.init_app(app)
+        app.extensions[nome] = extensao
+    app.extensions['cache_fragmentos'] = BackendMemoria(app.config['FRAGMENTO_CACHE_TAMANHO'])
+
+    before_render_template.connect(iniciar_template, app)
+    template_rendered.connect(registrar_template, app)
+
+    app.jinja_env.globals['url_estatico'] = url_estatico
+    app.jinja_env.globals['descrever_recorrencia'] = descrever_recorrencia
+    app.register_blueprint(principal)
+
+    if app.config['PROXY_CONFIAVEL']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_CONFIAVEL'], x_proto=app.config['PROXY_CONFIAVEL'])
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
+    # Em desenvolvimento, cria/atualiza as tabelas antes de subir o servidor
+    with app.app_context():
+        db.create_all()
+        migrar_banco()
     app.run(
         debug=True,
         use_reloader=True,
@@ -0,0 +1,107 @@
+# Benchmark da busca textual: GET /api/tarefas/busca com muitas tarefas por usuário
+#
+# Popula um banco SQLite temporário (ou o de DATABASE_URL) com N tarefas para o
+# usuário medido e algumas para outros usuários, e mede o tempo de resposta da
+# busca por prefixo comparado com um LIKE '%termo%' sobre as mesmas tarefas.
+#
+# Uso:
+#     python benchmarks/busca.py                   # 100 mil tarefas, 30 buscas por termo
+#     python benchmarks/busca.py -n 20000 -r 50
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+PALAVRAS = (
+    'prova banco dados estudar capítulo livro ler revisar relatório reunião projeto '
+    'mercado academia consulta médico pagar conta aluguel viagem passagem hotel '
+    'apresentação slides trabalho faculdade matemática física química história '
+    'inglês curso vídeo artigo resumo entrega prazo cliente orçamento planilha '
+    'limpeza casa jardim compras presente aniversário família amigos café'
+).split()
+
+BUSCAS = ('banc', 'prova dados', 'relat', 'apresentação slides', 'xyz')
+
+def gerar_tarefas(usuario_id, quantidade, sorteio):
+    for _ in range(quantidade):
+        yield {
+            'texto': ' '.join(sorteio.choices(PALAVRAS, k=sorteio.randint(2, 5))).capitalize(),
+            'descricao': ' '.join(sorteio.choices(PALAVRAS, k=sorteio.randint(0, 12))),
+            'usuario_id': usuario_id,
+            'feito': sorteio.random() < 0.3,
+            'data': '',
+            'link': ''
+        }
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return resultado, statistics.median(tempos), tempos[int(len(tempos) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo da busca textual com muitas tarefas.')
+    parser.add_argument('-n', '--tarefas', type=int, default=100000)
+    parser.add_argument('-r', '--repeticoes', type=int, default=30)
+    args = parser.parse_args()
+
+    temporario = None
+    if not os.getenv('DATABASE_URL'):
+        temporario = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temporario, 'busca.db')}"
+    os.environ['FLASK_DEBUG'] = 'False'
+
+    from app import app, db, migrar_banco, Usuario, Tarefa
+
+    sorteio = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        migrar_banco()
+        usuarios = []
+        for indice in range(3):
+            usuario = Usuario(nome=f'Benchmark {indice}', email=f'benchmark{indice}-{time.time_ns()}@exemplo.com')
+            usuario.set_senha('benchmark')
+            db.session.add(usuario)
+            usuarios.append(usuario)
+        db.session.commit()
+        usuario_id = usuarios[0].id
+
+        inicio = time.perf_counter()
+        for dono, quantidade in ((usuario_id, args.tarefas), (usuarios[1].id, args.tarefas // 10), (usuarios[2].id, args.tarefas // 10)):
+            tarefas = list(gerar_tarefas(dono, quantidade, sorteio))
+            for posicao in range(0, len(tarefas), 5000):
+                db.session.execute(db.insert(Tarefa), tarefas[posicao:posicao + 5000])
+        db.session.commit()
+        print(f"📦 {args.tarefas} tarefas do usuário medido (+{args.tarefas // 5} de outros) inseridas em {time.perf_counter() - inicio:.1f} s")
+        email = usuarios[0].email
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': email, 'senha': 'benchmark'})
+
+    print(f"{'busca':<22}{'resultados':>11}{'API mediana':>14}{'API p95':>10}{'LIKE mediana':>15}")
+    for busca in BUSCAS:
+        resposta, mediana, p95 = medir(lambda: cliente.get('/api/tarefas/busca', query_string={'q': busca}), args.repeticoes)
+        corpo = resposta.get_json()
+
+        with app.app_context():
+            filtros = [db.or_(Tarefa.texto.ilike(f'%{termo}%'), Tarefa.descricao.ilike(f'%{termo}%')) for termo in busca.split()]
+            _, mediana_like, _ = medir(
+                lambda: Tarefa.query.filter(Tarefa.usuario_id == usuario_id, *filtros).limit(20).all(),
+                max(args.repeticoes // 5, 3)
+            )
+        quantidade = f"{len(corpo['tarefas'])}{'+' if corpo['proximo'] else ''}"
+        print(f"{busca:<22}{quantidade:>11}{mediana:>11.1f} ms{p95:>7.1f} ms{mediana_like:>12.1f} ms")
+
+    if temporario:
+        print(f"(banco temporário em {temporario})")
+
+if __name__ == '__main__':
+    main()
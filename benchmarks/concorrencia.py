@@ -0,0 +1,145 @@
+# Benchmark de concorrência: workers sync x gevent com muitas conexões simultâneas
+#
+# Sobe o gunicorn em cada modo (GUNICORN_WORKER_CLASS, ver gunicorn.conf.py) e mantém
+# N conexões abertas ao mesmo tempo (padrão 1000), todas repetindo GET /api/tarefas
+# e GET /dashboard de usuários logados:
+#   - alguns clientes rápidos (--rapidos), cuja latência é a medida;
+#   - o resto são clientes lentos: mandam o pedido em duas partes com --rede-ms de
+#     pausa no meio, como celulares numa rede ruim, e esperam --intervalo-ms antes
+#     do próximo pedido. Enquanto espera um deles, o worker sync não atende mais
+#     ninguém; o gevent atende as outras conexões.
+# Com --rede-ms 0 todos são rápidos e a comparação mede só a CPU.
+#
+# Uso:
+#     python benchmarks/concorrencia.py                     # 1000 conexões, 15 s por modo
+#     python benchmarks/concorrencia.py --rede-ms 0         # sem clientes lentos
+#     python benchmarks/concorrencia.py --modos gevent --workers 4
+import argparse
+import asyncio
+import collections
+import http.cookiejar
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from fluxos import RAIZ, SENHA, SemRedirecionar, abrir, novo_navegador, percentil, popular, porta_livre, preparar_ambiente
+
+ROTAS = ('/api/tarefas', '/dashboard')
+
+def subir_gunicorn(modo, porta, workers):
+    ambiente = dict(os.environ, GUNICORN_WORKER_CLASS=modo)
+    comando = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{porta}', 'app:app']
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{porta}'
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            if abrir(novo_navegador(), base, 'GET', '/login', None)[0] == 200:
+                return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f'O gunicorn ({modo}) não respondeu na porta {porta}.')
+
+def cookie_de_sessao(base, email):
+    cookies = http.cookiejar.CookieJar()
+    navegador = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies), SemRedirecionar())
+    abrir(navegador, base, 'POST', '/login', {'email': email, 'senha': SENHA})
+    return '; '.join(f'{cookie.name}={cookie.value}' for cookie in cookies)
+
+async def pedir(porta, caminho, cookie, rede_ms, timeout):
+    """Uma requisição numa conexão nova. Retorna o status HTTP (0 em erro de conexão)."""
+    leitor, escritor = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', porta), timeout)
+    try:
+        escritor.write(f'GET {caminho} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.encode())
+        if rede_ms:
+            await escritor.drain()
+            await asyncio.sleep(rede_ms / 1000)
+        escritor.write(f'Cookie: {cookie}\r\nConnection: close\r\n\r\n'.encode())
+        await escritor.drain()
+        resposta = await asyncio.wait_for(leitor.read(), timeout)
+        return int(resposta.split(b' ', 2)[1]) if resposta.startswith(b'HTTP/') else 0
+    finally:
+        escritor.close()
+
+async def gerar_carga(porta, cookies, conexoes, rapidos, duracao, rede_ms, intervalo_ms, timeout):
+    """Retorna ({'rapidos'|'lentos': [ms]}, {'rapidos'|'lentos': Counter(status)}, segundos)."""
+    tempos = {'rapidos': [], 'lentos': []}
+    respostas = {'rapidos': collections.Counter(), 'lentos': collections.Counter()}
+    fim = time.perf_counter() + duracao
+
+    async def cliente(indice):
+        tipo = 'rapidos' if indice < rapidos or not rede_ms else 'lentos'
+        pausa = rede_ms if tipo == 'lentos' else 0
+        pedidos = 0
+        while time.perf_counter() < fim:
+            caminho = ROTAS[(indice + pedidos) % len(ROTAS)]
+            pedidos += 1
+            comeco = time.perf_counter()
+            try:
+                status = await pedir(porta, caminho, cookies[indice % len(cookies)], pausa, timeout)
+            except asyncio.TimeoutError:
+                status = 'timeout'
+            except OSError as erro:
+                status = type(erro).__name__
+            respostas[tipo][status] += 1
+            if status == 200:
+                tempos[tipo].append((time.perf_counter() - comeco) * 1000)
+            if pausa and intervalo_ms:
+                await asyncio.sleep(min(intervalo_ms / 1000, max(fim - time.perf_counter(), 0)))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(indice) for indice in range(conexoes)))
+    return tempos, respostas, time.perf_counter() - inicio
+
+def imprimir(modo, tipo, tempos, respostas, decorrido):
+    outras = {status: quantidade for status, quantidade in respostas.items() if status != 200}
+    if tempos:
+        print(f"{modo:<9}{tipo:<9}{len(tempos) / decorrido:>8.1f}{len(tempos):>8}{percentil(tempos, 0.5):>9.0f}"
+              f"{percentil(tempos, 0.95):>9.0f}{percentil(tempos, 0.99):>9.0f}  {outras or '-'}")
+    else:
+        print(f"{modo:<9}{tipo:<9}{0:>8.1f}{0:>8}{'-':>9}{'-':>9}{'-':>9}  {outras or '-'}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Workers sync x gevent com muitas conexões simultâneas.')
+    parser.add_argument('-u', '--usuarios', type=int, default=50)
+    parser.add_argument('-t', '--tarefas', type=int, default=50, help='tarefas por usuário')
+    parser.add_argument('-c', '--conexoes', type=int, default=1000, help='conexões simultâneas')
+    parser.add_argument('-d', '--duracao', type=float, default=15, help='segundos de carga por modo')
+    parser.add_argument('-r', '--rapidos', type=int, default=20, help='clientes rápidos (medidos) entre as conexões')
+    parser.add_argument('--rede-ms', type=float, default=1500, help='pausa no meio do pedido dos clientes lentos')
+    parser.add_argument('--intervalo-ms', type=float, default=10000, help='espera dos clientes lentos entre pedidos')
+    parser.add_argument('--timeout', type=float, default=30, help='segundos até o cliente desistir')
+    parser.add_argument('--workers', type=int, default=2, help='workers do gunicorn')
+    parser.add_argument('--modos', nargs='+', default=('sync', 'gevent'), choices=('sync', 'gthread', 'gevent'))
+    args = parser.parse_args()
+
+    temporario = preparar_ambiente()
+    from app import app
+    contas = popular(app, args.usuarios, args.tarefas)
+
+    print(f"{args.conexoes} conexões simultâneas ({args.rapidos if args.rede_ms else args.conexoes} rápidas), "
+          f"{args.workers} workers, {args.duracao:.0f} s por modo, pausa dos lentos {args.rede_ms:.0f} ms")
+    print(f"{'modo':<9}{'clientes':<9}{'req/s':>8}{'ok':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  outras respostas")
+    for modo in args.modos:
+        porta = porta_livre()
+        processo = subir_gunicorn(modo, porta, args.workers)
+        try:
+            base = f'http://127.0.0.1:{porta}'
+            cookies = [cookie_de_sessao(base, email) for email, _, _ in contas]
+            tempos, respostas, decorrido = asyncio.run(gerar_carga(
+                porta, cookies, args.conexoes, args.rapidos, args.duracao, args.rede_ms, args.intervalo_ms, args.timeout))
+        finally:
+            processo.terminate()
+            processo.wait(10)
+        for tipo in ('rapidos', 'lentos'):
+            if respostas[tipo]:
+                imprimir(modo, tipo, tempos[tipo], respostas[tipo], decorrido)
+
+    if temporario:
+        print(f"\n(banco temporário em {temporario})")
+
+if __name__ == '__main__':
+    sys.exit(main())
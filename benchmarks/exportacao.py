@@ -0,0 +1,105 @@
+# Benchmark da exportação: memória e tempo de GET /api/tarefas/exportar por quantidade de tarefas
+#
+# Popula um banco SQLite temporário (ou o de DATABASE_URL) com cada quantidade de tarefas
+# para um usuário e baixa a exportação em cada formato pelo cliente de teste, medindo o
+# pico de memória alocada (tracemalloc) durante o download. Para comparação, mede também
+# a exportação ingênua: Tarefa.query.filter_by(usuario_id=...).all() e o CSV montado inteiro.
+# Na exportação em lotes o pico não deve crescer com a quantidade de tarefas.
+#
+# Uso:
+#     python benchmarks/exportacao.py                     # 10 mil e 100 mil tarefas
+#     python benchmarks/exportacao.py -n 1000 20000 200000
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from busca import gerar_tarefas
+
+FORMATOS = ('csv', 'ndjson', 'ics')
+
+def medir_memoria(funcao):
+    """Retorna (resultado, pico em MB, segundos)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao()
+    decorrido = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, pico / 1024 / 1024, decorrido
+
+def baixar(cliente, formato):
+    resposta = cliente.get('/api/tarefas/exportar', query_string={'formato': formato}, buffered=False)
+    tamanho = sum(len(bloco) for bloco in resposta.response)
+    resposta.close()
+    return tamanho
+
+def exportar_ingenuo(app, Tarefa, usuario_id):
+    with app.app_context():
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        for tarefa in Tarefa.query.filter_by(usuario_id=usuario_id).all():
+            escritor.writerow([tarefa.id, tarefa.texto, tarefa.descricao, tarefa.data, tarefa.prazo, tarefa.link,
+                               tarefa.feito, tarefa.data_criacao, tarefa.concluida_em])
+        return len(buffer.getvalue().encode())
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória e tempo da exportação por quantidade de tarefas.')
+    parser.add_argument('-n', '--tarefas', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    temporario = None
+    if not os.getenv('DATABASE_URL'):
+        temporario = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temporario, 'exportacao.db')}"
+    os.environ['FLASK_DEBUG'] = 'False'
+    os.environ.setdefault('MANUTENCAO_INTERVALO', '0')
+
+    from app import app, db, migrar_banco, Usuario, Tarefa
+
+    sorteio = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        migrar_banco()
+        usuario = Usuario(nome='Benchmark', email=f'benchmark-{time.time_ns()}@exemplo.com')
+        usuario.set_senha('benchmark')
+        db.session.add(usuario)
+        db.session.commit()
+        usuario_id, email = usuario.id, usuario.email
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': email, 'senha': 'benchmark'})
+
+    print(f"{'tarefas':>9}  {'exportação':<12}{'MB':>8}{'pico MB':>10}{'segundos':>10}")
+    existentes = 0
+    for quantidade in sorted(args.tarefas):
+        with app.app_context():
+            tarefas = [dict(tarefa, prazo=None) for tarefa in gerar_tarefas(usuario_id, quantidade - existentes, sorteio)]
+            for posicao, tarefa in enumerate(tarefas):
+                if posicao % 3 == 0:
+                    tarefa['data'] = f'2026-{posicao % 12 + 1:02d}-{posicao % 28 + 1:02d}'
+                    tarefa['prazo'] = date.fromisoformat(tarefa['data'])
+            for posicao in range(0, len(tarefas), 5000):
+                db.session.execute(db.insert(Tarefa), tarefas[posicao:posicao + 5000])
+            db.session.commit()
+        existentes = quantidade
+
+        for formato in FORMATOS:
+            tamanho, pico, decorrido = medir_memoria(lambda: baixar(cliente, formato))
+            print(f"{quantidade:>9}  {formato:<12}{tamanho / 1024 / 1024:>8.1f}{pico:>10.1f}{decorrido:>10.2f}")
+        tamanho, pico, decorrido = medir_memoria(lambda: exportar_ingenuo(app, Tarefa, usuario_id))
+        print(f"{quantidade:>9}  {'csv (.all())':<12}{tamanho / 1024 / 1024:>8.1f}{pico:>10.1f}{decorrido:>10.2f}")
+
+    if temporario:
+        print(f"(banco temporário em {temporario})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+# Benchmark dos fluxos principais: login, dashboard, adicionar, completar, deletar e recuperar_senha
+#
+# 1. Popula o banco com N usuários × M tarefas (SQLite temporário ou o de DATABASE_URL,
+#    ex.: um PostgreSQL local);
+# 2. Executa as rotas reais pelo cliente de teste do Flask (sem rede, uma por vez),
+#    em algumas rodadas (--rodadas);
+# 3. Sobe o servidor em outro processo (gunicorn ou werkzeug) e gera carga HTTP
+#    concorrente com vários usuários logados;
+# 4. Mostra p50/p95/p99, vazão e consultas SQL por rota (cabeçalho Server-Timing) e
+#    compara com a linha de base salva: erros, rota sem amostras, mais consultas SQL,
+#    mediana (p50) acima da tolerância e do piso ou, na carga HTTP, vazão abaixo da
+#    tolerância encerram com código 1. A linha de base guarda os parâmetros da execução
+#    (usuários, tarefas, concorrência, duração...); com parâmetros diferentes não há
+#    comparação e o código é 2.
+#
+# Uso:
+#     python benchmarks/fluxos.py                              # 20 usuários × 200 tarefas
+#     python benchmarks/fluxos.py -u 50 -t 1000 -c 16 -d 20
+#     DATABASE_URL=postgresql://localhost/mylife_bench python benchmarks/fluxos.py
+#     python benchmarks/fluxos.py --salvar-linha-base          # grava benchmarks/linha_base.json
+#
+# O envio de emails fica desligado (MAIL_SUPPRESS_SEND) e a fila não sobe a thread:
+# recuperar_senha mede só a gravação do email na fila. Os agendadores de manutenção
+# e de lembretes também ficam desligados (MANUTENCAO_INTERVALO=0, LEMBRETES_INTERVALO=0).
+import argparse
+import collections
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+LINHA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linha_base.json')
+SENHA = 'benchmark123'
+ROTAS = ('login', 'index', 'adicionar', 'completar', 'deletar', 'recuperar_senha')
+# Peso de cada rota na carga concorrente (leituras são a maior parte do uso real)
+MISTURA = {'index': 50, 'adicionar': 15, 'completar': 15, 'deletar': 10, 'login': 5, 'recuperar_senha': 5}
+CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+# Parâmetros que mudam os números: só se compara com uma linha de base gravada com os mesmos
+PARAMETROS = {
+    'cliente_teste': ('usuarios', 'tarefas', 'repeticoes', 'rodadas'),
+    'http': ('usuarios', 'tarefas', 'concorrencia', 'duracao', 'servidor', 'workers'),
+}
+
+def preparar_ambiente():
+    temporario = None
+    if not os.getenv('DATABASE_URL'):
+        temporario = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temporario, 'fluxos.db')}"
+    os.environ.update({
+        'FLASK_DEBUG': 'False',
+        'MAIL_USERNAME': 'benchmark@exemplo.com',
+        'MAIL_PASSWORD': 'benchmark',
+        'MAIL_SUPPRESS_SEND': 'True',
+        'EMAIL_FILA_THREAD': 'False',
+        'MANUTENCAO_INTERVALO': '0',
+        'LEMBRETES_INTERVALO': '0',
+        'LOG_NIVEL': 'WARNING',
+        'SQL_LENTA_MS': '100000'
+    })
+    return temporario
+
+def popular(app, usuarios, tarefas):
+    """Cria os usuários e as tarefas. Retorna [(email, ids_completar, ids_deletar)]."""
+    from app import db, migrar_banco, Usuario, Tarefa
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        db.create_all()
+        migrar_banco()
+        sufixo = time.time_ns()
+        hash_senha = generate_password_hash(SENHA)  # um hash só: popular não é o que se mede
+        contas = [Usuario(nome=f'Benchmark {i}', email=f'bench{i}-{sufixo}@exemplo.com', senha_hash=hash_senha)
+                  for i in range(usuarios)]
+        db.session.add_all(contas)
+        db.session.commit()
+
+        registros = [{'texto': f'Tarefa {j} do usuário {conta.id}', 'descricao': 'Gerada pelo benchmark',
+                      'usuario_id': conta.id, 'feito': j % 4 == 0, 'data': '', 'link': ''}
+                     for conta in contas for j in range(tarefas)]
+        for posicao in range(0, len(registros), 5000):
+            db.session.execute(db.insert(Tarefa), registros[posicao:posicao + 5000])
+        db.session.commit()
+
+        resultado = []
+        for conta in contas:
+            pendentes = [id_tarefa for (id_tarefa,) in db.session.query(Tarefa.id).filter_by(
+                usuario_id=conta.id, feito=False).order_by(Tarefa.id)]
+            resultado.append((conta.email, collections.deque(pendentes[0::2]), collections.deque(pendentes[1::2])))
+        return resultado
+
+def requisicao(rota, conta):
+    """(método, caminho, formulário) da rota para o usuário; None se acabaram as tarefas."""
+    email, ids_completar, ids_deletar = conta
+    if rota == 'login':
+        return 'POST', '/login', {'email': email, 'senha': SENHA}
+    if rota == 'index':
+        return 'GET', '/dashboard', None
+    if rota == 'adicionar':
+        return 'POST', '/adicionar', {'texto_tarefa': 'Nova tarefa do benchmark', 'data': '2025-12-01'}
+    if rota == 'recuperar_senha':
+        return 'POST', '/recuperar_senha', {'email': email}
+    try:
+        fila = ids_completar if rota == 'completar' else ids_deletar
+        return 'GET', f'/{rota}/{fila.pop()}', None
+    except IndexError:
+        return None
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(fracao * (len(ordenados) - 1))))]
+
+def resumir(amostras, duracao):
+    """amostras: {rota: [(segundos, consultas, ok)]} -> {rota: estatísticas}."""
+    resumo = {}
+    for rota, valores in amostras.items():
+        if not valores:
+            continue
+        tempos = [v[0] * 1000 for v in valores]
+        resumo[rota] = {
+            'requisicoes': len(valores),
+            'erros': sum(1 for v in valores if not v[2]),
+            'p50_ms': round(percentil(tempos, 0.50), 2),
+            'p95_ms': round(percentil(tempos, 0.95), 2),
+            'p99_ms': round(percentil(tempos, 0.99), 2),
+            'vazao': round(len(valores) / duracao, 1) if duracao else None,
+            'consultas': round(statistics.mean(v[1] for v in valores), 2)
+        }
+    return resumo
+
+def rodar_cliente_teste(app, contas, repeticoes):
+    amostras = collections.defaultdict(list)
+    clientes = []
+    for conta in contas:
+        cliente = app.test_client()
+        cliente.post('/login', data={'email': conta[0], 'senha': SENHA})
+        clientes.append(cliente)
+
+    inicio = time.perf_counter()
+    for rota in ROTAS:
+        for indice in range(repeticoes):
+            posicao = indice % len(contas)
+            pedido = requisicao(rota, contas[posicao])
+            if pedido is None:
+                continue
+            metodo, caminho, formulario = pedido
+            # Login e recuperação de senha partem de uma sessão anônima
+            cliente = app.test_client() if rota in ('login', 'recuperar_senha') else clientes[posicao]
+            comeco = time.perf_counter()
+            resposta = cliente.open(caminho, method=metodo, data=formulario)
+            decorrido = time.perf_counter() - comeco
+            consultas = CONSULTAS.search(resposta.headers.get('Server-Timing', ''))
+            amostras[rota].append((decorrido, int(consultas.group(1)) if consultas else 0, resposta.status_code < 400))
+    return resumir(amostras, None), time.perf_counter() - inicio
+
+class SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *argumentos, **nomeados):
+        return None
+
+def abrir(navegador, base, metodo, caminho, formulario, cabecalhos=None):
+    corpo = urllib.parse.urlencode(formulario).encode() if formulario else None
+    pedido = urllib.request.Request(base + caminho, data=corpo, method=metodo, headers=cabecalhos or {})
+    try:
+        with navegador.open(pedido, timeout=30) as resposta:
+            resposta.read()
+            return resposta.status, resposta.headers
+    except urllib.error.HTTPError as erro:
+        return erro.code, erro.headers
+
+def novo_navegador():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), SemRedirecionar())
+
+def porta_livre():
+    with socket.socket() as soquete:
+        soquete.bind(('127.0.0.1', 0))
+        return soquete.getsockname()[1]
+
+def subir_servidor(servidor, porta, workers):
+    if servidor == 'gunicorn':
+        comando = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', '4',
+                   '-b', f'127.0.0.1:{porta}', 'app:app']
+    else:
+        comando = [sys.executable, '-c',
+                   f'from werkzeug.serving import run_simple; from app import app; '
+                   f'run_simple("127.0.0.1", {porta}, app, threaded=True)']
+    processo = subprocess.Popen(comando, cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=0.5):
+                return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f'O servidor ({servidor}) não respondeu na porta {porta}.')
+
+def rodar_carga_http(contas, servidor, workers, concorrencia, duracao):
+    porta = porta_livre()
+    processo = subir_servidor(servidor, porta, workers)
+    base = f'http://127.0.0.1:{porta}'
+    amostras = collections.defaultdict(list)
+    trava = threading.Lock()
+    fim = time.perf_counter() + duracao
+    rotas, pesos = zip(*MISTURA.items())
+
+    def usuario_virtual(indice):
+        sorteio = random.Random(indice)
+        conta = contas[indice % len(contas)]
+        navegador = novo_navegador()
+        abrir(navegador, base, 'POST', '/login', {'email': conta[0], 'senha': SENHA})
+        locais = collections.defaultdict(list)
+        while time.perf_counter() < fim:
+            rota = sorteio.choices(rotas, pesos)[0]
+            pedido = requisicao(rota, conta)
+            if pedido is None:
+                continue
+            metodo, caminho, formulario = pedido
+            alvo = novo_navegador() if rota in ('login', 'recuperar_senha') else navegador
+            comeco = time.perf_counter()
+            status, cabecalhos = abrir(alvo, base, metodo, caminho, formulario)
+            decorrido = time.perf_counter() - comeco
+            consultas = CONSULTAS.search(cabecalhos.get('Server-Timing', '') if cabecalhos else '')
+            locais[rota].append((decorrido, int(consultas.group(1)) if consultas else 0, status < 400))
+        with trava:
+            for rota, valores in locais.items():
+                amostras[rota].extend(valores)
+
+    try:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concorrencia) as executor:
+            list(executor.map(usuario_virtual, range(concorrencia)))
+        decorrido = time.perf_counter() - inicio
+    finally:
+        processo.terminate()
+        processo.wait(10)
+    return resumir(amostras, decorrido), decorrido
+
+def imprimir(titulo, resumo, decorrido):
+    total = sum(item['requisicoes'] for item in resumo.values())
+    print(f"\n📊 {titulo}: {total} requisições em {decorrido:.1f} s ({total / decorrido:.1f} req/s)")
+    print(f"{'rota':<17}{'n':>6}{'erros':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>8}{'consultas':>11}")
+    for rota in ROTAS:
+        if rota in resumo:
+            item = resumo[rota]
+            vazao = f"{item['vazao']:.1f}" if item['vazao'] is not None else '-'
+            print(f"{rota:<17}{item['requisicoes']:>6}{item['erros']:>7}{item['p50_ms']:>9.1f}{item['p95_ms']:>9.1f}"
+                  f"{item['p99_ms']:>9.1f}{vazao:>8}{item['consultas']:>11.2f}")
+
+# O p95 de ~50 amostras varia muito de uma execução para outra (uma pausa do GC ou da
+# máquina já o move), então a comparação usa a mediana: no cliente de teste, a
+# mediana das rodadas; na carga HTTP, a da execução toda
+AMOSTRAS_MINIMAS = 20
+
+def combinar_rodadas(resumos):
+    """Resumo de cada rota vindo da rodada com o p50 mediano; requisições e erros somam todas."""
+    combinado = {}
+    for rota in {rota for resumo in resumos for rota in resumo}:
+        rodadas = sorted((resumo[rota] for resumo in resumos if rota in resumo), key=lambda item: item['p50_ms'])
+        combinado[rota] = dict(rodadas[len(rodadas) // 2],
+                               requisicoes=sum(item['requisicoes'] for item in rodadas),
+                               erros=sum(item['erros'] for item in rodadas))
+    return combinado
+
+def parametros_diferentes(parametros, linha_base, modos):
+    """Parâmetros da execução que não batem com os da linha de base, nos modos executados."""
+    gravados = linha_base.get('parametros', {})
+    nomes = sorted({nome for modo in modos for nome in PARAMETROS[modo]})
+    return [f"{nome}: linha de base {gravados.get(nome, '?')}, execução {parametros[nome]}"
+            for nome in nomes if gravados.get(nome) != parametros[nome]]
+
+def comparar(resultados, linha_base, tolerancia, piso_ms):
+    """
+    Lista as regressões: erros, rota da linha de base sem amostras, mais consultas
+    por requisição, p50 acima da tolerância e do piso ou (HTTP) vazão abaixo da tolerância.
+    """
+    regressoes = []
+    chave = 'p50_ms'
+    for modo, resumo in resultados.items():
+        for rota in linha_base.get(modo, {}):
+            if rota not in resumo:
+                regressoes.append(f"{modo}/{rota}: nenhuma amostra nesta execução")
+        for rota, atual in resumo.items():
+            if atual['erros']:
+                regressoes.append(f"{modo}/{rota}: {atual['erros']} requisições com erro")
+            base = linha_base.get(modo, {}).get(rota)
+            if not base:
+                continue
+            if atual['consultas'] > base['consultas'] + 0.5:
+                regressoes.append(f"{modo}/{rota}: consultas {base['consultas']} -> {atual['consultas']}")
+            if min(atual['requisicoes'], base['requisicoes']) < AMOSTRAS_MINIMAS:
+                continue
+            # Ignora diferenças de poucos milissegundos (ruído da máquina)
+            if atual[chave] > base[chave] * (1 + tolerancia) and atual[chave] - base[chave] > piso_ms:
+                regressoes.append(f"{modo}/{rota}: {chave[:3]} {base[chave]} ms -> {atual[chave]} ms")
+            if base['vazao'] and atual['vazao'] is not None and atual['vazao'] < base['vazao'] * (1 - tolerancia):
+                regressoes.append(f"{modo}/{rota}: vazão {base['vazao']} -> {atual['vazao']} req/s")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos fluxos principais com linha de base.')
+    parser.add_argument('-u', '--usuarios', type=int, default=20)
+    parser.add_argument('-t', '--tarefas', type=int, default=200, help='tarefas por usuário')
+    parser.add_argument('-r', '--repeticoes', type=int, default=50, help='requisições por rota no cliente de teste')
+    parser.add_argument('--rodadas', type=int, default=3, help='rodadas do cliente de teste (compara a mediana)')
+    parser.add_argument('-c', '--concorrencia', type=int, default=8, help='usuários simultâneos na carga HTTP')
+    parser.add_argument('-d', '--duracao', type=float, default=10, help='segundos de carga HTTP')
+    parser.add_argument('--servidor', choices=('gunicorn', 'werkzeug'), default='gunicorn' if os.name != 'nt' else 'werkzeug')
+    parser.add_argument('--workers', type=int, default=2, help='workers do gunicorn')
+    parser.add_argument('--sem-http', action='store_true', help='roda só o cliente de teste')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='aumento aceito no p50 e queda aceita na vazão (0.25 = 25%%)')
+    parser.add_argument('--piso-ms', type=float, default=10, help='aumentos menores que isso no p50 não contam')
+    parser.add_argument('--linha-base', default=LINHA_BASE)
+    parser.add_argument('--salvar-linha-base', action='store_true')
+    args = parser.parse_args()
+
+    temporario = preparar_ambiente()
+    from app import app
+
+    inicio = time.perf_counter()
+    contas = popular(app, args.usuarios, args.tarefas)
+    print(f"📦 {args.usuarios} usuários × {args.tarefas} tarefas em {time.perf_counter() - inicio:.1f} s "
+          f"({app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]})")
+
+    resultados = {}
+    rodadas = [rodar_cliente_teste(app, contas, args.repeticoes) for _ in range(max(args.rodadas, 1))]
+    resultados['cliente_teste'] = combinar_rodadas([resumo for resumo, _ in rodadas])
+    imprimir(f'Cliente de teste (sequencial, rodada mediana de {len(rodadas)})', resultados['cliente_teste'],
+             sum(decorrido for _, decorrido in rodadas))
+    if not args.sem_http:
+        resultados['http'], decorrido = rodar_carga_http(contas, args.servidor, args.workers, args.concorrencia, args.duracao)
+        imprimir(f'HTTP ({args.servidor}, {args.concorrencia} usuários simultâneos)', resultados['http'], decorrido)
+
+    if temporario:
+        print(f"\n(banco temporário em {temporario})")
+
+    parametros = {nome: getattr(args, nome) for modo in PARAMETROS.values() for nome in modo}
+    if args.salvar_linha_base:
+        with open(args.linha_base, 'w', encoding='utf-8') as arquivo:
+            json.dump(dict(resultados, parametros=parametros), arquivo, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"💾 Linha de base salva em {args.linha_base}")
+        return 0
+
+    if not os.path.exists(args.linha_base):
+        print("ℹ️  Sem linha de base para comparar (use --salvar-linha-base).")
+        return 0
+    with open(args.linha_base, encoding='utf-8') as arquivo:
+        linha_base = json.load(arquivo)
+    diferentes = parametros_diferentes(parametros, linha_base, resultados)
+    if diferentes:
+        print("\n⚠️  A linha de base foi gravada com outros parâmetros; comparação não feita:")
+        for diferenca in diferentes:
+            print(f"   - {diferenca}")
+        print("   Rode com os mesmos parâmetros ou grave outra linha de base (--salvar-linha-base).")
+        return 2
+    regressoes = comparar(resultados, linha_base, args.tolerancia, args.piso_ms)
+    if regressoes:
+        print("\n❌ Regressões em relação à linha de base:")
+        for regressao in regressoes:
+            print(f"   - {regressao}")
+        return 1
+    print("\n✅ Sem regressões em relação à linha de base.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
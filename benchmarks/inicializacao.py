@@ -0,0 +1,82 @@
+# Benchmark de inicialização: mede o tempo do "import app" até a primeira resposta
+#
+# Cada rodada é um processo Python novo (como um worker do gunicorn ao subir),
+# então o tempo inclui imports, create_app() e a primeira requisição.
+#
+# Uso:
+#     python benchmarks/inicializacao.py                 # 10 rodadas, GET /login
+#     python benchmarks/inicializacao.py -n 20 --rota /api/tarefas
+#
+# O banco usado é o de DATABASE_URL (ou um SQLite temporário, criado antes das rodadas).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Executado em cada processo filho
+RODADA = '''
+import json, sys, time
+inicio = time.perf_counter()
+from app import app
+importado = time.perf_counter()
+resposta = app.test_client().get(sys.argv[1])
+fim = time.perf_counter()
+print(json.dumps({
+    'importacao': importado - inicio,
+    'primeira_resposta': fim - importado,
+    'total': fim - inicio,
+    'status': resposta.status_code
+}))
+'''
+
+PREPARAR_BANCO = '''
+from app import app, db, migrar_banco
+with app.app_context():
+    db.create_all()
+    migrar_banco()
+'''
+
+def executar(codigo, ambiente, *argumentos):
+    saida = subprocess.run(
+        [sys.executable, '-c', codigo, *argumentos],
+        cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True
+    )
+    return saida.stdout.strip().splitlines()[-1] if saida.stdout.strip() else ''
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo do import até a primeira resposta.')
+    parser.add_argument('-n', '--rodadas', type=int, default=10)
+    parser.add_argument('--rota', default='/login')
+    args = parser.parse_args()
+
+    ambiente = dict(os.environ, FLASK_DEBUG='False')
+    temporario = None
+    if not ambiente.get('DATABASE_URL'):
+        temporario = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        temporario.close()
+        ambiente['DATABASE_URL'] = f'sqlite:///{temporario.name}'
+
+    try:
+        executar(PREPARAR_BANCO, ambiente)
+        # Primeira rodada só aquece o cache de bytecode (.pyc)
+        executar(RODADA, ambiente, args.rota)
+
+        resultados = [json.loads(executar(RODADA, ambiente, args.rota)) for _ in range(args.rodadas)]
+    finally:
+        if temporario:
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(temporario.name + sufixo):
+                    os.remove(temporario.name + sufixo)
+
+    print(f"📊 {args.rodadas} rodadas, GET {args.rota} (status {resultados[-1]['status']})")
+    for chave, titulo in (('importacao', 'import app'), ('primeira_resposta', 'primeira resposta'), ('total', 'total')):
+        valores = [r[chave] * 1000 for r in resultados]
+        print(f"   {titulo:<18} mín {min(valores):7.1f} ms   mediana {statistics.median(valores):7.1f} ms   máx {max(valores):7.1f} ms")
+
+if __name__ == '__main__':
+    main()
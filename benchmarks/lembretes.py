@@ -0,0 +1,104 @@
+# Benchmark do agendador de tarefas repetidas e lembretes: tempo de uma rodada por quantidade de tarefas
+#
+# Popula um banco SQLite temporário (ou o de DATABASE_URL) com cada quantidade de tarefas
+# espalhadas entre usuários, das quais ~2% são repetidas e ~2% têm lembrete, e uma pequena
+# parte de cada uma vencida. Mede uma rodada do agendador (lembretes.executar(): só lê as
+# filas pelos índices parciais) e, para comparação, a varredura ingênua que carrega todas
+# as tarefas e calcula a próxima ocorrência de cada uma em Python.
+# O tempo da rodada deve acompanhar o que venceu, não o total de tarefas.
+#
+# Uso:
+#     python benchmarks/lembretes.py                      # 10 mil e 100 mil tarefas
+#     python benchmarks/lembretes.py -n 1000 200000 -v 50
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from busca import gerar_tarefas
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de uma rodada do agendador por quantidade de tarefas.')
+    parser.add_argument('-n', '--tarefas', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('-u', '--usuarios', type=int, default=100)
+    parser.add_argument('-v', '--vencidas', type=int, default=20, help='repetidas e lembretes vencidos por rodada')
+    args = parser.parse_args()
+
+    temporario = None
+    if not os.getenv('DATABASE_URL'):
+        temporario = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(temporario, 'lembretes.db')}"
+    os.environ['FLASK_DEBUG'] = 'False'
+    os.environ.setdefault('MANUTENCAO_INTERVALO', '0')
+    os.environ.setdefault('LEMBRETES_INTERVALO', '0')
+    os.environ.setdefault('LEMBRETES_POR_MINUTO', '100000')
+    # Emails só vão para a fila (o despachante não roda aqui)
+    os.environ.setdefault('MAIL_USERNAME', 'benchmark@exemplo.com')
+    os.environ.setdefault('MAIL_PASSWORD', 'benchmark')
+    os.environ.setdefault('EMAIL_FILA_THREAD', 'False')
+
+    from app import app, db, migrar_banco, roteador_shards, lembretes, proxima_data, Usuario, Tarefa
+
+    sorteio = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        migrar_banco()
+        roteador_shards.entrar(roteador_shards.PRINCIPAL)
+        usuarios = []
+        for indice in range(args.usuarios):
+            usuario = Usuario(nome=f'Benchmark {indice}', email=f'benchmark{indice}-{time.time_ns()}@exemplo.com')
+            usuario.senha_hash = '-'
+            db.session.add(usuario)
+            usuarios.append(usuario)
+        db.session.commit()
+        ids_usuarios = [usuario.id for usuario in usuarios]
+
+    print(f"{'tarefas':>9}{'vencidas':>10}{'rodada ms':>11}{'varredura ms':>14}")
+    existentes = 0
+    for quantidade in sorted(args.tarefas):
+        with app.app_context():
+            roteador_shards.entrar(roteador_shards.PRINCIPAL)
+            hoje = lembretes.hoje()
+            futuro = datetime.utcnow() + timedelta(days=30)
+            tarefas = []
+            for tarefa in gerar_tarefas(0, quantidade - existentes, sorteio):
+                tarefa.update(usuario_id=sorteio.choice(ids_usuarios), versao=0)
+                sorte = sorteio.random()
+                if sorte < 0.02:
+                    tarefa.update(recorrencia='diaria', prazo=hoje + timedelta(days=5), proxima_ocorrencia=hoje + timedelta(days=6))
+                elif sorte < 0.04:
+                    tarefa.update(prazo=hoje + timedelta(days=30), lembrete='09:00', lembrete_em=futuro)
+                tarefas.append(tarefa)
+            for posicao in range(0, len(tarefas), 5000):
+                db.session.execute(db.insert(Tarefa), tarefas[posicao:posicao + 5000])
+            # Só algumas vencem nesta rodada
+            for coluna, valor in ((Tarefa.proxima_ocorrencia, hoje - timedelta(days=1)),
+                                  (Tarefa.lembrete_em, datetime.utcnow() - timedelta(minutes=1))):
+                vencidas = db.session.query(Tarefa.id).filter(coluna.isnot(None)).order_by(db.func.random()) \
+                    .limit(args.vencidas).scalar_subquery()
+                Tarefa.query.filter(Tarefa.id.in_(vencidas)).update({coluna: valor}, synchronize_session=False)
+            db.session.commit()
+            existentes = quantidade
+
+            inicio = time.perf_counter()
+            resultado = lembretes.executar()
+            rodada = (time.perf_counter() - inicio) * 1000
+
+            inicio = time.perf_counter()
+            for tarefa in Tarefa.query.all():
+                if tarefa.recorrencia and tarefa.prazo:
+                    proxima_data(tarefa.recorrencia, tarefa.prazo)
+            varredura = (time.perf_counter() - inicio) * 1000
+            db.session.rollback()
+        print(f"{quantidade:>9}{resultado['ocorrencias'] + resultado['lembretes'] + resultado['descartados']:>10}{rodada:>11.1f}{varredura:>14.1f}")
+
+    if temporario:
+        print(f"(banco temporário em {temporario})")
+
+if __name__ == '__main__':
+    main()
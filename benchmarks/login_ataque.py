@@ -0,0 +1,110 @@
+# Benchmark do login sob ataque de força bruta / credential stuffing
+#
+# Sobe o gunicorn e mede a latência de logins legítimos (senha certa, cada um de
+# um IP diferente via X-Forwarded-For) em três cenários:
+#   1. sem ataque;
+#   2. com ataque e sem limites (LOGIN_LIMITE_* = 0, fila de senhas sem limite prático);
+#   3. com ataque e a configuração padrão (limite por IP/conta e pool de senhas limitado).
+# O ataque são várias threads tentando senhas erradas em poucas contas (--alvos),
+# cada tentativa de um IP diferente (botnet: o limite por IP não chega a valer), com
+# prioridade mínima no sistema, para não disputar a CPU com o servidor, o que
+# numa máquina de poucos núcleos dominaria a medição.
+#
+# Uso:
+#     python benchmarks/login_ataque.py
+#     python benchmarks/login_ataque.py --atacantes 32 --duracao 15 --workers 2
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+
+from fluxos import SENHA, abrir, novo_navegador, percentil, popular, porta_livre, preparar_ambiente, subir_servidor
+
+CENARIOS = (
+    ('sem ataque', {}, False),
+    ('ataque, sem limites', {'LOGIN_LIMITE_IP': '0', 'LOGIN_LIMITE_CONTA': '0', 'LOGIN_SUSPEITA_CONTA': '0',
+                             'SENHA_FILA_MAX': '10000'}, True),
+    ('ataque, configuração padrão', {}, True)
+)
+
+def rodar_cenario(contas, args, ambiente, com_ataque):
+    os.environ.update({'PROXY_CONFIAVEL': '1', 'LOGIN_LIMITE_IP': '20', 'LOGIN_LIMITE_CONTA': '5', 'LOGIN_SUSPEITA_CONTA': '10',
+                       'SENHA_FILA_MAX': '8'})
+    os.environ.update(ambiente)
+    porta = porta_livre()
+    processo = subir_servidor('gunicorn', porta, args.workers)
+    base = f'http://127.0.0.1:{porta}'
+    parar = threading.Event()
+    respostas_ataque = collections.Counter()
+    trava = threading.Lock()
+
+    def atacante(indice):
+        # Num ataque real a CPU do atacante não é a do servidor (ver o topo do arquivo)
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        local = collections.Counter()
+        tentativa = 0
+        while not parar.is_set():
+            email = contas[(indice + tentativa) % args.alvos][0]
+            tentativa += 1
+            status, _ = abrir(novo_navegador(), base, 'POST', '/login', {'email': email, 'senha': f'chute{tentativa}'},
+                              {'X-Forwarded-For': f'172.{16 + indice % 16}.{tentativa // 256 % 256}.{tentativa % 256}'})
+            local[status] += 1
+        with trava:
+            respostas_ataque.update(local)
+
+    threads = [threading.Thread(target=atacante, args=(i,)) for i in range(args.atacantes if com_ataque else 0)]
+    try:
+        for thread in threads:
+            thread.start()
+        # O ataque começa antes da medição (tempo de esgotar os limites, como num ataque real)
+        time.sleep(args.aquecimento if com_ataque else 0)
+
+        tempos = []
+        respostas_legitimas = collections.Counter()
+        fim = time.perf_counter() + args.duracao
+        indice = 0
+        while time.perf_counter() < fim:
+            email = contas[args.alvos + indice % (len(contas) - args.alvos)][0]
+            comeco = time.perf_counter()
+            status, _ = abrir(novo_navegador(), base, 'POST', '/login', {'email': email, 'senha': SENHA},
+                              {'X-Forwarded-For': f'10.{indice // 65536 % 256}.{indice // 256 % 256}.{indice % 256}'})
+            tempos.append((time.perf_counter() - comeco) * 1000)
+            respostas_legitimas[status] += 1
+            indice += 1
+    finally:
+        parar.set()
+        for thread in threads:
+            thread.join()
+        processo.terminate()
+        processo.wait(10)
+    return tempos, respostas_legitimas, respostas_ataque
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência do login legítimo durante um ataque.')
+    parser.add_argument('-u', '--usuarios', type=int, default=50)
+    parser.add_argument('-a', '--atacantes', type=int, default=16, help='threads de ataque')
+    parser.add_argument('-d', '--duracao', type=float, default=10, help='segundos medidos por cenário')
+    parser.add_argument('--alvos', type=int, default=1, help='contas atacadas (os logins medidos usam as outras)')
+    parser.add_argument('--aquecimento', type=float, default=30, help='segundos de ataque antes de medir')
+    parser.add_argument('--workers', type=int, default=2, help='workers do gunicorn')
+    args = parser.parse_args()
+    if not 0 < args.alvos < args.usuarios:
+        parser.error('--alvos precisa ficar entre 1 e o número de usuários - 1')
+
+    temporario = preparar_ambiente()
+    from app import app
+    contas = popular(app, args.usuarios, 0)
+
+    print(f"{'cenário':<30}{'logins':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  respostas legítimas / do ataque")
+    for nome, ambiente, com_ataque in CENARIOS:
+        tempos, legitimas, ataque = rodar_cenario(contas, args, ambiente, com_ataque)
+        print(f"{nome:<30}{len(tempos):>8}{percentil(tempos, 0.5):>9.1f}{percentil(tempos, 0.95):>9.1f}"
+              f"{percentil(tempos, 0.99):>9.1f}  {dict(legitimas)} / {dict(ataque) or '-'}")
+
+    if temporario:
+        print(f"\n(banco temporário em {temporario})")
+
+if __name__ == '__main__':
+    sys.exit(main())
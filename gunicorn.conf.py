@@ -0,0 +1,19 @@
+# Configuração do gunicorn (lida automaticamente por "gunicorn app:app")
+#
+# GUNICORN_WORKER_CLASS escolhe como cada worker atende as requisições:
+#   - sync (padrão): uma requisição por vez; enquanto espera o banco ou um cliente
+#     lento, o processo inteiro fica parado;
+#   - gevent: até GUNICORN_WORKER_CONNECTIONS conexões por worker, trocando de
+#     requisição sempre que uma espera pela rede (PostgreSQL, Redis, SMTP, cliente).
+# O número de workers continua vindo de WEB_CONCURRENCY (ou de -w).
+#
+# Com gevent, não use --preload: o app precisa ser importado depois do monkey
+# patching, que o worker faz ao subir.
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# No gevent, keep-alive também é o prazo para o pedido chegar inteiro: sob
+# sobrecarga, conexões que esperam mais que isso são fechadas sem resposta
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '2'))
@@ -0,0 +1,360 @@
+// Navegação do calendário: busca apenas a agenda do período, sem recarregar a lista
+(function () {
+    const nav = document.querySelector('.calendar-nav');
+    const semana = document.getElementById('calendar-week');
+    const titulo = document.getElementById('calendar-title');
+    let modo = 'semana';
+    let referencia = null;
+
+    function criarDia(dia) {
+        const cartao = document.createElement('div');
+        cartao.className = 'calendar-day' + (dia.e_hoje ? ' today' : '');
+        [['day-name', dia.dia_semana.slice(0, 3)], ['day-number', dia.dia_numero], ['day-date', dia.dia]]
+            .forEach(function (par) {
+                const el = document.createElement('div');
+                el.className = par[0];
+                el.textContent = par[1];
+                cartao.appendChild(el);
+            });
+        if (dia.tarefas.length) {
+            const lista = document.createElement('ul');
+            lista.className = 'day-tasks';
+            dia.tarefas.forEach(function (tarefa) {
+                const item = document.createElement('li');
+                item.textContent = tarefa.texto;
+                if (tarefa.feito) item.className = 'done';
+                lista.appendChild(item);
+            });
+            cartao.appendChild(lista);
+        }
+        return cartao;
+    }
+
+    function carregar(data) {
+        const params = new URLSearchParams({ modo: modo });
+        if (data) params.set('data', data);
+        fetch(nav.dataset.url + '?' + params.toString(), { credentials: 'same-origin' })
+            .then(function (resposta) { return resposta.json(); })
+            .then(function (agenda) {
+                referencia = agenda.inicio;
+                nav.querySelector('[data-acao="anterior"]').dataset.data = agenda.anterior;
+                nav.querySelector('[data-acao="proximo"]').dataset.data = agenda.proximo;
+                titulo.textContent = agenda.titulo;
+                // No modo mês mostra apenas os dias com tarefas (e o dia de hoje)
+                const dias = agenda.modo === 'mes'
+                    ? agenda.dias.filter(function (dia) { return dia.tarefas.length || dia.e_hoje; })
+                    : agenda.dias;
+                semana.replaceChildren.apply(semana, dias.map(criarDia));
+            });
+    }
+
+    document.addEventListener('tarefas-alteradas', function () {
+        carregar(referencia);
+    });
+
+    nav.addEventListener('click', function (evento) {
+        const botao = evento.target.closest('button');
+        if (!botao) return;
+        if (botao.dataset.acao === 'modo') {
+            modo = botao.dataset.modo;
+            nav.querySelectorAll('[data-acao="modo"]').forEach(function (b) {
+                b.classList.toggle('active', b === botao);
+            });
+            carregar(referencia);
+        } else {
+            carregar(botao.dataset.data);
+        }
+    });
+})();
+
+// Ações da lista via API JSON: atualiza só a tarefa alterada e os contadores
+(function () {
+    const secao = document.getElementById('task-list');
+    const formulario = document.getElementById('task-form');
+    const api = secao.dataset.api;
+
+    function requisitar(metodo, url, dados) {
+        const opcoes = { method: metodo, credentials: 'same-origin', headers: { 'Accept': 'application/json' } };
+        if (dados !== undefined) {
+            opcoes.headers['Content-Type'] = 'application/json';
+            opcoes.body = JSON.stringify(dados);
+        }
+        return fetch(url, opcoes).then(function (resposta) {
+            return resposta.json().then(function (corpo) {
+                if (!resposta.ok) throw new Error(corpo.erro || 'Erro ao processar a tarefa.');
+                return corpo;
+            });
+        });
+    }
+
+    function atualizarEstatisticas(estatisticas) {
+        document.getElementById('stat-completas').textContent = estatisticas.completas + '/' + estatisticas.total;
+        document.getElementById('stat-porcentagem').textContent = estatisticas.porcentagem + '%';
+        const barra = document.getElementById('progress-fill');
+        barra.style.width = estatisticas.porcentagem + '%';
+        barra.textContent = estatisticas.porcentagem + '%';
+        document.dispatchEvent(new CustomEvent('tarefas-alteradas'));
+    }
+
+    function criarDetalhe(rotulo, conteudo) {
+        const item = document.createElement('div');
+        item.className = 'task-detail-item';
+        const etiqueta = document.createElement('span');
+        etiqueta.className = 'task-detail-label';
+        etiqueta.textContent = rotulo;
+        item.append(etiqueta, ' ', conteudo);
+        return item;
+    }
+
+    // Mesmo texto de descrever_recorrencia() no servidor
+    const DIAS_SEMANA = ['segunda', 'terça', 'quarta', 'quinta', 'sexta', 'sábado', 'domingo'];
+
+    function descreverRecorrencia(regra) {
+        const partes = regra.split(':');
+        if (partes[0] === 'diaria') return 'todo dia';
+        if (partes[0] === 'mensal') return 'todo dia ' + partes[1] + ' do mês';
+        const nomes = partes[1].split(',').map(function (dia) { return DIAS_SEMANA[Number(dia)]; });
+        const ultimo = nomes.pop();
+        return 'toda ' + (nomes.length ? nomes.join(', ') + ' e ' + ultimo : ultimo);
+    }
+
+    // Regra no formato da API a partir dos campos "repetir" e "dias_semana" (sem dia, o servidor usa o do prazo)
+    function recorrenciaDoFormulario(campos) {
+        const repetir = campos.get('repetir');
+        const prazo = campos.get('data') ? new Date(campos.get('data') + 'T00:00') : new Date();
+        if (repetir === 'semanal') {
+            const dias = campos.getAll('dias_semana');
+            return 'semanal:' + (dias.length ? dias.join(',') : String((prazo.getDay() + 6) % 7));
+        }
+        if (repetir === 'mensal') return 'mensal:' + prazo.getDate();
+        return repetir || null;
+    }
+
+    function criarTarefa(tarefa) {
+        const item = document.createElement('li');
+        item.className = 'task-item' + (tarefa.feito ? ' completed' : '');
+        item.dataset.id = tarefa.id;
+
+        const cabecalho = document.createElement('div');
+        cabecalho.className = 'task-header';
+        const titulo = document.createElement('div');
+        titulo.className = 'task-title';
+        const selecao = document.createElement('input');
+        selecao.type = 'checkbox';
+        selecao.className = 'task-select';
+        selecao.value = tarefa.id;
+        selecao.setAttribute('aria-label', 'Selecionar tarefa');
+        titulo.appendChild(selecao);
+        if (tarefa.feito) {
+            const riscado = document.createElement('s');
+            riscado.textContent = tarefa.texto;
+            titulo.appendChild(riscado);
+        } else {
+            titulo.append(tarefa.texto);
+        }
+
+        const acoes = document.createElement('div');
+        acoes.className = 'task-actions';
+        const alternar = document.createElement('a');
+        alternar.href = '#';
+        alternar.className = 'task-action-btn' + (tarefa.feito ? ' revert' : '');
+        alternar.dataset.acao = tarefa.feito ? 'reverter' : 'concluir';
+        alternar.textContent = tarefa.feito ? '↺ Reverter' : '✓ Concluir';
+        const deletar = document.createElement('a');
+        deletar.href = '#';
+        deletar.className = 'task-action-btn delete';
+        deletar.dataset.acao = 'deletar';
+        deletar.textContent = '🗑️ Deletar';
+        acoes.append(alternar, deletar);
+        cabecalho.append(titulo, acoes);
+        item.appendChild(cabecalho);
+
+        if (tarefa.descricao || tarefa.data || tarefa.link || tarefa.recorrencia || tarefa.lembrete) {
+            const detalhes = document.createElement('div');
+            detalhes.className = 'task-details';
+            if (tarefa.descricao) {
+                const descricao = document.createElement('span');
+                descricao.className = 'task-description';
+                descricao.textContent = tarefa.descricao;
+                detalhes.appendChild(criarDetalhe('📄 Descrição:', descricao));
+            }
+            if (tarefa.data) {
+                const data = document.createElement('span');
+                data.textContent = tarefa.data;
+                detalhes.appendChild(criarDetalhe('📅 Data:', data));
+            }
+            if (tarefa.recorrencia) {
+                const recorrencia = document.createElement('span');
+                recorrencia.textContent = descreverRecorrencia(tarefa.recorrencia);
+                detalhes.appendChild(criarDetalhe('🔁 Repete:', recorrencia));
+            }
+            if (tarefa.lembrete) {
+                const lembrete = document.createElement('span');
+                lembrete.textContent = tarefa.lembrete;
+                detalhes.appendChild(criarDetalhe('🔔 Lembrete:', lembrete));
+            }
+            if (tarefa.link) {
+                const link = document.createElement('a');
+                link.href = tarefa.link;
+                link.target = '_blank';
+                link.rel = 'noopener noreferrer';
+                link.className = 'task-link';
+                link.textContent = tarefa.link;
+                detalhes.appendChild(criarDetalhe('🔗 Link:', link));
+            }
+            item.appendChild(detalhes);
+        }
+        return item;
+    }
+
+    secao.addEventListener('click', function (evento) {
+        const botao = evento.target.closest('[data-acao]');
+        if (!botao) return;
+        const item = botao.closest('.task-item');
+        const url = api + '/' + item.dataset.id;
+        evento.preventDefault();
+
+        if (botao.dataset.acao === 'deletar') {
+            if (!confirm('Tem certeza que deseja deletar esta tarefa? Esta ação não pode ser desfeita.')) return;
+            requisitar('DELETE', url).then(function (corpo) {
+                item.remove();
+                atualizarEstatisticas(corpo.estatisticas);
+            }).catch(function (erro) { alert(erro.message); });
+            return;
+        }
+
+        requisitar('PATCH', url, { feito: botao.dataset.acao === 'concluir' }).then(function (corpo) {
+            item.replaceWith(criarTarefa(corpo.tarefa));
+            atualizarEstatisticas(corpo.estatisticas);
+        }).catch(function (erro) { alert(erro.message); });
+    });
+
+    // Operações em lote: uma requisição (e uma instrução SQL) para várias tarefas
+    const barra = secao.querySelector('.task-toolbar');
+    barra.addEventListener('click', function (evento) {
+        const botao = evento.target.closest('button[data-lote], button[data-limpar]');
+        if (!botao) return;
+
+        if (botao.dataset.limpar) {
+            if (!confirm('Deletar todas as tarefas concluídas? Esta ação não pode ser desfeita.')) return;
+            requisitar('POST', botao.dataset.limpar, {}).then(function (corpo) {
+                secao.querySelectorAll('.task-item.completed').forEach(function (item) { item.remove(); });
+                atualizarEstatisticas(corpo.estatisticas);
+            }).catch(function (erro) { alert(erro.message); });
+            return;
+        }
+
+        const ids = Array.from(secao.querySelectorAll('.task-select:checked')).map(function (caixa) {
+            return Number(caixa.value);
+        });
+        if (!ids.length) {
+            alert('Selecione ao menos uma tarefa.');
+            return;
+        }
+        const acao = botao.dataset.lote;
+        if (acao === 'deletar' && !confirm('Deletar ' + ids.length + ' tarefa(s)? Esta ação não pode ser desfeita.')) return;
+
+        requisitar('POST', barra.dataset.api, { acao: acao, ids: ids }).then(function (corpo) {
+            if (acao === 'deletar') {
+                ids.forEach(function (id) {
+                    const item = secao.querySelector('.task-item[data-id="' + id + '"]');
+                    if (item) item.remove();
+                });
+            } else {
+                corpo.tarefas.forEach(function (tarefa) {
+                    const item = secao.querySelector('.task-item[data-id="' + tarefa.id + '"]');
+                    if (item) item.replaceWith(criarTarefa(tarefa));
+                });
+            }
+            atualizarEstatisticas(corpo.estatisticas);
+        }).catch(function (erro) { alert(erro.message); });
+    });
+
+    // Busca textual: resultados ranqueados, carregados em páginas pelo cursor "proximo"
+    const busca = document.getElementById('search-form');
+    const resultados = document.getElementById('search-results');
+    const listaResultados = resultados.querySelector('ul');
+    const carregarMais = resultados.querySelector('[data-busca="mais"]');
+    let proximaBusca = null;
+
+    function buscar(texto, depois) {
+        const url = new URL(busca.dataset.api, window.location.origin);
+        url.searchParams.set('q', texto);
+        if (depois) url.searchParams.set('depois', depois);
+        return requisitar('GET', url.toString()).then(function (corpo) {
+            if (!depois) listaResultados.replaceChildren();
+            corpo.tarefas.forEach(function (tarefa) { listaResultados.appendChild(criarTarefa(tarefa)); });
+            proximaBusca = corpo.proximo;
+            carregarMais.hidden = !proximaBusca;
+            const total = listaResultados.children.length;
+            document.getElementById('search-summary-text').textContent = total
+                ? total + (proximaBusca ? '+' : '') + ' resultado(s) para "' + texto + '"'
+                : 'Nenhuma tarefa encontrada para "' + texto + '"';
+            resultados.hidden = false;
+        }).catch(function (erro) { alert(erro.message); });
+    }
+
+    busca.addEventListener('submit', function (evento) {
+        evento.preventDefault();
+        buscar(busca.elements.q.value.trim());
+    });
+
+    resultados.addEventListener('click', function (evento) {
+        const botao = evento.target.closest('button[data-busca]');
+        if (!botao) return;
+        if (botao.dataset.busca === 'mais') {
+            buscar(busca.elements.q.value.trim(), proximaBusca);
+        } else {
+            busca.reset();
+            listaResultados.replaceChildren();
+            resultados.hidden = true;
+        }
+    });
+
+    const importacao = document.getElementById('import-form');
+    importacao.addEventListener('submit', function (evento) {
+        evento.preventDefault();
+        fetch(importacao.dataset.api, {
+            method: 'POST',
+            credentials: 'same-origin',
+            // Sem ele a API recusa o multipart (protege de formulários de outros sites)
+            headers: { 'X-Requested-With': 'fetch' },
+            body: new FormData(importacao)
+        })
+            .then(function (resposta) {
+                return resposta.json().then(function (corpo) {
+                    if (!resposta.ok) throw new Error(corpo.erro || 'Erro ao importar tarefas.');
+                    return corpo;
+                });
+            })
+            .then(function (corpo) {
+                alert(corpo.importadas + ' tarefa(s) importada(s)!');
+                window.location.reload();
+            })
+            .catch(function (erro) { alert(erro.message); });
+    });
+
+    // Dias da semana só aparecem na repetição semanal
+    const repetir = document.getElementById('repetir');
+    repetir.addEventListener('change', function () {
+        document.getElementById('dias-semana').hidden = repetir.value !== 'semanal';
+    });
+
+    formulario.addEventListener('submit', function (evento) {
+        const lista = secao.querySelector(':scope > ul');
+        if (!lista) return; // Lista vazia: envia o formulário normalmente
+        evento.preventDefault();
+        const campos = new FormData(formulario);
+        const dados = Object.fromEntries(campos);
+        requisitar('POST', formulario.dataset.api, {
+            texto: dados.texto_tarefa, descricao: dados.descricao, data: dados.data, link: dados.link,
+            recorrencia: recorrenciaDoFormulario(campos), lembrete: dados.lembrete || null
+        }).then(function (corpo) {
+            // Nova tarefa pendente entra antes da primeira concluída
+            lista.insertBefore(criarTarefa(corpo.tarefa), lista.querySelector('.task-item.completed'));
+            formulario.reset();
+            document.getElementById('dias-semana').hidden = true;
+            atualizarEstatisticas(corpo.estatisticas);
+        }).catch(function (erro) { alert(erro.message); });
+    });
+})();
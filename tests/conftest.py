@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Antes de importar app.py: a aplicação do módulo usa um banco temporário (nunca o
+# tarefas.db do repositório) e as tarefas de fundo ficam desligadas
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'modulo.db')}"
+os.environ.setdefault('MANUTENCAO_INTERVALO', '0')
+os.environ.setdefault('LEMBRETES_INTERVALO', '0')
+os.environ.setdefault('FLASK_DEBUG', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as modulo  # noqa: E402
+from app import db, migrar_banco  # noqa: E402
+
+
+def criar_aplicacao(pasta, **configuracao):
+    """Aplicação nova com o banco (e os shards, se houver) em arquivos da pasta."""
+    aplicacao = modulo.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{pasta / 'tarefas.db'}",
+        'TESTING': True,
+        **configuracao,
+    })
+    with aplicacao.app_context():
+        # Só o banco principal: o Flask-SQLAlchemy guarda um metadata por bind já visto (de
+        # outra aplicação dos testes) e as tabelas dos shards são criadas pelo migrar_banco()
+        db.create_all(bind_key=None)
+        migrar_banco()
+    return aplicacao
+
+
+@pytest.fixture
+def aplicacao(tmp_path):
+    aplicacao = criar_aplicacao(tmp_path)
+    yield aplicacao
+    with aplicacao.app_context():
+        for motor in db.engines.values():
+            motor.dispose()
+
+
+@pytest.fixture
+def cliente(aplicacao):
+    return aplicacao.test_client()
+
+
+def cadastrar(cliente, email, senha='senha123', nome='Teste'):
+    """Cadastra e faz login pelo formulário; o cliente fica autenticado."""
+    cliente.post('/cadastro', data={'nome': nome, 'email': email, 'senha': senha, 'confirmar_senha': senha})
+    resposta = cliente.post('/login', data={'email': email, 'senha': senha})
+    assert resposta.status_code == 302, resposta.get_data(as_text=True)
+    return resposta
@@ -0,0 +1,21 @@
+"""Cache de usuários: só os campos que as páginas usam, e TTL curto no cache em memória."""
+from app import cache_usuarios, load_user
+from conftest import cadastrar
+
+
+def test_cache_nao_guarda_segredos(aplicacao, cliente):
+    cadastrar(cliente, 'cache@exemplo.com')
+    cliente.get('/perfil')
+    with aplicacao.test_request_context():
+        dados = cache_usuarios.obter(1)
+        assert set(dados) == {'id', 'nome', 'email', 'nome_lista', 'data_criacao', 'shard'}
+
+        # As colunas fora do cache continuam disponíveis (lidas do banco ao acessar)
+        usuario = load_user('1')
+        assert usuario.nome == 'Teste'
+        assert usuario.senha_hash and usuario.check_senha('senha123')
+
+
+def test_cache_em_memoria_usa_ttl_menor(aplicacao):
+    assert aplicacao.extensions['cache_usuarios'].ttl == min(aplicacao.config['USUARIO_CACHE_TTL'],
+                                                             aplicacao.config['USUARIO_CACHE_TTL_MEMORIA'])
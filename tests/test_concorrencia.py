@@ -0,0 +1,54 @@
+"""Vários escritores ao mesmo tempo no SQLite em WAL: nenhum "database is locked" e nada se perde."""
+import logging
+import threading
+
+from sqlalchemy import text
+
+from app import Tarefa, Usuario, db
+from conftest import cadastrar
+
+ESCRITORES = 8
+TAREFAS_POR_ESCRITOR = 15
+
+
+def test_escritores_concorrentes(aplicacao, caplog):
+    with aplicacao.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+    # Todos escrevem nas tarefas do mesmo usuário (disputam também a versão dele)
+    clientes = [aplicacao.test_client() for _ in range(ESCRITORES)]
+    cadastrar(clientes[0], 'concorrencia@exemplo.com')
+    for cliente in clientes[1:]:
+        assert cliente.post('/login', data={'email': 'concorrencia@exemplo.com', 'senha': 'senha123'}).status_code == 302
+
+    largada = threading.Barrier(ESCRITORES)
+    falhas = []
+
+    def escrever(numero, cliente):
+        largada.wait()
+        for indice in range(TAREFAS_POR_ESCRITOR):
+            criada = cliente.post('/api/tarefas', json={'texto': f'Escritor {numero} tarefa {indice}'})
+            if criada.status_code != 201:
+                falhas.append(('criar', criada.status_code, criada.get_data(as_text=True)))
+                continue
+            id_tarefa = criada.get_json()['tarefa']['id']
+            alterada = cliente.patch(f'/api/tarefas/{id_tarefa}', json={'feito': indice % 2 == 0})
+            if alterada.status_code != 200:
+                falhas.append(('alterar', alterada.status_code, alterada.get_data(as_text=True)))
+
+    threads = [threading.Thread(target=escrever, args=(numero, cliente)) for numero, cliente in enumerate(clientes)]
+    with caplog.at_level(logging.ERROR):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert falhas == []
+    assert 'database is locked' not in caplog.text
+
+    total = ESCRITORES * TAREFAS_POR_ESCRITOR
+    with aplicacao.app_context():
+        assert db.session.query(Tarefa).count() == total
+        assert db.session.query(Tarefa).filter(Tarefa.feito == True).count() == ESCRITORES * ((TAREFAS_POR_ESCRITOR + 1) // 2)
+        # Cada criação e cada alteração avançou a versão do usuário uma vez
+        assert db.session.query(Usuario.versao_tarefas).scalar() == 2 * total
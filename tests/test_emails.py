@@ -0,0 +1,100 @@
+"""Fila de emails: gravação pelo fluxo de recuperação, envio e reenvio com espera exponencial."""
+from datetime import datetime, timedelta
+
+import flask_mail
+import pytest
+
+from app import EmailPendente, db, despachante_email, mail
+from conftest import cadastrar, criar_aplicacao
+
+
+@pytest.fixture
+def aplicacao(tmp_path):
+    # MAIL_SUPPRESS_SEND: nada sai pela rede, mas o envio dispara o sinal do record_messages
+    aplicacao = criar_aplicacao(tmp_path, MAIL_USERNAME='app@exemplo.com', MAIL_PASSWORD='senha',
+                                MAIL_SUPPRESS_SEND=True, EMAIL_FILA_THREAD=False, EMAIL_MAX_TENTATIVAS=3)
+    yield aplicacao
+    with aplicacao.app_context():
+        for motor in db.engines.values():
+            motor.dispose()
+
+
+@pytest.fixture
+def enfileirado(aplicacao):
+    cliente = aplicacao.test_client()
+    cadastrar(cliente, 'esqueci@exemplo.com')
+    cliente.get('/logout')
+    assert cliente.post('/recuperar_senha', data={'email': 'esqueci@exemplo.com'}).status_code in (200, 302)
+    with aplicacao.app_context():
+        return EmailPendente.query.one().id
+
+
+def vencer(aplicacao, id_email):
+    """Antecipa a próxima tentativa, como se a espera já tivesse passado."""
+    with aplicacao.app_context():
+        db.session.get(EmailPendente, id_email).proxima_tentativa = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+
+def test_recuperacao_so_grava_na_fila(aplicacao, enfileirado):
+    with aplicacao.app_context():
+        email = db.session.get(EmailPendente, enfileirado)
+        assert email.destinatario == 'esqueci@exemplo.com'
+        assert email.status == 'pendente'
+        assert email.tentativas == 0
+
+
+def test_processar_fila_envia(aplicacao, enfileirado):
+    with aplicacao.app_context(), mail.record_messages() as enviados:
+        assert despachante_email.processar_fila() == 1
+        email = db.session.get(EmailPendente, enfileirado)
+        assert email.status == 'enviado'
+        assert email.enviado_em is not None
+        # Nada mais vencido: a segunda passada não reenvia
+        assert despachante_email.processar_fila() == 0
+    assert [mensagem.recipients for mensagem in enviados] == [['esqueci@exemplo.com']]
+    assert enviados[0].sender == 'app@exemplo.com'
+
+
+def test_falha_reagenda_com_espera_exponencial(aplicacao, enfileirado, monkeypatch):
+    def recusar(self, mensagem, *args, **kwargs):
+        raise flask_mail.BadHeaderError('recusado')
+    monkeypatch.setattr(flask_mail.Connection, 'send', recusar)
+
+    for tentativa, espera in ((1, 60), (2, 120)):
+        vencer(aplicacao, enfileirado)
+        with aplicacao.app_context():
+            antes = datetime.utcnow()
+            assert despachante_email.processar_fila() == 0
+            email = db.session.get(EmailPendente, enfileirado)
+            assert (email.status, email.tentativas, email.reservado_por) == ('pendente', tentativa, None)
+            assert 'recusado' in email.ultimo_erro
+            atraso = (email.proxima_tentativa - antes).total_seconds()
+            assert espera - 5 <= atraso <= espera + 5
+            # Ainda não venceu: não é reservado de novo
+            assert despachante_email.processar_fila() == 0
+            assert db.session.get(EmailPendente, enfileirado).tentativas == tentativa
+
+    # Última tentativa (EMAIL_MAX_TENTATIVAS = 3): desiste
+    vencer(aplicacao, enfileirado)
+    with aplicacao.app_context():
+        despachante_email.processar_fila()
+        assert db.session.get(EmailPendente, enfileirado).status == 'falhou'
+
+
+def test_falha_de_conexao_devolve_o_lote(aplicacao, enfileirado, monkeypatch):
+    def sem_servidor(self):
+        raise ConnectionRefusedError('sem servidor SMTP')
+    monkeypatch.setattr(flask_mail.Connection, '__enter__', sem_servidor)
+
+    with aplicacao.app_context():
+        assert despachante_email.processar_fila() == 0
+        email = db.session.get(EmailPendente, enfileirado)
+        assert (email.status, email.tentativas, email.reservado_por) == ('pendente', 1, None)
+
+    # O servidor volta: depois da espera o email sai
+    monkeypatch.undo()
+    vencer(aplicacao, enfileirado)
+    with aplicacao.app_context(), mail.record_messages() as enviados:
+        assert despachante_email.processar_fila() == 1
+    assert len(enviados) == 1
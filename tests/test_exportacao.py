@@ -0,0 +1,70 @@
+"""Exportação: nada do texto do usuário vira propriedade iCalendar nem fórmula de planilha."""
+import csv
+import io
+
+import pytest
+
+from conftest import cadastrar
+
+LINK_MALICIOSO = 'https://exemplo.com/a\r\nATTACH:https://evil.example/x\r\nX-INJETADA:1'
+
+
+@pytest.fixture
+def logado(cliente):
+    cadastrar(cliente, 'exportacao@exemplo.com')
+    for tarefa in (
+        {'texto': '=HYPERLINK("https://evil.example","clique")', 'descricao': '+1+1', 'link': LINK_MALICIOSO,
+         'data': '2026-10-20'},
+        {'texto': '@SOMA(A1:A9)', 'descricao': '-2', 'data': 'amanhã'},
+        {'texto': 'Tarefa comum', 'descricao': 'sem fórmula'},
+    ):
+        assert cliente.post('/api/tarefas', json=tarefa).status_code == 201
+    return cliente
+
+
+def desdobrar(ical):
+    """Junta as linhas dobradas (RFC 5545) para inspecionar as propriedades."""
+    return ical.replace('\r\n ', '').split('\r\n')
+
+
+def test_ical_escapa_url(logado):
+    ical = logado.get('/api/tarefas/exportar?formato=ics').get_data(as_text=True)
+    linhas = desdobrar(ical)
+    assert not any(linha.startswith(('ATTACH', 'X-INJETADA')) for linha in linhas)
+    urls = [linha for linha in linhas if linha.startswith('URL:')]
+    assert urls == ['URL:https://exemplo.com/a%0D%0AATTACH:https://evil.example/x%0D%0AX-INJETADA:1']
+    assert all(len(linha.encode()) <= 75 for linha in ical.split('\r\n'))
+
+
+def test_csv_neutraliza_formulas(logado):
+    conteudo = logado.get('/api/tarefas/exportar?formato=csv').get_data(as_text=True).lstrip('﻿')
+    linhas = {linha['texto']: linha for linha in csv.DictReader(io.StringIO(conteudo))}
+    assert set(linhas) == {'\'=HYPERLINK("https://evil.example","clique")', "'@SOMA(A1:A9)", 'Tarefa comum'}
+    assert linhas["'@SOMA(A1:A9)"]['descricao'] == "'-2"
+    assert linhas['Tarefa comum']['descricao'] == 'sem fórmula'
+    # Datas e números gerados pela exportação não mudam
+    assert linhas['\'=HYPERLINK("https://evil.example","clique")']['prazo'] == '2026-10-20'
+
+
+def test_csv_exportado_volta_igual_na_importacao(logado):
+    conteudo = logado.get('/api/tarefas/exportar?formato=csv').get_data(as_text=True).lstrip('﻿')
+    resposta = logado.post('/api/tarefas/importar', data=conteudo.encode(), content_type='text/csv',
+                           headers={'X-Requested-With': 'fetch'})
+    assert resposta.status_code == 201
+    textos = sorted(tarefa['texto'] for tarefa in logado.get('/api/tarefas?limite=10').get_json()['tarefas'])
+    originais = ['=HYPERLINK("https://evil.example","clique")', '@SOMA(A1:A9)', 'Tarefa comum']
+    assert textos == sorted(originais * 2)
+
+
+def test_importacao_sem_json_exige_cabecalho(logado):
+    antes = len(logado.get('/api/tarefas?limite=100').get_json()['tarefas'])
+    # Formulário de outro site: CSV ou multipart sem cabeçalho próprio (não passa pelo preflight do CORS)
+    assert logado.post('/api/tarefas/importar', data='texto\nInjetada\n', content_type='text/csv').status_code == 400
+    arquivo = {'arquivo': (io.BytesIO(b'texto\nInjetada\n'), 'tarefas.csv')}
+    assert logado.post('/api/tarefas/importar', data=arquivo, content_type='multipart/form-data').status_code == 400
+    assert len(logado.get('/api/tarefas?limite=100').get_json()['tarefas']) == antes
+
+    arquivo = {'arquivo': (io.BytesIO(b'texto\nPelo app\n'), 'tarefas.csv')}
+    assert logado.post('/api/tarefas/importar', data=arquivo, content_type='multipart/form-data',
+                       headers={'X-Requested-With': 'fetch'}).status_code == 201
+    assert logado.post('/api/tarefas/importar', json=[{'texto': 'Em JSON'}]).status_code == 201
@@ -0,0 +1,26 @@
+"""Validação dos filtros e da ordenação de /api/tarefas."""
+import pytest
+
+from conftest import cadastrar
+
+
+@pytest.fixture
+def logado(cliente):
+    cadastrar(cliente, 'filtros@exemplo.com')
+    for texto in ('B', 'A'):
+        assert cliente.post('/api/tarefas', json={'texto': texto}).status_code == 201
+    return cliente
+
+
+@pytest.mark.parametrize('ordem', ['--prazo', '---titulo', 'prazo-', 'inexistente', '-'])
+def test_ordem_invalida(logado, ordem):
+    resposta = logado.get(f'/api/tarefas?ordem={ordem}')
+    assert resposta.status_code == 400
+    assert 'Ordenação inválida' in resposta.get_json()['erro']
+
+
+@pytest.mark.parametrize('ordem, esperado', [('titulo', ['A', 'B']), ('-titulo', ['B', 'A'])])
+def test_ordem_com_um_prefixo(logado, ordem, esperado):
+    resposta = logado.get(f'/api/tarefas?ordem={ordem}')
+    assert resposta.status_code == 200
+    assert [tarefa['texto'] for tarefa in resposta.get_json()['tarefas']] == esperado
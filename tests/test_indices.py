@@ -0,0 +1,87 @@
+"""Planos das consultas do dashboard, da paginação por cursor, do login e da agenda: sempre por índice,
+nunca varrendo a tabela."""
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from conftest import cadastrar
+
+@contextmanager
+def capturar_consultas(aplicacao, tabela='tarefa'):
+    """Coleta (sql, parâmetros) de cada SELECT na tabela executado dentro do bloco."""
+    capturadas = []
+    consulta = re.compile(rf'\bFROM {tabela}\b')
+
+    def ouvir(conexao, cursor, sql, parametros, contexto, varias):
+        if sql.lstrip().upper().startswith('SELECT') and consulta.search(sql):
+            capturadas.append((sql, parametros))
+
+    with aplicacao.app_context():
+        motor = db.engine
+    event.listen(motor, 'before_cursor_execute', ouvir)
+    try:
+        yield capturadas
+    finally:
+        event.remove(motor, 'before_cursor_execute', ouvir)
+
+
+def plano(aplicacao, sql, parametros):
+    with aplicacao.app_context(), db.engine.connect() as conexao:
+        return [linha[3] for linha in conexao.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, parametros)]
+
+
+def conferir_planos(aplicacao, capturadas, indice=r'ix_tarefa_\w+', tabela='tarefa'):
+    assert capturadas
+    for sql, parametros in capturadas:
+        detalhes = plano(aplicacao, sql, parametros)
+        texto = '\n'.join(detalhes)
+        assert re.search(rf'USING (COVERING )?INDEX {indice}\b', texto), f'{sql}\n{texto}'
+        assert not any(detalhe.startswith(f'SCAN {tabela}') for detalhe in detalhes), f'{sql}\n{texto}'
+
+
+@pytest.fixture
+def cliente_com_tarefas(cliente):
+    cadastrar(cliente, 'indices@exemplo.com')
+    for numero in range(30):
+        resposta = cliente.post('/api/tarefas', json={'texto': f'Tarefa {numero}',
+                                                      'data': f'2026-10-{numero % 28 + 1:02d}'})
+        assert resposta.status_code == 201
+        assert resposta.get_json()['tarefa']['prazo']
+    return cliente
+
+
+def test_dashboard_usa_indices(aplicacao, cliente_com_tarefas):
+    with capturar_consultas(aplicacao) as capturadas:
+        assert cliente_com_tarefas.get('/dashboard').status_code == 200
+    conferir_planos(aplicacao, capturadas)
+
+
+@pytest.mark.parametrize('ordem', ['padrao', 'prazo', '-criacao', 'titulo'])
+def test_paginacao_por_cursor_usa_indices(aplicacao, cliente_com_tarefas, ordem):
+    with capturar_consultas(aplicacao) as capturadas:
+        primeira = cliente_com_tarefas.get(f'/api/tarefas?limite=5&ordem={ordem}').get_json()
+        assert primeira['proximo']
+        segunda = cliente_com_tarefas.get(f"/api/tarefas?limite=5&ordem={ordem}&depois={primeira['proximo']}")
+        assert segunda.status_code == 200
+    conferir_planos(aplicacao, capturadas)
+
+
+def test_login_busca_o_email_pelo_indice(aplicacao, cliente_com_tarefas):
+    cliente_com_tarefas.get('/logout')
+    with capturar_consultas(aplicacao, 'usuario') as capturadas:
+        resposta = cliente_com_tarefas.post('/login', data={'email': 'INDICES@exemplo.com', 'senha': 'senha123'})
+        assert resposta.status_code == 302
+    capturadas = [(sql, parametros) for sql, parametros in capturadas if 'lower(' in sql]
+    conferir_planos(aplicacao, capturadas, 'ix_usuario_email_lower', 'usuario')
+
+
+@pytest.mark.parametrize('modo', ['semana', 'mes'])
+def test_agenda_usa_o_indice_de_prazo(aplicacao, cliente_com_tarefas, modo):
+    with capturar_consultas(aplicacao) as capturadas:
+        resposta = cliente_com_tarefas.get(f'/agenda?modo={modo}&data=2026-10-15')
+        assert resposta.status_code == 200
+        assert any(dia['tarefas'] for dia in resposta.get_json()['dias'])
+    conferir_planos(aplicacao, capturadas, 'ix_tarefa_usuario_prazo')
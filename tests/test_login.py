@@ -0,0 +1,60 @@
+"""Limites de tentativas de login: o IP é conferido primeiro, o limite da conta não bloqueia o dono e
+uma conta atacada de muitos IPs vai para o caminho suspeito."""
+import pytest
+
+from app import VerificadorSenhas
+from conftest import cadastrar
+
+
+@pytest.fixture
+def conta(aplicacao):
+    cliente = aplicacao.test_client()
+    cadastrar(cliente, 'vitima@exemplo.com')
+    cliente.get('/logout')
+    return 'vitima@exemplo.com'
+
+
+def entrar(aplicacao, email, senha, ip):
+    return aplicacao.test_client().post('/login', data={'email': email, 'senha': senha},
+                                        environ_base={'REMOTE_ADDR': ip})
+
+
+def test_erros_de_um_ip_nao_bloqueiam_a_conta_em_outro(aplicacao, conta):
+    for tentativa in range(aplicacao.config['LOGIN_LIMITE_CONTA']):
+        assert entrar(aplicacao, conta, f'chute{tentativa}', '203.0.113.1').status_code == 200
+    assert entrar(aplicacao, conta, 'senha123', '203.0.113.1').status_code == 429
+    assert entrar(aplicacao, conta, 'senha123', '198.51.100.7').status_code == 302
+
+
+def test_ip_bloqueado_nao_chega_ao_verificador(aplicacao, conta, monkeypatch):
+    for tentativa in range(aplicacao.config['LOGIN_LIMITE_IP']):
+        entrar(aplicacao, f'outro{tentativa}@exemplo.com', 'chute', '203.0.113.2')
+
+    chamadas = []
+    monkeypatch.setattr(VerificadorSenhas, 'verificar', lambda *args, **kwargs: chamadas.append(args))
+    assert entrar(aplicacao, conta, 'chute', '203.0.113.2').status_code == 429
+    assert chamadas == []
+
+
+def test_ataque_de_muitos_ips_marca_a_conta_como_suspeita(aplicacao, conta, monkeypatch):
+    suspeitos = []
+    original = VerificadorSenhas.verificar
+
+    def verificar(self, senha_hash, senha, suspeito=False):
+        suspeitos.append(suspeito)
+        return original(self, senha_hash, senha, suspeito)
+
+    monkeypatch.setattr(VerificadorSenhas, 'verificar', verificar)
+    for tentativa in range(aplicacao.config['LOGIN_SUSPEITA_CONTA']):
+        assert entrar(aplicacao, conta, 'chute', f'172.16.0.{tentativa}').status_code == 200
+    assert not any(suspeitos)
+
+    # O dono, de um IP limpo, ainda entra (sem bloqueio), mas pelo caminho suspeito
+    assert entrar(aplicacao, conta, 'senha123', '198.51.100.7').status_code == 302
+    assert suspeitos[-1] is True
+    # Outra conta não é afetada
+    cliente = aplicacao.test_client()
+    cadastrar(cliente, 'outra@exemplo.com')
+    cliente.get('/logout')
+    assert entrar(aplicacao, 'outra@exemplo.com', 'senha123', '198.51.100.8').status_code == 302
+    assert suspeitos[-1] is False
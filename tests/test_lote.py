@@ -0,0 +1,45 @@
+"""Operações em lote: reabrir tarefas reprograma os lembretes num único UPDATE, sem carregar linha por linha."""
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from app import Tarefa, db, lembretes
+from conftest import cadastrar
+
+
+def test_reverter_reprograma_lembretes_num_update(aplicacao, cliente):
+    cadastrar(cliente, 'lote@exemplo.com')
+    futuro, outro_futuro, passado = date.today() + timedelta(days=3), date.today() + timedelta(days=5), date(2020, 1, 1)
+    ids = {}
+    for texto, dados in (('futura', {'data': futuro.isoformat(), 'lembrete': '09:00'}),
+                         ('outra', {'data': outro_futuro.isoformat(), 'lembrete': '18:30'}),
+                         ('mesmo par', {'data': futuro.isoformat(), 'lembrete': '09:00'}),
+                         ('vencida', {'data': passado.isoformat(), 'lembrete': '09:00'}),
+                         ('sem lembrete', {'data': futuro.isoformat()})):
+        resposta = cliente.post('/api/tarefas', json={'texto': texto, **dados})
+        assert resposta.status_code == 201
+        ids[texto] = resposta.get_json()['tarefa']['id']
+
+    assert cliente.post('/api/tarefas/lote', json={'acao': 'concluir', 'ids': list(ids.values())}).status_code == 200
+
+    atualizacoes = []
+    with aplicacao.app_context():
+        motor = db.engine
+    ouvir = lambda conexao, cursor, sql, *resto: sql.startswith('UPDATE tarefa SET') and atualizacoes.append(sql)
+    event.listen(motor, 'before_cursor_execute', ouvir)
+    try:
+        resposta = cliente.post('/api/tarefas/lote', json={'acao': 'reverter', 'ids': list(ids.values())})
+    finally:
+        event.remove(motor, 'before_cursor_execute', ouvir)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['afetadas'] == len(ids)
+    # Status, lembretes e o carimbo da versão: três UPDATEs, qualquer que seja o número de tarefas
+    assert len(atualizacoes) == 3
+
+    with aplicacao.app_context():
+        lembrete_em = {texto: db.session.get(Tarefa, id_tarefa).lembrete_em for texto, id_tarefa in ids.items()}
+        assert lembrete_em['futura'] == lembretes.instante(futuro, '09:00')
+        assert lembrete_em['mesmo par'] == lembretes.instante(futuro, '09:00')
+        assert lembrete_em['outra'] == lembretes.instante(outro_futuro, '18:30')
+    assert lembrete_em['vencida'] is None
+    assert lembrete_em['sem lembrete'] is None
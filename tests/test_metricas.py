@@ -0,0 +1,34 @@
+"""Métricas do Prometheus: cada aplicação tem as suas e o /metrics de produção exige o token."""
+from conftest import criar_aplicacao
+
+
+def nova_aplicacao(tmp_path, nome, **configuracao):
+    pasta = tmp_path / nome
+    pasta.mkdir()
+    return criar_aplicacao(pasta, **configuracao)
+
+
+def total_requisicoes(aplicacao, **cabecalhos):
+    texto = aplicacao.test_client().get('/metrics', headers=cabecalhos).get_data(as_text=True)
+    return sum(int(linha.rsplit(' ', 1)[1]) for linha in texto.splitlines()
+               if linha.startswith('mylife_requisicao_segundos_count{') and 'rota="/login"' in linha)
+
+
+def test_aplicacoes_nao_compartilham_metricas(tmp_path):
+    primeira = nova_aplicacao(tmp_path, 'primeira')
+    segunda = nova_aplicacao(tmp_path, 'segunda')
+    for _ in range(3):
+        primeira.test_client().get('/login')
+    assert total_requisicoes(primeira) == 3
+    assert total_requisicoes(segunda) == 0
+
+
+def test_metrics_fora_do_debug_exige_token(tmp_path):
+    sem_token = nova_aplicacao(tmp_path, 'sem_token', TESTING=False, DEBUG=False)
+    assert sem_token.test_client().get('/metrics').status_code == 404
+
+    com_token = nova_aplicacao(tmp_path, 'com_token', TESTING=False, DEBUG=False, METRICAS_TOKEN='segredo')
+    cliente = com_token.test_client()
+    assert cliente.get('/metrics').status_code == 401
+    assert cliente.get('/metrics', headers={'Authorization': 'Bearer errado'}).status_code == 401
+    assert cliente.get('/metrics', headers={'Authorization': 'Bearer segredo'}).status_code == 200
@@ -0,0 +1,158 @@
+"""Com DATABASE_SHARDS cada usuário e as tarefas dele ficam no arquivo do seu shard."""
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from app import DiretorioUsuario, RoteadorShards, cache_usuarios, db, mover_usuario, roteador_shards
+from conftest import cadastrar, criar_aplicacao
+
+USUARIOS = 6
+
+
+@pytest.fixture
+def aplicacao(tmp_path):
+    aplicacao = criar_aplicacao(tmp_path, SQLALCHEMY_BINDS={
+        'shard1': f"sqlite:///{tmp_path / 'shard1.db'}",
+        'shard2': f"sqlite:///{tmp_path / 'shard2.db'}",
+    })
+    aplicacao.arquivos = {
+        RoteadorShards.PRINCIPAL: tmp_path / 'tarefas.db',
+        'shard1': tmp_path / 'shard1.db',
+        'shard2': tmp_path / 'shard2.db',
+    }
+    yield aplicacao
+    with aplicacao.app_context():
+        for motor in db.engines.values():
+            motor.dispose()
+
+
+def linhas(aplicacao, shard, sql, *parametros):
+    """Consulta o arquivo do shard direto pelo sqlite3, sem passar pelo roteamento do app."""
+    with sqlite3.connect(aplicacao.arquivos[shard]) as conexao:
+        return conexao.execute(sql, parametros).fetchall()
+
+
+def onde_esta(aplicacao, tabela, coluna, valor):
+    return [shard for shard in aplicacao.arquivos
+            if linhas(aplicacao, shard, f'SELECT 1 FROM {tabela} WHERE {coluna} = ?', valor)]
+
+
+@pytest.fixture
+def usuarios(aplicacao):
+    """Cadastra usuários até ocupar os três shards; devolve {email: (cliente logado, id, shard)}."""
+    cadastrados = {}
+    for numero in range(USUARIOS):
+        email = f'usuario{numero}@exemplo.com'
+        cliente = aplicacao.test_client()
+        cadastrar(cliente, email)
+        with aplicacao.app_context():
+            entrada = DiretorioUsuario.query.filter_by(email=email).one()
+            assert entrada.shard == roteador_shards.shard_para(entrada.id)
+        cadastrados[email] = (cliente, entrada.id, entrada.shard)
+    assert {shard for _, _, shard in cadastrados.values()} == set(aplicacao.arquivos)
+    return cadastrados
+
+
+def test_cadastro_grava_o_usuario_so_no_seu_shard(aplicacao, usuarios):
+    for email, (_, id_usuario, shard) in usuarios.items():
+        assert onde_esta(aplicacao, 'usuario', 'email', email) == [shard]
+        assert linhas(aplicacao, shard, 'SELECT id FROM usuario WHERE email = ?', email) == [(id_usuario,)]
+
+
+def test_crud_de_tarefas_no_arquivo_do_shard(aplicacao, usuarios):
+    for email, (cliente, id_usuario, shard) in usuarios.items():
+        criada = cliente.post('/api/tarefas', json={'texto': f'Tarefa de {email}'})
+        assert criada.status_code == 201
+        id_tarefa = criada.get_json()['tarefa']['id']
+        assert onde_esta(aplicacao, 'tarefa', 'texto', f'Tarefa de {email}') == [shard]
+
+        assert cliente.patch(f'/api/tarefas/{id_tarefa}', json={'feito': True}).status_code == 200
+        assert linhas(aplicacao, shard, 'SELECT feito FROM tarefa WHERE usuario_id = ?', id_usuario) == [(1,)]
+        assert [tarefa['texto'] for tarefa in cliente.get('/api/tarefas').get_json()['tarefas']] == [f'Tarefa de {email}']
+
+        assert cliente.delete(f'/api/tarefas/{id_tarefa}').status_code == 200
+        assert linhas(aplicacao, shard, 'SELECT 1 FROM tarefa WHERE usuario_id = ?', id_usuario) == []
+
+
+def test_load_user_usa_o_shard_do_cache(aplicacao, usuarios):
+    cliente, _, _ = next(iter(usuarios.values()))
+    cliente.get('/api/tarefas')
+
+    consultas = []
+    with aplicacao.app_context():
+        motor = db.engine
+    ouvir = lambda conexao, cursor, sql, *resto: consultas.append(sql)
+    event.listen(motor, 'before_cursor_execute', ouvir)
+    try:
+        assert cliente.get('/api/tarefas').status_code == 200
+    finally:
+        event.remove(motor, 'before_cursor_execute', ouvir)
+    assert not any('diretorio_usuario' in sql for sql in consultas)
+
+
+def test_mover_usuario_leva_os_dados_para_o_destino(aplicacao, usuarios):
+    email, (cliente, id_usuario, origem) = next(iter(usuarios.items()))
+    for numero in range(3):
+        cliente.post('/api/tarefas', json={'texto': f'Antes da mudança {numero}'})
+    destino = next(shard for shard in aplicacao.arquivos if shard != origem)
+
+    with aplicacao.app_context():
+        assert mover_usuario(id_usuario, destino) == 3
+        assert db.session.get(DiretorioUsuario, id_usuario).shard == destino
+
+    assert onde_esta(aplicacao, 'usuario', 'email', email) == [destino]
+    assert linhas(aplicacao, origem, 'SELECT 1 FROM tarefa WHERE usuario_id = ?', id_usuario) == []
+    assert len(linhas(aplicacao, destino, 'SELECT 1 FROM tarefa WHERE usuario_id = ?', id_usuario)) == 3
+
+    # A sessão continua valendo e as próximas requisições já vão para o destino
+    assert cliente.post('/api/tarefas', json={'texto': 'Depois da mudança'}).status_code == 201
+    assert onde_esta(aplicacao, 'tarefa', 'texto', 'Depois da mudança') == [destino]
+    assert len(cliente.get('/api/tarefas').get_json()['tarefas']) == 4
+
+
+def test_falha_no_shard_nao_deixa_entrada_no_diretorio(aplicacao, monkeypatch):
+    with aplicacao.app_context():
+        proximo_id = (db.session.query(db.func.max(DiretorioUsuario.id)).scalar() or 0) + 1
+        destino = roteador_shards.shard_para(proximo_id)
+    if destino == RoteadorShards.PRINCIPAL:
+        pytest.skip('o próximo id cai no shard principal (uma transação só)')
+
+    # Um usuário com o mesmo email já no shard faz a gravação nele falhar
+    linhas(aplicacao, destino, "INSERT INTO usuario (id, nome, email, senha_hash) VALUES (999, 'x', 'repetido@exemplo.com', 'x')")
+    cliente = aplicacao.test_client()
+    cliente.post('/cadastro', data={'nome': 'Novo', 'email': 'repetido@exemplo.com',
+                                    'senha': 'senha123', 'confirmar_senha': 'senha123'})
+    with aplicacao.app_context():
+        assert DiretorioUsuario.query.filter_by(email='repetido@exemplo.com').first() is None
+
+
+def test_cache_de_outra_instancia_segue_o_usuario_movido(aplicacao, usuarios, tmp_path):
+    email, (cliente, id_usuario, origem) = next(iter(usuarios.items()))
+    cliente.post('/api/tarefas', json={'texto': 'Antes da mudança'})
+
+    # Outra instância (outro worker) com o usuário no próprio cache em memória
+    outra = criar_aplicacao(tmp_path, SQLALCHEMY_BINDS={
+        'shard1': f"sqlite:///{aplicacao.arquivos['shard1']}",
+        'shard2': f"sqlite:///{aplicacao.arquivos['shard2']}",
+    })
+    outro_cliente = outra.test_client()
+    assert outro_cliente.post('/login', data={'email': email, 'senha': 'senha123'}).status_code == 302
+    assert len(outro_cliente.get('/api/tarefas').get_json()['tarefas']) == 1
+    with outra.app_context():
+        assert cache_usuarios.obter(id_usuario)['shard'] == origem
+
+    destino = next(shard for shard in aplicacao.arquivos if shard != origem)
+    with aplicacao.app_context():
+        mover_usuario(id_usuario, destino)
+
+    try:
+        assert len(outro_cliente.get('/api/tarefas').get_json()['tarefas']) == 1
+        assert outro_cliente.post('/api/tarefas', json={'texto': 'Depois da mudança'}).status_code == 201
+        assert onde_esta(aplicacao, 'tarefa', 'texto', 'Depois da mudança') == [destino]
+        with outra.app_context():
+            assert cache_usuarios.obter(id_usuario)['shard'] == destino
+    finally:
+        with outra.app_context():
+            for motor in db.engines.values():
+                motor.dispose()
@@ -0,0 +1,57 @@
+"""A versão das tarefas do usuário só avança quando alguma linha muda."""
+import pytest
+
+from app import Usuario, db
+from conftest import cadastrar
+
+
+def versao(aplicacao):
+    with aplicacao.app_context():
+        return db.session.query(Usuario.versao_tarefas).scalar()
+
+
+@pytest.fixture
+def logado(cliente):
+    cadastrar(cliente, 'versao@exemplo.com')
+    assert cliente.post('/api/tarefas', json={'texto': 'Pendente'}).status_code == 201
+    return cliente
+
+
+def test_deletar_inexistente_nao_muda_versao(aplicacao, logado):
+    antes = versao(aplicacao)
+    assert logado.delete('/api/tarefas/9999').status_code == 404
+    assert versao(aplicacao) == antes
+
+
+def test_lote_sem_tarefas_encontradas_nao_muda_versao(aplicacao, logado):
+    antes = versao(aplicacao)
+    for acao in ('concluir', 'reverter', 'deletar'):
+        assert logado.post('/api/tarefas/lote', json={'acao': acao, 'ids': [9998, 9999]}).status_code == 404
+    assert versao(aplicacao) == antes
+
+
+def test_limpar_sem_concluidas_nao_muda_versao(aplicacao, logado):
+    antes = versao(aplicacao)
+    resposta = logado.post('/api/tarefas/limpar_concluidas', json={})
+    assert resposta.status_code == 200
+    assert resposta.get_json()['afetadas'] == 0
+    assert versao(aplicacao) == antes
+
+
+def test_deletar_existente_avanca_versao(aplicacao, logado):
+    id_tarefa = logado.get('/api/tarefas').get_json()['tarefas'][0]['id']
+    antes = versao(aplicacao)
+    assert logado.delete(f'/api/tarefas/{id_tarefa}').status_code == 200
+    assert versao(aplicacao) == antes + 1
+
+
+def test_limpar_exige_json(aplicacao, logado):
+    id_tarefa = logado.get('/api/tarefas').get_json()['tarefas'][0]['id']
+    logado.patch(f'/api/tarefas/{id_tarefa}', json={'feito': True})
+    # Como um formulário de outro site enviaria: sem corpo ou como formulário
+    assert logado.post('/api/tarefas/limpar_concluidas').status_code == 400
+    assert logado.post('/api/tarefas/limpar_concluidas', data={'x': '1'}).status_code == 400
+    assert logado.get('/api/tarefas').get_json()['estatisticas']['completas'] == 1
+
+    resposta = logado.post('/api/tarefas/limpar_concluidas', json={})
+    assert resposta.get_json()['afetadas'] == 1